@@ -1,16 +1,19 @@
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 from config import settings
+from llm_cache import llm_cache
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Running sentiment below this triggers an intervention
+NEGATIVE_SENTIMENT_THRESHOLD = -0.4
+
 class AICostController:
     """Controls AI API usage to minimize costs while maintaining quality"""
     
     def __init__(self):
         self.dispute_interventions: Dict[str, List[datetime]] = {}
-        self.response_cache: Dict[str, str] = {}
         self.last_intervention: Dict[str, datetime] = {}
     
     def can_intervene(self, dispute_id: str) -> bool:
@@ -30,15 +33,19 @@ class AICostController:
         
         return True
     
-    def should_intervene(self, dispute_id: str, messages: List, sentiment_score: float) -> bool:
-        """Smart logic to determine if AI intervention is actually needed"""
+    def should_intervene(self, dispute_id: str, messages: List, sentiment_score: float,
+                         message_count: Optional[int] = None) -> bool:
+        """Smart logic to determine if AI intervention is actually needed
+
+        `messages` may be just the recent ones if `message_count` gives the total.
+        """
         if not self.can_intervene(dispute_id):
             return False
         
         # Only intervene when really necessary
         intervention_triggers = [
-            sentiment_score < -0.4,  # Very negative sentiment
-            len(messages) % 10 == 0,  # Every 10 messages
+            sentiment_score < NEGATIVE_SENTIMENT_THRESHOLD,  # Very negative sentiment
+            (len(messages) if message_count is None else message_count) % 10 == 0,  # Every 10 messages
             self._detect_escalation(messages),  # Escalation detected
             self._detect_stalemate(messages)  # Conversation stalled
         ]
@@ -87,17 +94,19 @@ Respond concisely:"""
         
         return f"{original_prompt}\n{category_instruction}\n{optimization_suffix}"
     
-    def get_cached_response(self, prompt_hash: str) -> Optional[str]:
-        """Get cached response to avoid duplicate API calls"""
+    async def get_cached_response(self, cache_key: str, request: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Get cached response to avoid duplicate API calls (key from llm_cache.response_cache_key).
+        
+        Pass the `request` kwargs to allow near-duplicate hits (LLM_CACHE_SIMILARITY_THRESHOLD)."""
         if not settings.enable_ai_response_caching:
             return None
         
-        return self.response_cache.get(prompt_hash)
+        return await llm_cache.get(cache_key, request)
     
-    def cache_response(self, prompt_hash: str, response: str):
+    async def cache_response(self, cache_key: str, response: str, request: Optional[Dict[str, Any]] = None):
         """Cache AI response for future use"""
         if settings.enable_ai_response_caching:
-            self.response_cache[prompt_hash] = response
+            await llm_cache.set(cache_key, response, request)
     
     def _get_intervention_count(self, dispute_id: str) -> int:
         """Get number of AI interventions for a dispute"""
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+
+from config import settings
+from database import get_async_engine
+
+logger = logging.getLogger(__name__)
+
+class AnalyticsWriter:
+    """Buffered bulk writer for analytics tables (ChatMessageLog, ResolutionLog).
+
+    Request handlers call `add` / `update` and return at once. Rows are held in
+    memory and written by a background task as one multi-row INSERT per
+    table. A flush happens every `batch_size` rows or `flush_interval_ms`,
+    whichever comes first, and again on shutdown. A batch that fails is put
+    back and retried up to `max_retries` times; the last attempt goes row by
+    row, so only the rows that still fail are dropped. Rows that arrive while
+    `max_buffer` rows are already pending are dropped too. Both cases are
+    counted in `metrics()`.
+    """
+
+    def __init__(self, batch_size: int = settings.analytics_batch_size,
+                 flush_interval_ms: int = settings.analytics_flush_interval_ms,
+                 max_buffer: int = settings.analytics_max_buffer,
+                 max_retries: int = settings.analytics_max_retries,
+                 engine_factory=get_async_engine):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_buffer = max_buffer
+        self.max_retries = max_retries
+        self.engine_factory = engine_factory
+        # (model, row, attempts) – attempts counts failed flushes of this row
+        self._rows: List[Tuple[Any, Dict[str, Any], int]] = []
+        self._updates: List[Tuple[Any, Any, Dict[str, Any], int]] = []
+        self._pending_by_pk: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._stats = {
+            "rows_written": 0,
+            "updates_written": 0,
+            "batches_written": 0,
+            "batches_retried": 0,
+            "batches_dropped": 0,
+            "rows_dropped": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Producers
+    # ------------------------------------------------------------------
+
+    def add(self, model, **row: Any) -> bool:
+        """Buffer one row for `model`; False if the buffer is full and the row was dropped"""
+        if self.depth() >= self.max_buffer:
+            self._stats["rows_dropped"] += 1
+            logger.warning(f"Analytics buffer full; dropped {model.__tablename__} row")
+            return False
+        self._rows.append((model, row, 0))
+        if "id" in row:
+            self._pending_by_pk[(model.__tablename__, row["id"])] = row
+        if len(self._rows) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def update(self, model, pk: Any, **values: Any):
+        """Set columns on a row by primary key; patches it in place if it hasn't been flushed yet"""
+        pending = self._pending_by_pk.get((model.__tablename__, pk))
+        if pending is not None:
+            pending.update(values)
+            return
+        self._updates.append((model, pk, values, 0))
+
+    def depth(self) -> int:
+        return len(self._rows) + len(self._updates)
+
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+
+    async def flush(self):
+        """Write everything buffered so far: one multi-row INSERT per table, each in its own transaction"""
+        async with self._flush_lock:
+            if not self._rows and not self._updates:
+                return
+            rows, updates = self._rows, self._updates
+            self._rows, self._updates, self._pending_by_pk = [], [], {}
+
+            groups: Dict[Tuple[Any, frozenset, int], List[Tuple[Any, Dict[str, Any], int]]] = {}
+            for entry in rows:
+                model, row, attempts = entry
+                groups.setdefault((model, frozenset(row), attempts), []).append(entry)
+
+            start = time.perf_counter()
+            engine = self.engine_factory()
+            failed_rows, failed_updates, error = [], [], None
+            for (model, _, attempts), entries in groups.items():
+                # Last attempt goes row by row so one bad row can't sink the rest of the batch
+                chunks = [[e] for e in entries] if attempts + 1 >= self.max_retries else [entries]
+                for chunk in chunks:
+                    try:
+                        async with engine.begin() as conn:
+                            await conn.execute(insert(model.__table__), [row for _, row, _ in chunk])
+                        self._stats["rows_written"] += len(chunk)
+                    except Exception as e:
+                        failed_rows += chunk
+                        error = e
+            if updates:
+                try:
+                    async with engine.begin() as conn:
+                        for model, pk, values, _ in updates:
+                            await conn.execute(update(model.__table__).where(model.__table__.c.id == pk).values(**values))
+                    self._stats["updates_written"] += len(updates)
+                except Exception as e:
+                    failed_updates = updates
+                    error = e
+
+            if failed_rows or failed_updates:
+                self._requeue(failed_rows, failed_updates, error)
+            if len(failed_rows) + len(failed_updates) < len(rows) + len(updates):
+                self._stats["batches_written"] += 1
+            self._stats["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    def _requeue(self, rows, updates, error: Exception):
+        retry_rows = [(m, r, n + 1) for m, r, n in rows if n + 1 < self.max_retries]
+        retry_updates = [(m, pk, v, n + 1) for m, pk, v, n in updates if n + 1 < self.max_retries]
+        dropped = (len(rows) - len(retry_rows)) + (len(updates) - len(retry_updates))
+        if dropped:
+            self._stats["batches_dropped"] += 1
+            self._stats["rows_dropped"] += dropped
+            logger.error(f"Analytics flush failed, dropped {dropped} rows after {self.max_retries} attempts: {error}")
+        if retry_rows or retry_updates:
+            self._stats["batches_retried"] += 1
+            logger.warning(f"Analytics flush failed, will retry {len(retry_rows) + len(retry_updates)} rows: {error}")
+        # Retries go ahead of rows buffered meanwhile so per-table order is kept
+        self._rows = retry_rows + self._rows
+        self._updates = retry_updates + self._updates
+        for model, row, _ in retry_rows:
+            if "id" in row:
+                self._pending_by_pk[(model.__tablename__, row["id"])] = row
+
+    async def run(self):
+        """Worker loop: flush every interval, or as soon as a full batch is buffered"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Analytics writer error: {e}")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the worker and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"depth": self.depth(), "running": self._task is not None and not self._task.done(), **self._stats}
+
+# Global analytics writer
+analytics_writer = AnalyticsWriter()
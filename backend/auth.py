@@ -1,14 +1,17 @@
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from database import get_db, User as DBUser
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+from database import get_db, get_async_db, User as DBUser
+from password_hashing import check_password, hash_password
+from ttl_cache import TTLCache
+import hashlib
 import os
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+import time
 
 # JWT Settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
@@ -18,13 +21,56 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 # HTTP Bearer for token authentication
 security = HTTPBearer()
 
+# ---------------- Authenticated-user cache -----------------
+# Decoded tokens (by token hash) and user rows (by id) are cached so the common
+# authenticated request needs neither a JWT verify nor a users query. Any change
+# to a User flushed through the ORM in this process drops that user's entry;
+# other workers see it within AUTH_USER_CACHE_TTL_SECONDS.
+
+token_cache = TTLCache(maxsize=settings.auth_token_cache_size, ttl=settings.auth_token_cache_ttl_seconds)
+user_cache = TTLCache(maxsize=settings.auth_user_cache_size, ttl=settings.auth_user_cache_ttl_seconds)
+_USER_COLUMNS = [attr.key for attr in DBUser.__mapper__.column_attrs]
+
+def invalidate_user(user_id: str):
+    """Drop a cached user row, e.g. after a bulk UPDATE that bypasses the ORM"""
+    user_cache.pop(user_id)
+
+def _cache_user(user: DBUser):
+    user_cache.set(user.id, {key: getattr(user, key) for key in _USER_COLUMNS})
+
+def _user_from_cache(user_id: str):
+    """A detached DBUser built from the cached row (no SELECT), or None on a miss"""
+    row = user_cache.get(user_id)
+    if row is None:
+        return None
+    user = DBUser(**row)
+    make_transient_to_detached(user)
+    return user
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed_users(session, _flush_context):
+    changed = {obj.id for obj in list(session.dirty) + list(session.deleted) if isinstance(obj, DBUser)}
+    if changed:
+        for user_id in changed:
+            invalidate_user(user_id)
+        # Drop them again at commit, in case a concurrent request re-cached the pre-commit row
+        session.info.setdefault("auth_invalidate", set()).update(changed)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session):
+    for user_id in session.info.pop("auth_invalidate", ()):
+        invalidate_user(user_id)
+
+def auth_cache_metrics():
+    return {"tokens": token_cache.metrics(), "users": user_cache.metrics()}
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a plain password against a hashed password"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify a plain password against a hashed password (blocking; async handlers use password_hasher)"""
+    return check_password(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    """Hash a password"""
-    return pwd_context.hash(password)
+    """Hash a password (blocking; async handlers use password_hasher)"""
+    return hash_password(password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """Create a JWT access token"""
@@ -40,6 +86,10 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
 def verify_token(token: str):
     """Verify a JWT token and return user data"""
+    token_key = hashlib.sha256(token.encode()).hexdigest()
+    user_id = token_cache.get(token_key)
+    if user_id is not None:
+        return user_id
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -49,6 +99,8 @@ def verify_token(token: str):
                 detail="Could not validate credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        # Never trust a cached token past its own expiry
+        token_cache.set(token_key, user_id, ttl=payload.get("exp", 0) - time.time() if "exp" in payload else None)
         return user_id
     except JWTError:
         raise HTTPException(
@@ -65,6 +117,10 @@ def get_current_user(
     token = credentials.credentials
     user_id = verify_token(token)
     
+    cached = _user_from_cache(user_id)
+    if cached is not None:
+        return db.merge(cached, load=False)
+
     user = db.query(DBUser).filter(DBUser.id == user_id).first()
     if user is None:
         raise HTTPException(
@@ -73,6 +129,30 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    _cache_user(user)
+    return user
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the current authenticated user (AsyncSession variant for async endpoints)"""
+    token = credentials.credentials
+    user_id = verify_token(token)
+
+    cached = _user_from_cache(user_id)
+    if cached is not None:
+        return await db.merge(cached, load=False)
+
+    user = await db.get(DBUser, user_id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    _cache_user(user)
     return user
 
 # Optional authentication (doesn't require token)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark: AnalystAgent.analyze_dispute cost as a dispute grows.
+
+Usage (from backend/):
+    python benchmarks/bench_analytics.py [--sizes 100,10000,100000] [--repeat 200]
+
+Builds disputes with N messages (one in seven from the AI mediator) and N/50
+proposals, some of them rejected. It then times:
+  rescan       the counts analytics used to compute on each call (AI messages,
+               rejected and accepted proposals) by scanning the lists
+  incremental  analyze_dispute(), which reads Dispute.stats() and the running sentiment
+It checks that both report the same counts. No LLM is involved.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispute_models import Dispute, MediationMessage, ResolutionProposal, ResolutionType
+from mediation_agents import AnalystAgent
+
+
+def build_dispute(messages: int) -> Dispute:
+    dispute = Dispute(title="Deposit", description="Deposit not returned", category="property", created_by="user-a")
+    for i in range(messages):
+        ai = i % 7 == 0
+        dispute.add_message(MediationMessage(dispute_id=dispute.id, sender_id="ai_mediator" if ai else "user-a",
+                                             sender_type="ai_mediator" if ai else "user",
+                                             content=f"Message {i}: the deposit was not returned, this is unfair"))
+    for i in range(messages // 50):
+        proposal = ResolutionProposal(dispute_id=dispute.id, proposed_by="ai_mediator", title=f"Split {i}",
+                                      resolution_type=ResolutionType.MONETARY, description="Refund", terms=["Refund"])
+        dispute.add_proposal(proposal)
+        dispute.respond_to_proposal(proposal, "user-b", accept=i % 3 == 0)
+    return dispute
+
+
+def rescan(dispute: Dispute) -> tuple:
+    return (len([m for m in dispute.messages if m.sender_type.startswith("ai_")]),
+            sum(1 for p in dispute.proposals if p.rejected_by),
+            sum(1 for p in dispute.proposals if p.accepted_by))
+
+
+def best_us(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,10000,100000", help="comma-separated message counts")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    analyst = AnalystAgent()
+    loop = asyncio.new_event_loop()
+    print(f"{'messages':>9} {'rescan µs':>10} {'incremental µs':>15}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        dispute = build_dispute(size)
+        stats = dispute.stats()
+        assert rescan(dispute) == (stats.ai_messages, stats.rejected_proposals, stats.accepted_proposals)
+        analytics = loop.run_until_complete(analyst.analyze_dispute(dispute))
+        assert analytics.ai_interventions == stats.ai_messages
+
+        rescan_us = best_us(lambda: rescan(dispute), args.repeat)
+        incremental_us = best_us(lambda: loop.run_until_complete(analyst.analyze_dispute(dispute)), args.repeat)
+        print(f"{size:>9} {rescan_us:>10.1f} {incremental_us:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark: requests/s of a hot endpoint on the sync Session vs. the AsyncSession.
+
+Usage (from backend/):
+    python benchmarks/bench_async_db.py [--requests 400] [--concurrency 50] [--db-latency-ms 5]
+
+Seeds a throwaway SQLite database with 1,000 users, then calls the real async
+`GET /api/leaderboard/overall` from social_api alongside the pre-port sync
+version of the same handler. Requests go through httpx's in-process ASGI
+transport with `--concurrency` in flight.
+
+`--db-latency-ms` adds a per-statement delay to mimic the network round trip
+to Postgres/Supabase. The delay is added in SQLite's trace callback, so it
+happens on the thread that runs the statement. For the sync Session that is
+the event loop, as with a blocking driver. For the AsyncSession it is the
+aiosqlite worker thread, as with awaiting a network driver.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+DB_FILE = os.path.join(tempfile.mkdtemp(), "bench_async_db.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_FILE}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+
+import database
+from database import User as DBUser, get_db
+from social_api import overall_leaderboard
+
+
+def add_latency(sync_engine, seconds: float):
+    """Sleep inside SQLite's trace callback, i.e. on whichever thread executes the statement"""
+    def delay(_statement):
+        time.sleep(seconds)
+
+    @event.listens_for(sync_engine, "connect")
+    def _install(dbapi_connection, _record):
+        raw = getattr(dbapi_connection, "_connection", None)
+        if raw is None:  # pysqlite: runs on the caller's (event loop) thread
+            dbapi_connection.set_trace_callback(delay)
+        else:  # aiosqlite: install on its worker thread
+            await_only(raw._execute(raw._conn.set_trace_callback, delay))
+
+
+def seed(users: int):
+    database.init_db()
+    db = database.SessionLocal()
+    db.add_all(DBUser(password_hash="x", display_name=f"user{i}", xp_points=i * 7 % 1000) for i in range(users))
+    db.commit()
+    db.close()
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync/leaderboard/overall")
+    async def sync_overall_leaderboard(limit: int = 20, db: Session = Depends(get_db)):
+        # The handler as it was before the AsyncSession port
+        users = db.query(DBUser).order_by(DBUser.xp_points.desc()).limit(limit).all()
+        return [{"id": u.id, "displayName": u.display_name or "Anonymous", "xp": u.xp_points, "wins": u.disputes_won} for u in users]
+
+    app.get("/async/leaderboard/overall")(overall_leaderboard)
+    return app
+
+
+async def load(app: FastAPI, path: str, requests: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                resp = await client.get(path)
+                resp.raise_for_status()
+
+        await client.get(path)  # warm up pools / lazy engines
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--db-latency-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    seed(1000)
+    latency = args.db_latency_ms / 1000
+    add_latency(database.engine, latency)
+    add_latency(database.get_async_engine().sync_engine, latency)
+
+    async def run_all():
+        app = build_app()
+        return [(name, await load(app, f"/{name}/leaderboard/overall", args.requests, args.concurrency)) for name in ("sync", "async")]
+
+    print(f"{'session':>8} {'req/s':>8}   ({args.requests} requests, {args.concurrency} concurrent, {args.db_latency_ms} ms/statement)")
+    for name, rps in asyncio.run(run_all()):
+        print(f"{name:>8} {rps:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
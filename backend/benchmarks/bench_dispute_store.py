@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-user dispute lookup, indexed DisputeStore vs. the old linear scan.
+
+Usage (from backend/):
+    python benchmarks/bench_dispute_store.py [--sizes 1000,10000,100000,1000000]
+
+Each run seeds N disputes spread over N/10 users plus one "probe" user who is in
+exactly 20 disputes, then times `for_user(probe)` against the previous
+`any(p.user_id == user_id ...)` scan. Indexed latency should stay flat as N grows.
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispute_models import Dispute, DisputeParticipant, DisputeStatus, ParticipantRole
+from dispute_store import DisputeStore
+
+PROBE_USER = "probe-user"
+PROBE_DISPUTES = 20
+CATEGORIES = ["contract", "service", "product", "relationship", "property", "other"]
+
+
+def _participant(user_id: str, dispute_id: str, role: ParticipantRole) -> DisputeParticipant:
+    return DisputeParticipant(user_id=user_id, dispute_id=dispute_id, role=role, username=user_id, email=f"{user_id}@example.com")
+
+
+def seed(store: DisputeStore, size: int):
+    users = max(size // 10, 2)
+    probe_every = max(size // PROBE_DISPUTES, 1)
+    for i in range(size):
+        dispute = Dispute(id=str(uuid.uuid4()), title=f"Dispute {i}", description="bench", category=CATEGORIES[i % len(CATEGORIES)], created_by=f"u{i % users}")
+        store.add(dispute)
+        dispute.add_participant(_participant(f"u{i % users}", dispute.id, ParticipantRole.COMPLAINANT))
+        respondent = PROBE_USER if i % probe_every == 0 else f"u{(i + 1) % users}"
+        dispute.add_participant(_participant(respondent, dispute.id, ParticipantRole.RESPONDENT))
+
+
+def time_per_call(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def linear_scan(store: DisputeStore, user_id: str):
+    return [d for d in store.values() if any(p.user_id == user_id for p in d.participants)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000", help="comma-separated dispute counts")
+    parser.add_argument("--repeat", type=int, default=1000, help="indexed lookups per size")
+    args = parser.parse_args()
+
+    print(f"{'disputes':>10} {'seed s':>8} {'indexed µs':>11} {'status µs':>10} {'scan µs':>12} {'results':>8}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        store = DisputeStore()
+        start = time.perf_counter()
+        seed(store, size)
+        seed_s = time.perf_counter() - start
+
+        indexed = time_per_call(lambda: store.for_user(PROBE_USER), args.repeat)
+        by_status = time_per_call(lambda: store.for_user(PROBE_USER, status=DisputeStatus.PARTIES_JOINED), args.repeat)
+        scan = time_per_call(lambda: linear_scan(store, PROBE_USER), max(1, 100_000 // size))
+        results = len(store.for_user(PROBE_USER))
+        assert results == len(linear_scan(store, PROBE_USER))
+
+        print(f"{size:>10} {seed_s:>8.1f} {indexed * 1e6:>11.2f} {by_status * 1e6:>10.2f} {scan * 1e6:>12.0f} {results:>8}")
+
+
+if __name__ == "__main__":
+    main()
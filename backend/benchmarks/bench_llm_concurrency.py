@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark: chat endpoint latency while LLM completions are in flight.
+
+Usage (from backend/):
+    python benchmarks/bench_llm_concurrency.py [--llm-calls 16] [--llm-delay 0.5] [--mode both] [--budget-ms 250]
+
+Starts a fake OpenAI-compatible server on a background thread. It answers
+/v1/chat/completions after `--llm-delay` seconds, and the app is pointed at it
+through OPENAI_BASE_URL. `--llm-calls` agent completions are fired at once,
+and meanwhile GET /api/disputes/{id}/messages is polled through the app.
+The modes are:
+  sync   the old path – the blocking `openai.OpenAI` client called inside the coroutine
+  async  MediatorAgent.generate_response on the shared AsyncOpenAI client (llm_clients)
+For each mode the script prints the wall time of the LLM batch and how many
+calls got a completion. Calls shed by llm_clients get the agent's fallback
+text instead (LLM_MAX_CONCURRENCY=4 LLM_QUEUE_TIMEOUT_SECONDS=0.7 shows this).
+It also prints the p50, p99 and max latency of the chat requests, timed from
+when each was due. The run fails (exit status 1) when the async p99 exceeds
+`--budget-ms`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COMPLETION = {
+    "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": "fake",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "Let's find common ground."},
+                 "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+}
+
+
+async def fake_llm(reader, writer, delay: float):
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = re.search(rb"(?i)content-length:\s*(\d+)", head)
+            await reader.readexactly(int(length.group(1)) if length else 0)
+            await asyncio.sleep(delay)
+            body = json.dumps(COMPLETION).encode()
+            writer.write(b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\ncontent-length: %d\r\n\r\n"
+                         % len(body) + body)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def start_fake_llm(delay: float) -> str:
+    """Serve the fake LLM on its own thread and event loop; returns its base URL"""
+    ready, bound = threading.Event(), {}
+
+    def run():
+        loop = asyncio.new_event_loop()
+        server = loop.run_until_complete(
+            asyncio.start_server(lambda r, w: fake_llm(r, w, delay), "127.0.0.1", 0))
+        bound["port"] = server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{bound['port']}/v1"
+
+
+async def poll_chat(client, path: str, stop: asyncio.Event) -> list:
+    # Timed from when each request was due, so time spent behind a blocked loop counts
+    latencies = []
+    while not stop.is_set():
+        due = time.perf_counter() + 0.01
+        await asyncio.sleep(0.01)
+        response = await client.get(path)
+        assert response.status_code == 200, response.status_code
+        latencies.append((time.perf_counter() - due) * 1000)
+    return latencies
+
+
+async def run_mode(mode: str, calls: int, app, dispute_id: str) -> tuple:
+    import httpx
+    import openai
+    from config import settings
+    from mediation_agents import MediatorAgent
+
+    agent = MediatorAgent()
+    blocking = openai.OpenAI(api_key=settings.openai_api_key, base_url=settings.openai_base_url)
+
+    async def sync_call(i: int) -> str:
+        # What BaseMediationAgent used to do: a blocking SDK call inside `async def`
+        response = blocking.chat.completions.create(model=settings.ai_model_preference,
+                                                    messages=[{"role": "user", "content": f"sync {i}"}])
+        return response.choices[0].message.content
+
+    async def async_call(i: int) -> str:
+        return await agent.generate_response(f"Please help us settle point {i} ({time.time_ns()})")
+
+    call = sync_call if mode == "sync" else async_call
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as client:
+        stop = asyncio.Event()
+        poller = asyncio.create_task(poll_chat(client, f"/api/disputes/{dispute_id}/messages", stop))
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        replies = await asyncio.gather(*(call(i) for i in range(calls)))
+        wall = time.perf_counter() - start
+        stop.set()
+        latencies = await poller
+    answered = sum(r == COMPLETION["choices"][0]["message"]["content"] for r in replies)
+    return wall, answered, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-calls", type=int, default=16)
+    parser.add_argument("--llm-delay", type=float, default=0.5, help="seconds the fake LLM takes per completion")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--budget-ms", type=float, default=250, help="max p99 chat latency in async mode")
+    args = parser.parse_args()
+
+    os.environ["OPENAI_API_KEY"] = "fake-key"
+    os.environ["OPENAI_BASE_URL"] = start_fake_llm(args.llm_delay)
+    os.environ.setdefault("ENABLE_AI_RESPONSE_CACHING", "false")
+
+    import mediation_api
+    from dispute_models import Dispute, MediationMessage
+    from llm_clients import llm_clients
+
+    dispute = Dispute(title="Deposit", description="Deposit not returned", category="property", created_by="user-a")
+    for i in range(200):
+        dispute.add_message(MediationMessage(dispute_id=dispute.id, sender_id="user-a", sender_type="user",
+                                             content=f"Message {i}"))
+    mediation_api.disputes_db[dispute.id] = dispute
+
+    modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+    print(f"{args.llm_calls} completions of {args.llm_delay}s each, "
+          f"llm_max_concurrency={llm_clients.max_concurrency}\n")
+    print(f"{'mode':>6} {'LLM wall s':>11} {'answered':>9} {'chat reqs':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    failed = False
+    for mode in modes:
+        wall, answered, latencies = asyncio.run(run_mode(mode, args.llm_calls, mediation_api.app, dispute.id))
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{mode:>6} {wall:>11.2f} {answered:>9} {len(latencies):>10} {statistics.median(latencies):>8.1f} "
+              f"{p99:>8.1f} {latencies[-1]:>8.1f}")
+        if mode == "async" and p99 > args.budget_ms:
+            failed = True
+    print("\nllm_clients:", llm_clients.metrics())
+    if failed:
+        print(f"FAIL: async p99 chat latency above {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
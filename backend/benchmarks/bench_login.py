@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark: login (bcrypt verify) throughput per core, and event-loop stalls.
+
+Usage (from backend/):
+    python benchmarks/bench_login.py [--logins 64] [--concurrency 16] [--workers 0]
+
+Runs `--logins` password checks with `--concurrency` in flight, three ways:
+  inline   passlib verify called directly in the handler (the old behaviour)
+  thread   PasswordHasher on a thread pool (the default)
+  process  PasswordHasher on a process pool
+
+For each mode it reports logins/s, logins/s per worker core, and the worst
+event-loop stall. The stall is measured by a 5 ms ticker running alongside,
+and shows how long every other request on the worker would have waited.
+`--workers 0` means one worker per CPU.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from password_hashing import PasswordHasher, check_password, hash_password
+
+
+async def max_loop_stall(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run(mode: str, hashed: str, logins: int, concurrency: int, workers: int):
+    hasher = None if mode == "inline" else PasswordHasher(workers=workers, max_pending=logins,
+                                                          use_processes=mode == "process")
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            if hasher is None:
+                ok = check_password("correct horse", hashed)
+            else:
+                ok = await hasher.verify("correct horse", hashed)
+            assert ok
+
+    if hasher is not None:
+        await hasher.verify("correct horse", hashed)  # start the pool's workers
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(max_loop_stall(stop))
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    stall = await ticker
+    if hasher is not None:
+        hasher.shutdown()
+    return elapsed, stall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    hashed = hash_password("correct horse")
+    print(f"{'mode':>8} {'login/s':>8} {'per core':>9} {'max stall ms':>13}   "
+          f"({args.logins} logins, {args.concurrency} concurrent, {workers} workers, {os.cpu_count()} CPUs)")
+    for mode in ("inline", "thread", "process"):
+        elapsed, stall = asyncio.run(run(mode, hashed, args.logins, args.concurrency, workers))
+        cores = 1 if mode == "inline" else min(workers, os.cpu_count() or 1)
+        rate = args.logins / elapsed
+        print(f"{mode:>8} {rate:>8.1f} {rate / cores:>9.1f} {stall * 1000:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
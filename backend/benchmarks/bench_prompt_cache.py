@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark: LLM response cache hit rate on replayed chat traffic – raw vs canonical vs near-duplicate keys.
+
+Usage (from backend/):
+    python benchmarks/bench_prompt_cache.py [--limit 50000] [--thresholds 0.8,0.9]
+    python benchmarks/bench_prompt_cache.py --synthetic 200   # 200 generated disputes instead of the database
+
+Replays the public ChatMessageLog rows in DATABASE_URL in time order. If the
+table is empty or missing, generated traffic is used instead. User messages are
+appended to an in-memory Dispute per dispute_id, and for each one the script
+builds the requests the agents would send:
+  facilitation  MediatorAgent.facilitation_prompt([message]) with the dispute description as context
+  sentiment     AnalystAgent.sentiment_prompt(dispute.messages)
+  guidance      FacilitatorAgent.guidance_prompt(dispute), every `--guidance-every` messages
+No LLM is called. Each request is looked up and then cached under three
+strategies, and the hit rate of each is reported:
+  raw        SHA-256 of the request as sent (the key before canonicalisation)
+  canonical  llm_cache.response_cache_key: timestamps/ids masked, whitespace and JSON spacing collapsed
+  ~T         canonical, then the closest cached prompt with the same configuration at Jaccard >= T
+             (LLM_CACHE_SIMILARITY_THRESHOLD=T)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import zlib
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+Row = namedtuple("Row", "dispute_id sender_id sender_role content created_at")
+
+DESCRIPTIONS = ["Security deposit not returned after move-out", "Refund for a cancelled catering order",
+                "Split of shared utility bills between roommates", "Payment for freelance design work"]
+PHRASES = ["ok", "Thanks", "I agree", "No, that's not what happened.", "Can you send the receipt?",
+           "I already sent the photos.", "That is unfair.", "Let's meet halfway.", "I'm willing to compromise.",
+           "When will I get the money back?", "I paid in full last month.", "Please check the invoice again.",
+           "This is ridiculous, you are a liar!", "Sounds good to me.", "I need to think about it."]
+
+
+def synthetic_rows(disputes: int, seed: int = 11) -> list:
+    """Generated traffic: stock phrases, some with irregular spacing or a unique order number"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    rows = []
+    for d in range(disputes):
+        dispute_id = f"dispute-{d}"
+        when = start + timedelta(minutes=rng.randrange(60 * 24 * 90))
+        for i in range(rng.randrange(5, 40)):
+            when += timedelta(seconds=rng.randrange(20, 3600))
+            content = rng.choice(PHRASES)
+            if rng.random() < 0.15:
+                content = content.replace(" ", "  ", 1) + " "
+            if rng.random() < 0.25:
+                content += f" Order #{rng.randrange(10**5)}."
+            rows.append(Row(dispute_id, f"user-{d}-{i % 2}", "user", content, when))
+    rows.sort(key=lambda row: row.created_at)
+    return rows
+
+
+def database_rows(limit: int) -> tuple:
+    """(public ChatMessageLog rows in time order, {dispute_id: description})"""
+    from sqlalchemy.exc import SQLAlchemyError
+
+    try:
+        from database import ChatMessageLog, Dispute as DisputeRow, SessionLocal
+    except Exception as e:  # A broken model module fails with ImportError or a SQLAlchemy mapping error
+        print(f"Could not load the database models ({e.__class__.__name__}: {e}); using generated traffic")
+        return [], {}
+
+    db = SessionLocal()
+    try:
+        rows = (db.query(ChatMessageLog).filter(ChatMessageLog.is_private == False)  # noqa: E712
+                .order_by(ChatMessageLog.created_at).limit(limit).all())
+        rows = [Row(r.dispute_id, r.sender_id, r.sender_role, r.content, r.created_at) for r in rows]
+    except SQLAlchemyError as e:
+        print(f"Could not read chat_messages ({e.__class__.__name__}); using generated traffic")
+        db.close()
+        return [], {}
+    try:
+        descriptions = dict(db.query(DisputeRow.id, DisputeRow.description).all()) if rows else {}
+    except SQLAlchemyError:
+        db.rollback()
+        descriptions = {}  # Stock descriptions are used instead
+    finally:
+        db.close()
+    return rows, descriptions
+
+
+def requests_for(rows: list, descriptions: dict, guidance_every: int):
+    """Yield (kind, request kwargs) in replay order"""
+    from dispute_models import Dispute, MediationMessage
+    from mediation_agents import AnalystAgent, FacilitatorAgent, MediatorAgent
+
+    mediator, analyst, facilitator = MediatorAgent(), AnalystAgent(), FacilitatorAgent()
+    disputes = {}
+    for row in rows:
+        dispute = disputes.get(row.dispute_id)
+        if dispute is None:
+            description = descriptions.get(row.dispute_id) or DESCRIPTIONS[zlib.crc32(row.dispute_id.encode()) % len(DESCRIPTIONS)]
+            dispute = disputes[row.dispute_id] = Dispute(title="Dispute", description=description,
+                                                         category="general", created_by=row.sender_id,
+                                                         created_at=row.created_at)
+        message = MediationMessage(dispute_id=dispute.id, sender_id=row.sender_id, sender_type=row.sender_role,
+                                   content=row.content, timestamp=row.created_at)
+        dispute.add_message(message)
+        if row.sender_role != "user":
+            continue
+        yield "facilitation", mediator.build_openai_request(mediator.facilitation_prompt([message]),
+                                                            context=dispute.description)
+        prompt = analyst.sentiment_prompt(dispute.messages)
+        if prompt is not None:
+            yield "sentiment", analyst.build_openai_request(prompt)
+        if guidance_every and len(dispute.messages) % guidance_every == 0:
+            yield "guidance", facilitator.build_openai_request(facilitator.guidance_prompt(dispute),
+                                                               context=dispute.description)
+
+
+def raw_key(request: dict) -> str:
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=50000, help="max ChatMessageLog rows to replay")
+    parser.add_argument("--synthetic", type=int, default=0, help="replay this many generated disputes instead")
+    parser.add_argument("--thresholds", default="0.8,0.9", help="comma-separated similarity thresholds")
+    parser.add_argument("--guidance-every", type=int, default=10, help="0 = no guidance requests")
+    args = parser.parse_args()
+
+    from llm_cache import ShingleIndex, request_shingles, response_cache_key
+
+    rows, descriptions = ([], {}) if args.synthetic else database_rows(args.limit)
+    source = f"{len(rows)} ChatMessageLog rows"
+    if not rows:
+        rows = synthetic_rows(args.synthetic or 200)
+        source = f"{len(rows)} generated messages"
+
+    thresholds = [float(t) for t in args.thresholds.split(",") if t]
+    strategies = ["raw", "canonical"] + [f"~{t:g}" for t in thresholds]
+    seen = {"raw": set(), "canonical": set()}
+    indexes = {f"~{t:g}": ShingleIndex(t, max_entries=10**9) for t in thresholds}
+    lookups, hits = Counter(), Counter()
+    for kind, request in requests_for(rows, descriptions, args.guidance_every):
+        lookups[kind] += 1
+        keys = {"raw": raw_key(request), "canonical": response_cache_key(**request)}
+        for strategy in ("raw", "canonical"):
+            if keys[strategy] in seen[strategy]:
+                hits[kind, strategy] += 1
+            seen[strategy].add(keys[strategy])
+        config, shingles = request_shingles(**request)
+        for strategy, index in indexes.items():
+            if keys["canonical"] in index or index.lookup(config, shingles):
+                hits[kind, strategy] += 1
+            index.add(keys["canonical"], config, shingles)
+
+    print(f"Replayed {source}, {sum(lookups.values())} LLM requests\n")
+    print(f"{'prompt':>13} {'requests':>9}" + "".join(f" {s:>10}" for s in strategies))
+    for kind in ["facilitation", "sentiment", "guidance", None]:
+        count = sum(lookups.values()) if kind is None else lookups[kind]
+        if not count:
+            continue
+        rates = [sum(hits[k, s] for k in lookups) if kind is None else hits[kind, s] for s in strategies]
+        print(f"{kind or 'all':>13} {count:>9}" + "".join(f" {r / count:>10.1%}" for r in rates))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark: APNs push throughput through PushDispatcher against a local fake APNs.
+
+Usage (from backend/):
+    python benchmarks/bench_push.py [--pushes 500] [--latency-ms 20] [--concurrency 1,10,50]
+
+Starts a fake APNs server on localhost that answers POST /3/device/<token>
+after `--latency-ms`. It answers 200, or 400 BadDeviceToken for tokens
+starting with "bad". It checks that the provider JWT and apns-topic headers
+are present. For each concurrency level the script queues `--pushes` alerts and
+reports wall time, pushes/s and the dispatcher counters. The fake server runs
+HTTP/1.1, so HTTP/2 is disabled here.
+"""
+
+import argparse
+import asyncio
+import base64
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from push_service import PushDispatcher
+
+
+def fake_apns(latency: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/3/device/{token}")
+    async def push(token: str, request: Request):
+        await asyncio.sleep(latency)
+        if not request.headers.get("authorization", "").startswith("bearer ") or not request.headers.get("apns-topic"):
+            return JSONResponse({"reason": "MissingProviderToken"}, status_code=403)
+        if token.startswith("bad"):
+            return JSONResponse({"reason": "BadDeviceToken"}, status_code=400)
+        return JSONResponse({})
+
+    return app
+
+
+def serve(app: FastAPI) -> str:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+def p8_key_base64() -> str:
+    key = ec.generate_private_key(ec.SECP256R1())
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    return base64.b64encode(pem).decode()
+
+
+async def run(endpoint: str, key: str, pushes: int, concurrency: int):
+    dispatcher = PushDispatcher(key_id="KEYID", team_id="TEAMID", key_base64=key, topic="ai.mediation.app",
+                                endpoint=endpoint, concurrency=concurrency, queue_size=pushes, http2=False)
+    dispatcher.start()
+    tokens = [("bad" if i % 50 == 0 else "tok") + str(i) for i in range(pushes)]
+    start = time.perf_counter()
+    dispatcher.enqueue(tokens, "Dispute Update", "bench")
+    await dispatcher.drain()
+    elapsed = time.perf_counter() - start
+    metrics = dispatcher.metrics()
+    await dispatcher.stop()
+    return elapsed, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pushes", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--concurrency", default="1,10,50", help="comma-separated worker counts")
+    args = parser.parse_args()
+
+    logging.getLogger("push_service").setLevel(logging.ERROR)  # rejected "bad" tokens are expected
+    endpoint = serve(fake_apns(args.latency_ms / 1000))
+    key = p8_key_base64()
+    print(f"{'workers':>8} {'wall s':>8} {'push/s':>8} {'sent':>6} {'failed':>7} {'unregistered':>13}")
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        elapsed, m = asyncio.run(run(endpoint, key, args.pushes, concurrency))
+        print(f"{concurrency:>8} {elapsed:>8.2f} {args.pushes / elapsed:>8.0f} {m['sent']:>6} {m['failed']:>7} {m['unregistered']:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request overhead of RateLimitMiddleware (memory backend).
+
+Usage (from backend/):
+    python benchmarks/bench_rate_limit.py [--requests 100000] [--users 1000]
+
+Calls a bare ASGI app directly, with and without the middleware, so the
+difference is the middleware's own cost. Three cases are timed:
+  unmatched  GET on a route with no bucket (the common read path)
+  user       POST /api/clashes/{id}/vote with a bearer token (per-user bucket)
+  ip         POST /api/auth/request-code (per-IP bucket, X-Forwarded-For)
+Limits are raised so nothing is rejected. A final check drives one IP past its
+request-code limit and prints the 429 and its Retry-After.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auth import create_access_token
+from rate_limit import ROUTE_LIMITS, RateLimiter, RateLimitMiddleware, RouteLimit
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def scope(method: str, path: str, headers=()):
+    return {"type": "http", "method": method, "path": path, "headers": list(headers), "client": ("10.0.0.1", 5000)}
+
+
+async def timed(app, scopes) -> tuple:
+    statuses = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    start = time.perf_counter()
+    for s in scopes:
+        await app(s, receive, send)
+    return (time.perf_counter() - start) / len(scopes) * 1e6, statuses
+
+
+async def main_async(requests: int, users: int):
+    tokens = [create_access_token({"sub": f"user-{i}"}).encode() for i in range(users)]
+    roomy = {route: RouteLimit(10**9, 1, limit.scope) for route, limit in ROUTE_LIMITS.items()}
+    limited = RateLimitMiddleware(bare_app, RateLimiter(RouteLimit(10**9, 1), roomy))
+
+    cases = {
+        "unmatched": [scope("GET", "/api/feed") for _ in range(requests)],
+        "user": [scope("POST", f"/api/clashes/c{i % 50}/vote", [(b"authorization", b"Bearer " + tokens[i % users])])
+                 for i in range(requests)],
+        "ip": [scope("POST", "/api/auth/request-code", [(b"x-forwarded-for", f"203.0.113.{i % 250}".encode())])
+               for i in range(requests)],
+    }
+    print(f"{'case':>10} {'bare µs':>8} {'limited µs':>11} {'overhead µs':>12}   ({requests} requests)")
+    for name, scopes in cases.items():
+        await timed(limited, scopes[:1000])  # warm the token cache
+        bare, _ = await timed(bare_app, scopes)
+        with_limit, statuses = await timed(limited, scopes)
+        assert set(statuses) == {200}, statuses[:5]
+        print(f"{name:>10} {bare:>8.2f} {with_limit:>11.2f} {with_limit - bare:>12.2f}")
+
+    strict = RateLimitMiddleware(bare_app, RateLimiter(RouteLimit(100, 60), ROUTE_LIMITS))
+    flood = [scope("POST", "/api/auth/request-code", [(b"x-forwarded-for", b"198.51.100.7")]) for _ in range(8)]
+    headers = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            headers.append((message["status"], dict(message["headers"]).get(b"retry-after")))
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    for s in flood:
+        await strict(s, receive, send)
+    print("\nrequest-code flood from one IP:", ", ".join(f"{status}" + (f" (Retry-After {ra.decode()})" if ra else "")
+                                                   for status, ra in headers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.requests, args.users))
+
+
+if __name__ == "__main__":
+    main()
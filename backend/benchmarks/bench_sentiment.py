@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sentiment scoring on the message-send path – LLM completion vs local running scorer.
+
+Usage (from backend/):
+    python benchmarks/bench_sentiment.py [--messages 200] [--llm-delay 0.2]
+
+Replays a synthetic conversation, mixing collaborative, neutral and hostile
+messages, into a Dispute one message at a time. Two paths are timed:
+  llm    AnalystAgent.refine_sentiment(messages), which is what
+         handle_dispute_message did on every message. It runs against the fake
+         OpenAI server from bench_llm_concurrency (`--llm-delay` s per completion).
+  local  Dispute.sentiment_score(): one incremental lexicon update per message
+The script reports the mean cost per message and the LLM calls for each path.
+It also reports how many messages would still go to the LLM with
+SENTIMENT_LLM_REFINE=true, i.e. scores within SENTIMENT_REFINE_MARGIN of the
+intervention threshold.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_llm_concurrency import start_fake_llm
+
+MESSAGES = {
+    "collaborative": ["Thank you, I appreciate you looking at the photos.", "I'm willing to compromise on the cleaning fee.",
+                      "That sounds good, let's meet halfway on the deposit.", "I understand your point about the carpet."],
+    "neutral": ["The lease ended on the 30th and I returned the keys.", "I paid the deposit by bank transfer in March.",
+                "Can we go through the inventory list item by item?", "The invoice is attached as evidence."],
+    "hostile": ["This is ridiculous, you are a liar!", "Keeping the whole deposit is completely unfair.",
+                "I will NEVER accept this, it's a waste of my time.", "You're dishonest and I'll see you in court."],
+}
+
+
+def conversation(length: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    mood = "neutral"
+    lines = []
+    for _ in range(length):
+        if rng.random() < 0.08:
+            mood = rng.choice(list(MESSAGES))
+        lines.append(rng.choice(MESSAGES[mood]) + f" ({rng.randrange(10**6)})")
+    return lines
+
+
+async def replay(lines: list, path: str, analyst) -> tuple:
+    from dispute_models import Dispute, MediationMessage
+
+    dispute = Dispute(title="Deposit", description="Deposit not returned", category="property", created_by="user-a")
+    scores, elapsed = [], 0.0
+    for i, line in enumerate(lines):
+        dispute.add_message(MediationMessage(dispute_id=dispute.id, sender_id="user-a" if i % 2 else "user-b",
+                                             sender_type="user", content=line))
+        start = time.perf_counter()
+        if path == "llm":
+            score = await analyst.refine_sentiment(dispute.messages)
+        else:
+            score = dispute.sentiment_score()
+        elapsed += time.perf_counter() - start
+        scores.append(score)
+    return elapsed / len(lines), scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--llm-delay", type=float, default=0.2, help="seconds the fake LLM takes per completion")
+    args = parser.parse_args()
+
+    os.environ["OPENAI_API_KEY"] = "fake-key"
+    os.environ["OPENAI_BASE_URL"] = start_fake_llm(args.llm_delay)
+    os.environ.setdefault("ENABLE_AI_RESPONSE_CACHING", "false")
+
+    from ai_cost_controller import NEGATIVE_SENTIMENT_THRESHOLD
+    from config import settings
+    from llm_clients import llm_clients
+    from mediation_agents import AnalystAgent
+
+    lines = conversation(args.messages)
+    analyst = AnalystAgent()
+    print(f"{args.messages} messages, fake LLM {args.llm_delay}s per completion\n")
+    print(f"{'path':>6} {'per message':>12} {'LLM calls':>10}")
+    results = {}
+    for path in ("llm", "local"):
+        calls_before = llm_clients.metrics()["calls"]
+        per_message, scores = asyncio.run(replay(lines, path, analyst))
+        results[path] = per_message
+        calls = llm_clients.metrics()["calls"] - calls_before
+        unit = f"{per_message * 1000:.2f} ms" if per_message >= 1e-3 else f"{per_message * 1e6:.1f} µs"
+        print(f"{path:>6} {unit:>12} {calls:>10}")
+
+    borderline = sum(abs(s - NEGATIVE_SENTIMENT_THRESHOLD) < settings.sentiment_refine_margin for s in scores)
+    negative = sum(s < NEGATIVE_SENTIMENT_THRESHOLD for s in scores)
+    print(f"\nlocal is {results['llm'] / results['local']:,.0f}x cheaper per message")
+    print(f"below the intervention threshold ({NEGATIVE_SENTIMENT_THRESHOLD}): {negative} of {len(scores)} messages")
+    print(f"borderline (would be refined with SENTIMENT_LLM_REFINE=true): {borderline} of {len(scores)} messages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark: serialising a full dispute – FastAPI's default encoder vs FastJSONResponse,
+plus the bytes on the wire with gzip/brotli.
+
+Usage (from backend/):
+    python benchmarks/bench_serialization.py [--sizes 10,1000,10000] [--repeat 5]
+
+Builds a Dispute with N messages, N/100 + 1 evidence items (1 KB of text each)
+and a few proposals. It then times:
+  default    jsonable_encoder + JSONResponse (what `return dispute` did)
+  fast       FastJSONResponse(dispute)  (pydantic's Rust serializer)
+It checks that both produce the same JSON, and reports the body size raw,
+gzip-encoded and, if brotli is installed, brotli-encoded, along with the
+time taken to compress.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from dispute_models import (Dispute, DisputeParticipant, Evidence, EvidenceType, MediationMessage,
+                            ParticipantRole, ResolutionProposal, ResolutionType)
+from response_encoding import BROTLI_AVAILABLE, FastJSONResponse, compress
+
+
+def build_dispute(messages: int) -> Dispute:
+    dispute = Dispute(title="Security deposit", description="Landlord kept the deposit " * 5,
+                      category="property", created_by="user-a")
+    dispute.participants = [
+        DisputeParticipant(user_id=u, dispute_id=dispute.id, role=role, username=u, email=f"{u}@example.com")
+        for u, role in (("user-a", ParticipantRole.COMPLAINANT), ("user-b", ParticipantRole.RESPONDENT))
+    ]
+    dispute.messages = [
+        MediationMessage(dispute_id=dispute.id, sender_id="user-a" if i % 2 else "user-b", sender_type="user",
+                         content=f"Message {i}: I paid the deposit on time and the flat was left clean, see photos.",
+                         is_private=i % 10 == 0, recipient_id="user-b" if i % 10 == 0 else None)
+        for i in range(messages)
+    ]
+    dispute.evidence = [
+        Evidence(dispute_id=dispute.id, submitted_by="user-a", title=f"Receipt {i}", description="Bank transfer",
+                 evidence_type=EvidenceType.DOCUMENT, content="Transfer reference 0042 " * 40)
+        for i in range(messages // 100 + 1)
+    ]
+    dispute.proposals = [
+        ResolutionProposal(dispute_id=dispute.id, proposed_by="ai_mediator", resolution_type=ResolutionType.MONETARY,
+                           title=f"Split {i}", description="Return part of the deposit", terms=["Refund", "Close"],
+                           monetary_amount=500.0 + i)
+        for i in range(3)
+    ]
+    return dispute
+
+
+def best_ms(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,10000", help="comma-separated message counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    encodings = ["gzip"] + (["br"] if BROTLI_AVAILABLE else [])
+    header = f"{'messages':>9} {'default ms':>11} {'fast ms':>8} {'raw KB':>8}"
+    for enc in encodings:
+        header += f" {enc + ' KB':>8} {enc + ' ms':>7}"
+    print(header)
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        dispute = build_dispute(size)
+        default_body = JSONResponse(jsonable_encoder(dispute)).body
+        fast_body = FastJSONResponse(dispute).body
+        assert json.loads(default_body) == json.loads(fast_body), "FastJSONResponse output differs"
+
+        default_ms = best_ms(lambda: JSONResponse(jsonable_encoder(dispute)).body, args.repeat)
+        fast_ms = best_ms(lambda: FastJSONResponse(dispute).body, args.repeat)
+        row = f"{size:>9} {default_ms:>11.2f} {fast_ms:>8.2f} {len(fast_body) / 1024:>8.1f}"
+        for enc in encodings:
+            compressed = compress(fast_body, enc)
+            row += f" {len(compressed) / 1024:>8.1f} {best_ms(lambda: compress(fast_body, enc), args.repeat):>7.2f}"
+        print(row)
+
+    if not BROTLI_AVAILABLE:
+        print("\n(brotli not installed – `pip install brotli` to include br)")
+
+
+if __name__ == "__main__":
+    main()
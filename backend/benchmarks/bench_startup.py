@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark: API cold start – `import mediation_api` and time to first response.
+
+Usage (from backend/):
+    python benchmarks/bench_startup.py [--runs 5] [--budget-ms 1500] [--top 10]
+
+Each run starts a fresh interpreter, as a serverless cold start would. It
+times `import mediation_api`, then runs the startup hooks and serves
+`GET /api/health` through FastAPI's TestClient. The script reports median
+and worst times, and lists the slowest top-level imports from one
+`-X importtime` run.
+
+The run fails (exit status 1) when the median time to first response exceeds
+`--budget-ms`, or when startup loads a provider SDK that is supposed to load
+lazily (openai, anthropic, stripe, plaid, firebase_admin, sentry_sdk). It can
+be used as a CI gate.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_SDKS = ["openai", "anthropic", "stripe", "plaid", "firebase_admin", "sentry_sdk"]
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import mediation_api
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(mediation_api.app) as client:
+    status = client.get("/api/health").status_code
+    responded = time.perf_counter()
+    loaded = [m for m in %r if m in sys.modules]
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_response_ms": (responded - start) * 1000,
+                  "status": status, "sdks_loaded": loaded}))
+""" % (LAZY_SDKS,)
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_startup.db')}")
+    env.setdefault("UPSTASH_LOCAL", "1")  # no network calls during startup
+    env["PYTHONPATH"] = BACKEND + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def run_once(env: dict) -> dict:
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=BACKEND, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        sys.exit(f"import mediation_api failed:\n{out.stderr[-2000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env: dict, top: int):
+    """Top-level modules pulled in by `import mediation_api`, by cumulative import time"""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import mediation_api"],
+                         cwd=BACKEND, env=env, capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Direct imports of mediation_api are indented by exactly three spaces
+        if name.startswith("   ") and not name.startswith("    ") and cumulative.strip().isdigit():
+            rows.append((int(cumulative) / 1000, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500, help="max median time to first response")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list (0 to skip)")
+    args = parser.parse_args()
+
+    env = child_env()
+    results = [run_once(env) for _ in range(args.runs)]
+    imports = [r["import_ms"] for r in results]
+    firsts = [r["first_response_ms"] for r in results]
+
+    print(f"{'':>20} {'median ms':>10} {'max ms':>8}   ({args.runs} cold starts)")
+    print(f"{'import':>20} {statistics.median(imports):>10.0f} {max(imports):>8.0f}")
+    print(f"{'first response':>20} {statistics.median(firsts):>10.0f} {max(firsts):>8.0f}")
+
+    if args.top:
+        print("\nslowest imports of mediation_api:")
+        for ms, name in slowest_imports(env, args.top):
+            print(f"{ms:>10.1f} ms  {name}")
+
+    failures = []
+    if any(r["status"] != 200 for r in results):
+        failures.append("GET /api/health did not return 200")
+    if statistics.median(firsts) > args.budget_ms:
+        failures.append(f"median time to first response {statistics.median(firsts):.0f} ms > budget {args.budget_ms:.0f} ms")
+    eager = sorted({m for r in results for m in r["sdks_loaded"]})
+    if eager:
+        failures.append(f"SDKs loaded during startup: {', '.join(eager)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dispute WebSocket fan-out through WebSocketHub.
+
+Usage (from backend/):
+    python benchmarks/bench_ws_hub.py [--subscribers 1,100,10000] [--messages 20]
+
+Every subscriber is an in-memory fake socket. For each size the script reports
+the time spent inside `broadcast()` (serialise once + enqueue, which is what the
+request handler pays) and the time until every subscriber's writer has sent the
+frame. The "inline" column is the old pattern for comparison: json.dumps and
+an awaited send_text for each socket in turn.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ws_hub import WebSocketHub
+
+PAYLOAD = {
+    "type": "new_message",
+    "message": {"id": "m1", "sender_id": "u1", "content": "x" * 200, "timestamp": "2024-01-01T00:00:00"},
+}
+
+
+class FakeWebSocket:
+    def __init__(self, on_send):
+        self.on_send = on_send
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(0)  # yield like a real socket write would
+        self.on_send()
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def run(size: int, messages: int):
+    hub = WebSocketHub(queue_size=messages + 1)
+    received = 0
+    done = asyncio.Event()
+    target = 0
+
+    def on_send():
+        nonlocal received
+        received += 1
+        if received >= target:
+            done.set()
+
+    sockets = [FakeWebSocket(on_send) for _ in range(size)]
+    for ws in sockets:
+        hub.connect("bench", ws)
+
+    enqueue = deliver = 0.0
+    for _ in range(messages):
+        received, target = 0, size
+        done.clear()
+        start = time.perf_counter()
+        hub.broadcast("bench", PAYLOAD)
+        enqueue += time.perf_counter() - start
+        await done.wait()
+        deliver += time.perf_counter() - start
+
+    inline = 0.0
+    for _ in range(messages):
+        start = time.perf_counter()
+        for ws in sockets:
+            await ws.send_text(json.dumps(PAYLOAD))
+        inline += time.perf_counter() - start
+
+    for subscriber in [s for subs in hub._topics.values() for s in subs]:
+        hub.disconnect(subscriber)
+    return enqueue / messages, deliver / messages, inline / messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", default="1,100,10000", help="comma-separated subscriber counts")
+    parser.add_argument("--messages", type=int, default=20, help="broadcasts per size")
+    args = parser.parse_args()
+
+    print(f"{'subscribers':>11} {'broadcast ms':>13} {'all sent ms':>12} {'inline ms':>10}")
+    for size in [int(s) for s in args.subscribers.split(",")]:
+        enqueue, deliver, inline = asyncio.run(run(size, args.messages))
+        print(f"{size:>11} {enqueue * 1e3:>13.3f} {deliver * 1e3:>12.3f} {inline * 1e3:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import logging
 
-from database import get_db
-from auth import get_current_user
+from database import get_db, get_async_db, User as DBUser, Dispute as DBDispute
+from auth import get_current_user, get_current_user_async
 from dispute_models import Dispute
 from betting_models import (
     Bet, BetStatus, EscrowAccount, EscrowStatus, 
@@ -64,13 +65,13 @@ class WithdrawRequest(BaseModel):
 async def place_bet(
     request: PlaceBetRequest,
     background_tasks: BackgroundTasks,
-    current_user: dict = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: DBUser = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Place a bet on a dispute outcome"""
     
     # Check if dispute exists and is active
-    dispute = db.query(Dispute).filter_by(id=request.dispute_id).first()
+    dispute = await db.get(DBDispute, request.dispute_id)
     if not dispute:
         raise HTTPException(status_code=404, detail="Dispute not found")
     
@@ -78,11 +79,11 @@ async def place_bet(
         raise HTTPException(status_code=400, detail="Dispute is not accepting bets")
     
     # Get or create user wallet
-    wallet = db.query(UserWallet).filter_by(user_id=current_user["id"]).first()
+    wallet = (await db.execute(select(UserWallet).filter_by(user_id=current_user.id))).scalars().first()
     if not wallet:
-        wallet = UserWallet(user_id=current_user["id"])
+        wallet = UserWallet(user_id=current_user.id)
         db.add(wallet)
-        db.commit()
+        await db.commit()
     
     # Check wallet balance if using wallet payment
     if request.payment_method == "wallet":
@@ -90,19 +91,20 @@ async def place_bet(
             raise HTTPException(status_code=400, detail="Insufficient wallet balance")
         
         # Check daily/monthly limits
-        today_total = db.query(func.sum(Bet.amount)).filter(
-            Bet.user_id == current_user["id"],
+        today_total = (await db.execute(select(func.sum(Bet.amount)).where(
+            Bet.user_id == current_user.id,
             Bet.placed_at >= datetime.utcnow() - timedelta(days=1)
-        ).scalar() or 0
+        ))).scalar() or 0
         
         if today_total + request.amount > wallet.daily_limit:
             raise HTTPException(status_code=400, detail="Daily betting limit exceeded")
     
     # Get or create betting pool
-    pool = db.query(BettingPool).filter_by(dispute_id=request.dispute_id).first()
+    pool = (await db.execute(select(BettingPool).filter_by(dispute_id=request.dispute_id))).scalars().first()
     if not pool:
         pool = BettingPool(dispute_id=request.dispute_id)
         db.add(pool)
+        await db.flush()  # apply column defaults (amounts start at 0)
     
     # Calculate odds based on current pool
     if request.predicted_winner == "partyA":
@@ -118,7 +120,7 @@ async def place_bet(
     
     # Create bet record
     bet = Bet(
-        user_id=current_user["id"],
+        user_id=current_user.id,
         dispute_id=request.dispute_id,
         amount=request.amount,
         predicted_winner=request.predicted_winner,
@@ -128,6 +130,7 @@ async def place_bet(
         status=BetStatus.PENDING
     )
     db.add(bet)
+    await db.flush()  # assign bet.id before it is referenced below
     
     # Update pool totals
     pool.total_pool_amount += request.amount
@@ -145,7 +148,7 @@ async def place_bet(
         
         # Create transaction record
         transaction = Transaction(
-            user_id=current_user["id"],
+            user_id=current_user.id,
             wallet_id=wallet.id,
             type="bet",
             amount=-request.amount,
@@ -159,8 +162,8 @@ async def place_bet(
             "bet_id": bet.id,
             "amount": request.amount,
             "dispute_id": request.dispute_id,
-            "user_id": current_user["id"],
-            "buyer_email": current_user["email"]
+            "user_id": current_user.id,
+            "buyer_email": current_user.email
         }, provider=request.escrow_provider)
         
         escrow = EscrowAccount(
@@ -168,11 +171,12 @@ async def place_bet(
             provider=request.escrow_provider,
             provider_account_id=escrow_data.get("transaction_id"),
             total_amount=request.amount,
-            payer_user_id=current_user["id"],
+            payer_user_id=current_user.id,
             status=EscrowStatus.FUNDED,
             funded_at=datetime.utcnow()
         )
         db.add(escrow)
+        await db.flush()
         
         bet.escrow_id = escrow.id
         bet.status = BetStatus.ACTIVE
@@ -184,10 +188,11 @@ async def place_bet(
             dispute_id=request.dispute_id,
             provider=request.escrow_provider,
             total_amount=request.amount,
-            payer_user_id=current_user["id"],
+            payer_user_id=current_user.id,
             status=EscrowStatus.PENDING
         )
         db.add(escrow)
+        await db.flush()
         bet.escrow_id = escrow.id
         
         # Generate payment URL
@@ -197,7 +202,7 @@ async def place_bet(
             payment_method=request.payment_method,
             metadata={
                 "bet_id": bet.id,
-                "user_id": current_user["id"],
+                "user_id": current_user.id,
                 "dispute_id": request.dispute_id
             }
         )
@@ -206,7 +211,7 @@ async def place_bet(
         payment_url = payment_data["payment_url"]
         payment_required = True
     
-    db.commit()
+    await db.commit()
     
     # Schedule background task to monitor payment
     if payment_required:
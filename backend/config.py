@@ -1,4 +1,5 @@
 import os
+from typing import Dict
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -14,11 +15,29 @@ class Settings(BaseSettings):
     # Database Configuration
     database_url: str = "sqlite:///./legal_ai.db"
     vector_db_url: str = "http://localhost:8000"
+
+    # Database connection pool (per worker; Postgres only – SQLite keeps SQLAlchemy's default)
+    db_pool_size: int = 5  # Connections kept open
+    db_max_overflow: int = 10  # Extra connections opened under load, closed when returned
+    db_pool_timeout: int = 30  # Seconds to wait for a free connection before failing
+    db_pool_recycle: int = 1800  # Replace connections older than this (seconds)
+    db_pool_pre_ping: bool = True  # Test connections on checkout; drops ones the server closed
     
     # Application Settings
     secret_key: str = "legal-ai-secret-key-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+
+    # Authenticated-user cache (per worker)
+    auth_user_cache_size: int = 10000  # User rows kept, least recently used evicted first
+    auth_user_cache_ttl_seconds: int = 60  # Bounds staleness for changes made by other workers
+    auth_token_cache_size: int = 10000  # Decoded tokens kept (keyed by SHA-256 of the token)
+    auth_token_cache_ttl_seconds: int = 300  # Never beyond the token's own expiry
+
+    # Password hashing (bcrypt runs on a worker pool, off the event loop)
+    password_hash_workers: int = 0  # 0 = one per CPU core
+    password_hash_max_pending: int = 256  # Hash/verify calls queued beyond this get a 503
+    password_hash_use_processes: bool = False  # Process pool instead of threads (bcrypt already releases the GIL)
     debug: bool = True
     host: str = "0.0.0.0"
     port: int = 8000
@@ -30,9 +49,19 @@ class Settings(BaseSettings):
     enable_bias_detection: bool = True
     enable_fact_checking: bool = True
     
-    # Rate Limiting
+    # Rate Limiting (default bucket for mutating requests; see rate_limit.ROUTE_LIMITS)
     rate_limit_requests: int = 100
     rate_limit_minutes: int = 60
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"  # "memory" (per worker) or "kv" (shared via Upstash)
+    rate_limit_trust_forwarded: bool = False  # Take the client IP from X-Forwarded-For; only behind a proxy you run (e.g. Vercel)
+    rate_limit_proxy_hops: int = 1  # Trusted proxies appending to X-Forwarded-For; the client is this many entries from the right
+    rate_limit_overrides: Dict[str, str] = {}  # JSON, e.g. {"POST /api/disputes/{dispute_id}/messages": "30/60"}
+
+    # Response compression (brotli if installed, else gzip)
+    compression_min_size: int = 1024  # Bytes; smaller bodies are sent as-is
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4  # 0-11; 4 is close to gzip-6 speed with smaller output
     
     # AI Cost Control Settings
     max_ai_interventions_per_dispute: int = 3
@@ -45,6 +74,45 @@ class Settings(BaseSettings):
     ai_model_preference: str = "gpt-3.5-turbo"  # Cheaper than GPT-4
     enable_ai_response_caching: bool = True
 
+    # LLM response cache tiers (memory, then optional SQLite file, then optional shared KV)
+    llm_cache_ttl_seconds: int = 86400
+    llm_cache_max_entries: int = 5000  # Memory tier, least recently used evicted first...
+    llm_cache_max_bytes: int = 33554432  # ...or once cached responses exceed this many bytes (32 MiB)
+    llm_cache_sqlite_path: str = ""  # e.g. /tmp/llm_cache.db; empty = no disk tier
+    llm_cache_disk_max_entries: int = 100000
+    llm_cache_kv: bool = False  # Share cached responses across workers through Upstash
+    llm_cache_similarity_threshold: float = 0.0  # e.g. 0.9: serve near-duplicate prompts (Jaccard of word shingles); 0 = exact only
+
+    # LLM provider calls (shared async clients)
+    openai_base_url: str = ""  # e.g. a proxy or a local fake server; empty = the provider's API
+    anthropic_base_url: str = ""
+    llm_max_concurrency: int = 16  # In-flight completions per worker; further calls queue
+    llm_queue_timeout_seconds: float = 10.0  # Waiting longer than this for a slot fails the call
+    llm_timeout_seconds: float = 30.0  # Per call, SDK retries included
+    llm_max_retries: int = 1
+
+    # Sentiment: local lexicon scorer, optionally refined by the LLM near the intervention threshold
+    sentiment_half_life_messages: int = 7  # A message counts half as much after this many newer ones
+    sentiment_llm_refine: bool = False
+    sentiment_refine_margin: float = 0.15  # Only scores this close to the threshold are sent to the LLM
+
+    # Upstash dispute mirroring (delta events + periodic snapshots)
+    dispute_snapshot_every: int = 50  # Compact after this many delta events
+    dispute_snapshot_idle_seconds: int = 300  # ...or once a dispute has been quiet this long
+    kv_flush_interval_ms: int = 50  # Write-behind window; writes to one key within it coalesce
+    kv_flush_max_batch: int = 100  # Max commands per pipelined flush
+
+    # Real-time WebSocket fan-out
+    ws_send_queue_size: int = 100  # Per-connection outbound queue; overflowing clients are disconnected
+    pubsub_backend: str = "memory"  # "memory" (single worker) or "redis" (fan out across workers/nodes)
+    pubsub_redis_url: str = ""  # redis:// or rediss:// URL used when pubsub_backend = "redis"
+
+    # Buffered analytics writes (ChatMessageLog / ResolutionLog)
+    analytics_batch_size: int = 200  # Flush once this many rows are buffered...
+    analytics_flush_interval_ms: int = 500  # ...or at least this often
+    analytics_max_buffer: int = 10000  # Rows beyond this are dropped (and counted)
+    analytics_max_retries: int = 3  # Attempts per row before a failing batch is dropped
+
     # Observability
     sentry_dsn: str = ""  # Leave blank to disable
 
@@ -52,6 +120,12 @@ class Settings(BaseSettings):
     apns_key_id: str = ""
     apns_team_id: str = ""
     apns_key_base64: str = ""  # Base64-encoded .p8 content
+    apns_bundle_id: str = ""  # apns-topic, i.e. the iOS app's bundle id
+    apns_use_sandbox: bool = False
+    apns_endpoint: str = ""  # Override the APNs host (e.g. a local fake for testing)
+    push_max_concurrency: int = 10  # Pushes in flight at once
+    push_queue_size: int = 10000  # Queued pushes beyond this are dropped
+    push_drain_timeout_seconds: float = 10.0  # On shutdown, wait this long for queued pushes to be sent
 
     # Bank Connection (Plaid)
     plaid_client_id: str = ""
@@ -67,13 +141,19 @@ class Settings(BaseSettings):
 settings = Settings()
 
 # ---------------- Firebase admin init -----------------
+# Imported and initialised on first use (only Firebase phone signup needs it),
+# so the SDK stays off the cold-start path.
 import os, json
-try:
-    import firebase_admin
-    from firebase_admin import credentials
+
+def get_firebase_auth():
+    """firebase_admin.auth, initialising the app on first call; None if firebase-admin isn't installed"""
+    try:
+        import firebase_admin
+        from firebase_admin import auth, credentials
+    except ImportError:
+        # firebase-admin not installed – optional dependency
+        return None
     if not firebase_admin._apps and os.getenv("FIREBASE_SA_JSON"):
         cred = credentials.Certificate(json.loads(os.getenv("FIREBASE_SA_JSON")))
         firebase_admin.initialize_app(cred)
-except ImportError:
-    # firebase-admin not installed – optional dependency
-    pass
\ No newline at end of file
+    return auth
\ No newline at end of file
@@ -1,9 +1,8 @@
-import openai
-import anthropic
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 from config import settings
 from dispute_models import Dispute, ResolutionProposal, ResolutionType
+from llm_clients import llm_clients
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,31 +10,15 @@ logger = logging.getLogger(__name__)
 class ContractGenerator:
     """AI-powered contract generation for dispute resolutions"""
     
-    def __init__(self):
-        self._openai_client = None
-        self._anthropic_client = None
-    
     @property
     def openai_client(self):
-        """Lazy initialization of OpenAI client"""
-        if self._openai_client is None and settings.openai_api_key:
-            try:
-                self._openai_client = openai.OpenAI(api_key=settings.openai_api_key)
-            except Exception as e:
-                logger.error(f"Failed to initialize OpenAI client: {e}")
-                return None
-        return self._openai_client
+        """Shared async OpenAI client (None if not configured)"""
+        return llm_clients.openai
     
     @property
     def anthropic_client(self):
-        """Lazy initialization of Anthropic client"""
-        if self._anthropic_client is None and settings.anthropic_api_key:
-            try:
-                self._anthropic_client = anthropic.Anthropic(api_key=settings.anthropic_api_key)
-            except Exception as e:
-                logger.error(f"Failed to initialize Anthropic client: {e}")
-                return None
-        return self._anthropic_client
+        """Shared async Anthropic client (None if not configured)"""
+        return llm_clients.anthropic
     
     async def generate_contract(self, dispute: Dispute, resolution: ResolutionProposal) -> str:
         """Generate a legally binding contract based on dispute resolution"""
@@ -128,7 +111,7 @@ Format the contract with proper legal structure, numbered sections, and clear la
     
     async def _generate_openai_contract(self, prompt: str) -> str:
         """Generate contract using OpenAI"""
-        response = self.openai_client.chat.completions.create(
+        response = await llm_clients.chat(
             model="gpt-4-1106-preview",
             messages=[
                 {
@@ -145,7 +128,7 @@ Format the contract with proper legal structure, numbered sections, and clear la
     
     async def _generate_anthropic_contract(self, prompt: str) -> str:
         """Generate contract using Anthropic Claude"""
-        response = self.anthropic_client.messages.create(
+        response = await llm_clients.claude(
             model="claude-3-sonnet-20240229",
             max_tokens=2000,
             temperature=0.3,
@@ -1,11 +1,16 @@
-from sqlalchemy import create_engine, Column, String, DateTime, Boolean, Float, Text, Integer, ForeignKey, text
+from sqlalchemy import create_engine, exc, Column, String, DateTime, Boolean, Float, Text, Integer, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from datetime import datetime
+import time
 import uuid
 import os
 
+from config import settings
+
 # Always use a writable SQLite file in /tmp to avoid read-only FS errors on serverless platforms
 default_sqlite_path = "/tmp/mediationai.db"
 raw_url = os.getenv("DATABASE_URL", f"sqlite:///{default_sqlite_path}")
@@ -44,23 +49,142 @@ print("📡 DATABASE_URL ->", MASKED_DATABASE_URL)
 if DATABASE_URL.startswith("postgresql") and "sslmode" not in DATABASE_URL:
     DATABASE_URL += "?sslmode=require"
 
-# Create SQLAlchemy engine *before* attempting any connection tests
+# ---------------- Connection pool -----------------
+# Nothing connects at import time: the first query opens the first connection,
+# so cold starts (e.g. the serverless entry in main.py) don't pay a round trip.
+
+class PoolStats:
+    """How often and how long callers waited to check a connection out of the pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        if timed_out:
+            self.timeouts += 1
+        else:
+            self.checkouts += 1
+            self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+class _TimedPoolMixin:
+    """Times every checkout (queueing for a free slot plus opening a new connection)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return conn
+
+    def recreate(self):
+        # engine.dispose() swaps in a fresh pool; keep the counters
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_options(url: str, poolclass) -> dict:
+    """Pool arguments for create_engine; SQLite keeps SQLAlchemy's default pool"""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
 if DATABASE_URL.startswith("sqlite"):
     engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 else:
-    engine = create_engine(DATABASE_URL)
-
-# Test connection after engine is created
-try:
-    with engine.connect() as conn:
-        conn.execute(text("SELECT 1"))
-    print("✅ Database connection successful")
-except Exception as conn_err:
-    print("❌ Database connection failed:", conn_err)
+    engine = create_engine(DATABASE_URL, **_pool_options(DATABASE_URL, TimedQueuePool))
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# ---------------- Async mode -----------------
+# Hot async endpoints use an AsyncSession so queries don't block the event loop.
+# Same database, async driver: aiosqlite for SQLite, asyncpg for Postgres.
+
+def _async_url(url: str):
+    """Map the sync DATABASE_URL onto its async driver; returns (url, connect_args)"""
+    if url.startswith("sqlite"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1), {}
+    if url.startswith("postgres"):
+        # asyncpg doesn't understand libpq's ?sslmode=...; pass it as the `ssl` connect arg
+        base, _, query = url.partition("?")
+        params = [p for p in query.split("&") if p]
+        sslmode = next((p.split("=", 1)[1] for p in params if p.startswith("sslmode=")), None)
+        rest = "&".join(p for p in params if not p.startswith("sslmode="))
+        base = base.replace("postgresql://", "postgresql+asyncpg://", 1).replace("postgres://", "postgresql+asyncpg://", 1)
+        return base + (f"?{rest}" if rest else ""), ({"ssl": sslmode} if sslmode and sslmode != "disable" else {})
+    return url, {}
+
+ASYNC_DATABASE_URL, _async_connect_args = _async_url(DATABASE_URL)
+_async_engine = None
+AsyncSessionLocal = None
+
+def get_async_engine():
+    """Create the async engine on first use (the async driver is only needed if async endpoints are hit)"""
+    global _async_engine, AsyncSessionLocal
+    if _async_engine is None:
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, connect_args=_async_connect_args,
+                                            **_pool_options(ASYNC_DATABASE_URL, TimedAsyncQueuePool))
+        AsyncSessionLocal = sessionmaker(_async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+def _describe_pool(pool) -> dict:
+    info = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        info.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": settings.db_max_overflow,
+        })
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        info.update(stats.snapshot())
+    return info
+
+def pool_stats() -> dict:
+    """Checked-out / overflow connections and checkout wait times for each engine in use"""
+    stats = {"sync": _describe_pool(engine.pool)}
+    if _async_engine is not None:
+        stats["async"] = _describe_pool(_async_engine.sync_engine.pool)
+    return stats
+
 # Create Base class
 Base = declarative_base()
 
@@ -224,7 +348,7 @@ class ResolutionLog(Base):
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
 # Import all models to ensure they're registered with Base
-from dispute_models import *
+# (dispute_models is pydantic-only; star-importing it would shadow User/Dispute above)
 from social_models import *
 from betting_models import *
 
@@ -236,6 +360,12 @@ def get_db():
     finally:
         db.close()
 
+# Async database dependency
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # Create tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
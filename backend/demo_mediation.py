@@ -64,13 +64,7 @@ MOCK_MEDIATION_RESPONSES = {
     MONETARY AWARD: $1,800 to be paid within 30 days
     
     This decision is final and binding on both parties.
-    """,
-    
-    "sentiment_analysis": {
-        "positive_indicators": ["thank you", "appreciate", "understand", "agree", "willing", "compromise"],
-        "negative_indicators": ["unfair", "ridiculous", "never", "impossible", "waste", "stupid"],
-        "neutral_indicators": ["however", "but", "although", "consider", "perhaps", "maybe"]
-    }
+    """
 }
 
 def setup_mock_environment():
@@ -213,8 +207,8 @@ class MockAnalystAgent(MockMediationAgent):
     async def analyze_dispute(self, dispute: Dispute) -> MediationAnalytics:
         await asyncio.sleep(1)
         
-        # Simple sentiment analysis
-        sentiment_score = self._analyze_sentiment(dispute.messages)
+        # Local lexicon sentiment (sentiment.py)
+        sentiment_score = dispute.sentiment_score()
         
         # Mock escalation risk
         escalation_risk = min(0.8, len(dispute.messages) * 0.05)
@@ -232,30 +226,6 @@ class MockAnalystAgent(MockMediationAgent):
             escalation_risk=escalation_risk,
             resolution_probability=resolution_probability
         )
-    
-    def _analyze_sentiment(self, messages: List[MediationMessage]) -> float:
-        """Simple sentiment analysis"""
-        if not messages:
-            return 0.0
-        
-        positive_count = 0
-        negative_count = 0
-        
-        for message in messages[-10:]:  # Last 10 messages
-            content = message.content.lower()
-            
-            for indicator in MOCK_RESPONSES["sentiment_analysis"]["positive_indicators"]:
-                if indicator in content:
-                    positive_count += 1
-            
-            for indicator in MOCK_RESPONSES["sentiment_analysis"]["negative_indicators"]:
-                if indicator in content:
-                    negative_count += 1
-        
-        if positive_count + negative_count == 0:
-            return 0.0
-        
-        return (positive_count - negative_count) / (positive_count + negative_count)
 
 class MockMediationOrchestrator:
     def __init__(self):
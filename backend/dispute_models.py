@@ -1,9 +1,12 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import List, Optional, Dict, Any, Callable, Sequence, Tuple
 from datetime import datetime
 from enum import Enum
+from bisect import bisect_left, bisect_right
 import uuid
 
+from sentiment import RunningSentiment
+
 class DisputeStatus(str, Enum):
     CREATED = "created"
     PARTIES_JOINED = "parties_joined"
@@ -130,6 +133,149 @@ class ResolutionProposal(BaseModel):
     rejected_by: List[str] = []  # User IDs who rejected
     is_final: bool = False
 
+class MessageVisibilityIndex:
+    """Incremental index over `Dispute.messages` for keyset pagination.
+
+    Holds message positions for public messages and, per viewer, the private
+    messages they sent or received. Both lists are append-only and sorted, so a
+    page is assembled with a couple of bisects instead of filtering the whole
+    history. Messages assigned without `add_message` (e.g. a snapshot reload)
+    are picked up lazily on the next `sync`; a replaced list (any length) is
+    reindexed from scratch.
+    """
+
+    def __init__(self):
+        self._source: Optional[List[MediationMessage]] = None
+        self._indexed = 0
+        self._positions: Dict[str, int] = {}
+        self._timestamps: List[datetime] = []
+        self._public: List[int] = []
+        self._private: Dict[str, List[int]] = {}
+
+    def sync(self, messages: List[MediationMessage]):
+        if messages is not self._source or len(messages) < self._indexed:
+            self.__init__()  # History was replaced – rebuild
+            self._source = messages
+        for position in range(self._indexed, len(messages)):
+            self._append(position, messages[position])
+        self._indexed = len(messages)
+
+    def _append(self, position: int, message: MediationMessage):
+        self._positions[message.id] = position
+        self._timestamps.append(message.timestamp)
+        if not message.is_private:
+            self._public.append(position)
+            return
+        for viewer in {message.sender_id, message.recipient_id}:
+            if viewer:
+                self._private.setdefault(viewer, []).append(position)
+
+    def resolve_cursor(self, cursor: str, after: bool) -> int:
+        """Map a message id or ISO timestamp to an exclusive boundary position"""
+        if cursor in self._positions:
+            return self._positions[cursor]
+        timestamp = datetime.fromisoformat(cursor)  # ValueError for unknown cursors
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone().replace(tzinfo=None)
+        if after:
+            return bisect_right(self._timestamps, timestamp) - 1
+        return bisect_left(self._timestamps, timestamp)
+
+    def page(self, viewer: Optional[str], limit: int, before: Optional[int] = None,
+             after: Optional[int] = None) -> Tuple[List[int], bool]:
+        """Return (positions, has_more) for one page, oldest first.
+
+        With `after` the page starts right after that position (forward paging);
+        otherwise it ends right before `before` or at the newest message.
+        """
+        if not viewer:
+            sources: List[Sequence[int]] = [range(self._indexed)]
+        else:
+            sources = [self._public, self._private.get(viewer, [])]
+
+        candidates: List[int] = []
+        for source in sources:
+            lo = bisect_right(source, after) if after is not None else 0
+            hi = bisect_left(source, before) if before is not None else len(source)
+            if after is not None:
+                candidates.extend(source[lo:min(hi, lo + limit + 1)])
+            else:
+                candidates.extend(source[max(lo, hi - limit - 1):hi])
+        candidates.sort()
+
+        has_more = len(candidates) > limit
+        if after is not None:
+            return candidates[:limit], has_more
+        return candidates[-limit:] if limit else [], has_more
+
+class DisputeStats:
+    """Running counts behind MediationAnalytics, kept up to date by `Dispute.add_*`.
+
+    Messages are counted per sender type. Proposals are tracked by whether
+    anyone has accepted or rejected them, and `Dispute.respond_to_proposal`
+    keeps that current as votes change. Analytics reads these counts in O(1)
+    instead of rescanning the lists. As with MessageVisibilityIndex, items
+    assigned without `add_*` are picked up on the next `sync`, and a list
+    that was replaced or shrank is recounted.
+    """
+
+    def __init__(self):
+        self._reset_messages()
+        self._reset_proposals()
+
+    def _reset_messages(self, messages: Optional[list] = None):
+        self._messages = messages
+        self.messages_counted = 0
+        self.by_sender_type: Dict[str, int] = {}
+        self.ai_messages = 0
+
+    def _reset_proposals(self, proposals: Optional[list] = None):
+        self._proposals = proposals
+        self.proposals_counted = 0
+        self._accepted: set = set()
+        self._rejected: set = set()
+
+    def sync(self, dispute: "Dispute") -> "DisputeStats":
+        messages, proposals = dispute.messages, dispute.proposals
+        if messages is not self._messages or len(messages) < self.messages_counted:
+            self._reset_messages(messages)
+        for position in range(self.messages_counted, len(messages)):
+            sender_type = messages[position].sender_type
+            self.by_sender_type[sender_type] = self.by_sender_type.get(sender_type, 0) + 1
+            if sender_type.startswith("ai_"):
+                self.ai_messages += 1
+        self.messages_counted = len(messages)
+
+        if proposals is not self._proposals or len(proposals) < self.proposals_counted:
+            self._reset_proposals(proposals)
+        for position in range(self.proposals_counted, len(proposals)):
+            self.proposal_changed(proposals[position])
+        self.proposals_counted = len(proposals)
+        return self
+
+    def proposal_changed(self, proposal: ResolutionProposal):
+        for ids, votes in ((self._accepted, proposal.accepted_by), (self._rejected, proposal.rejected_by)):
+            if votes:
+                ids.add(proposal.id)
+            else:
+                ids.discard(proposal.id)
+
+    @property
+    def accepted_proposals(self) -> int:
+        """Proposals at least one participant accepted"""
+        return len(self._accepted)
+
+    @property
+    def rejected_proposals(self) -> int:
+        """Proposals at least one participant rejected"""
+        return len(self._rejected)
+
+# Dispute fields that secondary indexes are keyed on; assigning them notifies listeners
+INDEXED_DISPUTE_FIELDS = ("status", "category")
+
+# Unbounded sub-collections: left out of projected reads unless asked for, paged by their own endpoints
+DISPUTE_COLLECTIONS = ("participants", "evidence", "messages", "proposals")
+
 class Dispute(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
@@ -162,10 +308,54 @@ class Dispute(BaseModel):
     # Metadata
     tags: List[str] = []
     priority: str = "medium"  # "low", "medium", "high", "urgent"
+
+    # Bumped on every field assignment (so by every add_* via updated_at, and on status
+    # changes); served as the ETag of the dispute, its evidence and messages
+    version: int = 0
+
+    # Change listeners (DisputeStore indexes, Upstash delta sync) – not serialised
+    _listeners: List[Callable] = PrivateAttr(default_factory=list)
+    _message_index: MessageVisibilityIndex = PrivateAttr(default_factory=MessageVisibilityIndex)
+    _sentiment: RunningSentiment = PrivateAttr(default_factory=RunningSentiment)
+    _stats: DisputeStats = PrivateAttr(default_factory=DisputeStats)
+
+    def __setattr__(self, name: str, value: Any):
+        if name in INDEXED_DISPUTE_FIELDS:
+            old_value = self.__dict__.get(name)
+            super().__setattr__(name, value)
+            if old_value != value:
+                self.touch()
+                self._notify(name, old_value)
+            return
+        super().__setattr__(name, value)
+        if name != "version" and name in self.model_fields:
+            self.touch()
+
+    def touch(self):
+        """Bump `version`; call after changing a nested item in place (e.g. a proposal's votes)"""
+        self.__dict__["version"] = self.version + 1
+
+    def subscribe(self, listener: Callable):
+        """Register `listener(dispute, change, detail)` to be called on every mutation.
+
+        `change` is "participant", "evidence", "message" or "proposal" (detail = the new item),
+        or an indexed field name such as "status" (detail = the previous value).
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, change: str, detail: Any = None):
+        for listener in list(self._listeners):
+            listener(self, change, detail)
     
     def add_participant(self, participant: DisputeParticipant):
         self.participants.append(participant)
         self.updated_at = datetime.now()
+        self._notify("participant", participant)
         
         # Update status based on participants
         if len(self.participants) >= 2:
@@ -174,24 +364,69 @@ class Dispute(BaseModel):
     def add_evidence(self, evidence: Evidence):
         self.evidence.append(evidence)
         self.updated_at = datetime.now()
+        self._notify("evidence", evidence)
         
         if self.status == DisputeStatus.PARTIES_JOINED:
             self.status = DisputeStatus.EVIDENCE_SUBMISSION
     
     def add_message(self, message: MediationMessage):
         self.messages.append(message)
+        self._message_index.sync(self.messages)
+        self._sentiment.sync(self.messages)
+        self._stats.sync(self)
         self.updated_at = datetime.now()
+        self._notify("message", message)
         
         if self.status == DisputeStatus.EVIDENCE_SUBMISSION and message.sender_type == "ai_mediator":
             self.status = DisputeStatus.MEDIATION_IN_PROGRESS
+
+    def page_messages(self, for_user_id: Optional[str] = None, limit: int = 50, before: Optional[str] = None,
+                      after: Optional[str] = None) -> Tuple[List[MediationMessage], bool]:
+        """Keyset-paginate messages visible to `for_user_id` (all messages if None or empty, the admin view).
+
+        `before`/`after` are message ids or ISO timestamps. Raises ValueError for
+        cursors that match neither.
+        """
+        index = self._message_index
+        index.sync(self.messages)
+        before_pos = index.resolve_cursor(before, after=False) if before else None
+        after_pos = index.resolve_cursor(after, after=True) if after else None
+        positions, has_more = index.page(for_user_id, max(limit, 0), before=before_pos, after=after_pos)
+        return [self.messages[p] for p in positions], has_more
+    
+    def stats(self) -> DisputeStats:
+        """Message/proposal counts for analytics, without rescanning the lists"""
+        return self._stats.sync(self)
+
+    def sentiment_score(self) -> float:
+        """Running sentiment of the user messages in [-1, 1] (recent ones weigh more)"""
+        return self._sentiment.sync(self.messages)
     
     def add_proposal(self, proposal: ResolutionProposal):
         self.proposals.append(proposal)
+        self._stats.sync(self)
         self.updated_at = datetime.now()
+        self._notify("proposal", proposal)
         
         if self.status == DisputeStatus.MEDIATION_IN_PROGRESS:
             self.status = DisputeStatus.RESOLUTION_PROPOSED
     
+    def counts(self) -> Dict[str, int]:
+        return {name: len(getattr(self, name)) for name in DISPUTE_COLLECTIONS}
+
+    def respond_to_proposal(self, proposal: ResolutionProposal, user_id: str, accept: bool):
+        """Record `user_id` accepting or rejecting `proposal` (replacing any earlier vote)"""
+        votes, other = proposal.accepted_by, proposal.rejected_by
+        if not accept:
+            votes, other = other, votes
+        if user_id not in votes:
+            votes.append(user_id)
+        if user_id in other:
+            other.remove(user_id)
+        self._stats.sync(self).proposal_changed(proposal)
+        self.touch()
+        self._notify("proposal_updated", proposal)
+
     def get_complainant(self) -> Optional[DisputeParticipant]:
         for participant in self.participants:
             if participant.role == ParticipantRole.COMPLAINANT:
@@ -0,0 +1,143 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from dispute_models import Dispute, DisputeParticipant, DisputeStatus
+
+class DisputeStore:
+    """In-memory dispute repository with participant, status and category indexes.
+
+    Behaves like the plain ``Dict[str, Dispute]`` it replaces (``in``, ``[]``,
+    ``values()``, ``len``) so existing endpoints keep working, but also keeps
+    secondary indexes in sync by subscribing to each stored dispute. Lookups such
+    as ``for_user`` therefore cost O(results) instead of O(all disputes).
+    """
+
+    def __init__(self):
+        self._disputes: Dict[str, Dispute] = {}
+        self._by_user: Dict[str, Set[str]] = defaultdict(set)
+        self._by_status: Dict[str, Set[str]] = defaultdict(set)
+        self._by_category: Dict[str, Set[str]] = defaultdict(set)
+
+    # ------------------------------------------------------------------
+    # Mapping protocol (drop-in for the old disputes_db dict)
+    # ------------------------------------------------------------------
+
+    def __contains__(self, dispute_id: object) -> bool:
+        return dispute_id in self._disputes
+
+    def __getitem__(self, dispute_id: str) -> Dispute:
+        return self._disputes[dispute_id]
+
+    def __setitem__(self, dispute_id: str, dispute: Dispute):
+        if dispute_id != dispute.id:
+            raise ValueError(f"Key {dispute_id} does not match dispute id {dispute.id}")
+        self.add(dispute)
+
+    def __delitem__(self, dispute_id: str):
+        self.remove(dispute_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._disputes)
+
+    def __len__(self) -> int:
+        return len(self._disputes)
+
+    def get(self, dispute_id: str, default: Optional[Dispute] = None) -> Optional[Dispute]:
+        return self._disputes.get(dispute_id, default)
+
+    def keys(self):
+        return self._disputes.keys()
+
+    def values(self):
+        return self._disputes.values()
+
+    def items(self):
+        return self._disputes.items()
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def add(self, dispute: Dispute):
+        """Insert or replace a dispute and index it"""
+        existing = self._disputes.get(dispute.id)
+        if existing is dispute:
+            return
+        if existing is not None:
+            self.remove(dispute.id)
+
+        self._disputes[dispute.id] = dispute
+        for participant in dispute.participants:
+            self._by_user[participant.user_id].add(dispute.id)
+        self._by_status[_status_key(dispute.status)].add(dispute.id)
+        self._by_category[dispute.category].add(dispute.id)
+        dispute.subscribe(self._on_dispute_change)
+
+    def remove(self, dispute_id: str) -> Optional[Dispute]:
+        """Remove a dispute and drop it from every index"""
+        dispute = self._disputes.pop(dispute_id, None)
+        if dispute is None:
+            return None
+
+        dispute.unsubscribe(self._on_dispute_change)
+        for participant in dispute.participants:
+            _discard(self._by_user, participant.user_id, dispute_id)
+        _discard(self._by_status, _status_key(dispute.status), dispute_id)
+        _discard(self._by_category, dispute.category, dispute_id)
+        return dispute
+
+    def _on_dispute_change(self, dispute: Dispute, change: str, detail: Any):
+        """Keep indexes current when a stored dispute mutates"""
+        if dispute.id not in self._disputes:
+            return
+
+        if change == "participant":
+            participant: DisputeParticipant = detail
+            self._by_user[participant.user_id].add(dispute.id)
+        elif change == "status":
+            if detail is not None:
+                _discard(self._by_status, _status_key(detail), dispute.id)
+            self._by_status[_status_key(dispute.status)].add(dispute.id)
+        elif change == "category":
+            if detail is not None:
+                _discard(self._by_category, detail, dispute.id)
+            self._by_category[dispute.category].add(dispute.id)
+
+    # ------------------------------------------------------------------
+    # Indexed queries – O(results)
+    # ------------------------------------------------------------------
+
+    def for_user(self, user_id: str, status: DisputeStatus | str | None = None) -> List[Dispute]:
+        """Disputes the user participates in, optionally restricted to one status"""
+        ids = self._by_user.get(user_id, set())
+        if status is not None:
+            ids = ids & self._by_status.get(_status_key(status), set())
+        return [self._disputes[d_id] for d_id in ids]
+
+    def with_status(self, status: DisputeStatus | str) -> List[Dispute]:
+        return [self._disputes[d_id] for d_id in self._by_status.get(_status_key(status), ())]
+
+    def in_category(self, category: str) -> List[Dispute]:
+        return [self._disputes[d_id] for d_id in self._by_category.get(category, ())]
+
+    def is_participant(self, dispute_id: str, user_id: str) -> bool:
+        return dispute_id in self._by_user.get(user_id, ())
+
+    def count_for_user(self, user_id: str) -> int:
+        return len(self._by_user.get(user_id, ()))
+
+    def count_with_status(self, status: DisputeStatus | str) -> int:
+        return len(self._by_status.get(_status_key(status), ()))
+
+
+def _status_key(status: DisputeStatus | str | None) -> str:
+    return status.value if isinstance(status, DisputeStatus) else str(status)
+
+
+def _discard(index: Dict[str, Set[str]], key: str, dispute_id: str):
+    ids = index.get(key)
+    if ids is None:
+        return
+    ids.discard(dispute_id)
+    if not ids:
+        del index[key]
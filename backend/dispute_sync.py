@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from dispute_models import Dispute, INDEXED_DISPUTE_FIELDS
+from upstash_client import async_upstash
+
+logger = logging.getLogger(__name__)
+
+# Collections that are mirrored through append events rather than field updates
+COLLECTION_EVENTS = {
+    "participant": "participants",
+    "evidence": "evidence",
+    "message": "messages",
+    "proposal": "proposals",
+}
+
+# Items changed in place (e.g. a proposal's votes): the event carries the whole item, replacing it by id
+UPDATE_EVENTS = {
+    "proposal_updated": "proposals",
+}
+
+def snapshot_key(dispute_id: str) -> str:
+    return f"dispute:{dispute_id}"
+
+def events_key(dispute_id: str) -> str:
+    return f"dispute_events:{dispute_id}"
+
+def apply_events(snapshot: Dict[str, Any], events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fold delta events (as stored under `dispute_events:{id}`) into a snapshot dict.
+
+    Events already folded into the snapshot (seq <= snapshot["_seq"]) are skipped,
+    so a reader racing a compaction still reconstructs the right state.
+    """
+    state = dict(snapshot)
+    for name in COLLECTION_EVENTS.values():
+        state[name] = list(state.get(name) or [])
+    seq = state.get("_seq", 0)
+
+    for event in sorted(events, key=lambda e: e.get("seq", 0)):
+        if event.get("seq", 0) <= seq:
+            continue
+        seq = event["seq"]
+        collection = COLLECTION_EVENTS.get(event.get("type"))
+        updated = UPDATE_EVENTS.get(event.get("type"))
+        if collection:
+            state[collection].append(event["data"])
+        elif updated:
+            items = state[updated]
+            position = next((i for i, item in enumerate(items) if item.get("id") == event["data"].get("id")), None)
+            if position is None:
+                items.append(event["data"])
+            else:
+                items[position] = event["data"]
+        else:
+            state.update(event.get("data") or {})
+
+    state["_seq"] = seq
+    return state
+
+async def load_dispute_state(dispute_id: str) -> Optional[Dict[str, Any]]:
+    """Rebuild the latest dispute dict from the snapshot plus any pending delta events (one round trip)"""
+    snapshot, events = await (
+        async_upstash.pipeline().get(snapshot_key(dispute_id)).lrange(events_key(dispute_id)).execute()
+    )
+    if snapshot is None:
+        return None
+    return apply_events(snapshot, events or [])
+
+
+class DisputeSyncer:
+    """Event-sourced mirroring of disputes into Upstash.
+
+    Instead of re-serialising the whole dispute on every change, each mutation
+    (`add_message`, `add_evidence`, `add_proposal`, `add_participant`,
+    `respond_to_proposal`, status changes) is buffered as a small delta event
+    and appended to `dispute_events:{id}` on the next `sync`. A compacted
+    snapshot is written to `dispute:{id}` on first sync, every
+    `snapshot_every` events, and when a dispute has been idle for
+    `idle_seconds`; the delta list is then cleared.
+    """
+
+    def __init__(self, snapshot_every: int = settings.dispute_snapshot_every,
+                 idle_seconds: int = settings.dispute_snapshot_idle_seconds):
+        self.snapshot_every = snapshot_every
+        self.idle_seconds = idle_seconds
+        self._disputes: Dict[str, Dispute] = {}
+        self._buffered: Dict[str, List[Dict[str, Any]]] = {}
+        self._seq: Dict[str, int] = {}
+        self._events_since_snapshot: Dict[str, int] = {}
+        self._last_fields: Dict[str, Dict[str, Any]] = {}
+        self._last_event_at: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def track(self, dispute: Dispute):
+        """Start listening to a dispute's mutations (idempotent)"""
+        if dispute.id not in self._disputes:
+            self._disputes[dispute.id] = dispute
+            self._buffered[dispute.id] = []
+            self._locks[dispute.id] = asyncio.Lock()
+            dispute.subscribe(self._on_dispute_change)
+
+    def _on_dispute_change(self, dispute: Dispute, change: str, detail: Any):
+        if change in COLLECTION_EVENTS or change in UPDATE_EVENTS:
+            self._buffer(dispute.id, change, detail.model_dump(mode="json"))
+        elif change in INDEXED_DISPUTE_FIELDS:
+            value = _json_value(getattr(dispute, change))
+            self._buffer(dispute.id, "fields", {change: value})
+            if dispute.id in self._last_fields:
+                self._last_fields[dispute.id][change] = value
+
+    def _buffer(self, dispute_id: str, event_type: str, data: Dict[str, Any]):
+        self._seq[dispute_id] = self._seq.get(dispute_id, 0) + 1
+        self._buffered[dispute_id].append({"seq": self._seq[dispute_id], "type": event_type, "data": data})
+        self._last_event_at[dispute_id] = time.monotonic()
+
+    async def sync(self, dispute: Dispute):
+        """Push buffered deltas for a dispute, compacting into a snapshot when due"""
+        if not async_upstash.is_configured():
+            return
+        self.track(dispute)
+        async with self._locks[dispute.id]:
+            await self._sync_locked(dispute)
+
+    async def _sync_locked(self, dispute: Dispute):
+        if dispute.id not in self._last_fields:
+            await self._write_snapshot(dispute)
+            return
+
+        # Plain field assignments (final_resolution, resolved_at, ...) don't emit events;
+        # ship whichever scalar fields changed since the last sync as one "fields" delta.
+        fields = _scalar_fields(dispute)
+        changed = {k: v for k, v in fields.items() if self._last_fields[dispute.id].get(k) != v}
+        if changed:
+            self._buffer(dispute.id, "fields", changed)
+            self._last_fields[dispute.id] = fields
+
+        pending = self._buffered[dispute.id]
+        if not pending:
+            return
+        self._events_since_snapshot[dispute.id] = self._events_since_snapshot.get(dispute.id, 0) + len(pending)
+        if self._events_since_snapshot[dispute.id] >= self.snapshot_every:
+            await self._write_snapshot(dispute)
+            return
+
+        # Clear before awaiting so events raised meanwhile land in a fresh buffer
+        self._buffered[dispute.id] = []
+        if await async_upstash.rpush(events_key(dispute.id), *pending) is None:
+            logger.warning(f"Upstash delta append failed for dispute {dispute.id}; writing snapshot instead")
+            await self._write_snapshot(dispute)
+
+    async def snapshot(self, dispute: Dispute):
+        """Write the full compacted dispute and drop the delta log it supersedes"""
+        self.track(dispute)
+        async with self._locks[dispute.id]:
+            await self._write_snapshot(dispute)
+
+    async def _write_snapshot(self, dispute: Dispute):
+        state = dispute.model_dump(mode="json")
+        seq = self._seq.get(dispute.id, 0)
+        state["_seq"] = seq
+        fields = _scalar_fields(dispute)
+        if not await async_upstash.set(snapshot_key(dispute.id), state):
+            logger.warning(f"Upstash snapshot failed for dispute {dispute.id}")
+            return
+        await async_upstash.delete(events_key(dispute.id))
+        # Keep anything buffered while the snapshot was in flight
+        self._buffered[dispute.id] = [e for e in self._buffered[dispute.id] if e["seq"] > seq]
+        self._events_since_snapshot[dispute.id] = 0
+        self._last_fields[dispute.id] = fields
+
+    async def compact_idle(self, now: Optional[float] = None):
+        """Snapshot disputes that have delta events and have been quiet for `idle_seconds`"""
+        now = time.monotonic() if now is None else now
+        for dispute_id, last_event in list(self._last_event_at.items()):
+            if now - last_event < self.idle_seconds:
+                continue
+            if self._events_since_snapshot.get(dispute_id) or self._buffered.get(dispute_id):
+                await self.snapshot(self._disputes[dispute_id])
+            self._last_event_at.pop(dispute_id, None)
+
+    async def run_compactor(self, interval: Optional[float] = None):
+        """Background loop that compacts idle disputes"""
+        interval = interval or max(self.idle_seconds / 4, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.compact_idle()
+            except Exception as e:
+                logger.error(f"Dispute compaction failed: {e}")
+
+
+def _json_value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+def _scalar_fields(dispute: Dispute) -> Dict[str, Any]:
+    return dispute.model_dump(mode="json", exclude=set(COLLECTION_EVENTS.values()))
+
+# Global syncer instance
+dispute_syncer = DisputeSyncer()
@@ -0,0 +1,314 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from config import settings
+from ttl_cache import TTLCache
+from upstash_client import async_upstash
+from write_behind import write_behind
+
+logger = logging.getLogger(__name__)
+
+KV_PREFIX = "llmcache:"
+
+
+# ---------------- Keys -----------------
+
+# Volatile details that change between otherwise identical prompts
+_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?")
+_UUID = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE)
+_HEX_ID = re.compile(r"\b[0-9a-f]{24,}\b", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_JSON_PUNCTUATION = re.compile(r" ?([\[\]{}:,]) ?")
+
+
+def canonical_text(text: str) -> str:
+    """`text` with timestamps and ids masked and whitespace/JSON indentation collapsed.
+
+    Only used for hashing: two prompts that differ just in when or about which
+    record they were built (a message's ISO timestamp, a uuid, `indent=2` vs
+    compact JSON) map to the same text.
+    """
+    text = _TIMESTAMP.sub("<ts>", text)
+    text = _UUID.sub("<id>", text)
+    text = _HEX_ID.sub("<id>", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    return _JSON_PUNCTUATION.sub(r"\1", text)
+
+
+def _canonical_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{k: canonical_text(v) if isinstance(v, str) else v for k, v in m.items()} for m in messages]
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+                                     default=str).encode()).hexdigest()
+
+
+def response_cache_key(model: str, messages: List[Dict[str, Any]], temperature: float, max_tokens: int,
+                       **params: Any) -> str:
+    """SHA-256 of everything that shapes a completion, after `canonical_text`.
+
+    That is the model, every message (the system prompt included), the
+    sampling settings and any other request parameters, such as Anthropic's
+    `system`. An answer is never served for a different configuration.
+    Dict keys are hashed in sorted order.
+    """
+    params = {k: canonical_text(v) if isinstance(v, str) else v for k, v in params.items()}
+    return _digest({"model": model, "messages": _canonical_messages(messages), "temperature": temperature,
+                    "max_tokens": max_tokens, **params})
+
+
+def request_shingles(model: str, messages: List[Dict[str, Any]], temperature: float, max_tokens: int,
+                     **params: Any) -> Tuple[str, FrozenSet[int]]:
+    """(configuration digest, word 3-shingles of the non-system messages) for near-duplicate lookups.
+
+    The digest covers the model, sampling settings, other parameters and system
+    messages, so only prompts sent with the same configuration are compared.
+    """
+    system = [m for m in messages if m.get("role") == "system"]
+    params = {k: canonical_text(v) if isinstance(v, str) else v for k, v in params.items()}
+    config = _digest({"model": model, "system": _canonical_messages(system), "temperature": temperature,
+                      "max_tokens": max_tokens, **params})
+    words = " ".join(canonical_text(str(m.get("content", ""))) for m in messages
+                     if m.get("role") != "system").lower().split()
+    shingles = frozenset(hash(tuple(words[i:i + 3])) for i in range(max(len(words) - 2, 1)))
+    return config, shingles
+
+
+class ShingleIndex:
+    """Near-duplicate lookup over the prompts of cached responses (memory only, per worker).
+
+    Shingles shared by more than `max_posting` cached prompts, or by more than
+    half of those sent with the same configuration, are template boilerplate
+    and are ignored. Otherwise every prompt built from the same template would
+    look alike; until a configuration has some variety cached, nothing
+    matches. Candidates share at least one of the remaining shingles (found
+    through an inverted index). The one with the highest Jaccard similarity
+    over those shingles wins, provided it reaches `threshold`. Beyond
+    `max_entries` the oldest prompts are dropped.
+    """
+
+    def __init__(self, threshold: float, max_entries: int, max_posting: int = 64):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_posting = max_posting
+        self._entries: "OrderedDict[str, Tuple[str, FrozenSet[int]]]" = OrderedDict()  # key -> (config, shingles)
+        self._postings: Dict[Tuple[str, int], Set[str]] = {}
+        self._per_config: Dict[str, int] = {}
+
+    def add(self, key: str, config: str, shingles: FrozenSet[int]):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = (config, shingles)
+        self._per_config[config] = self._per_config.get(config, 0) + 1
+        for shingle in shingles:
+            self._postings.setdefault((config, shingle), set()).add(key)
+        while len(self._entries) > self.max_entries:
+            old_key, (old_config, old_shingles) = self._entries.popitem(last=False)
+            self._per_config[old_config] -= 1
+            if not self._per_config[old_config]:
+                del self._per_config[old_config]
+            for shingle in old_shingles:
+                posting = self._postings.get((old_config, shingle))
+                if posting is not None:
+                    posting.discard(old_key)
+                    if not posting:
+                        del self._postings[(old_config, shingle)]
+
+    def lookup(self, config: str, shingles: FrozenSet[int]) -> Optional[Tuple[str, float]]:
+        """(key, similarity) of the closest cached prompt at or above the threshold, or None"""
+        limit = min(self.max_posting, self._per_config.get(config, 0) / 2)
+
+        def distinctive(shingles: FrozenSet[int]) -> Set[int]:
+            return {s for s in shingles if len(self._postings.get((config, s), ())) <= limit}
+
+        wanted = distinctive(shingles)
+        candidates: Set[str] = set()
+        for shingle in wanted:
+            candidates.update(self._postings.get((config, shingle), ()))
+        best = None
+        for key in candidates:
+            other = distinctive(self._entries[key][1])
+            shared = len(wanted & other)
+            similarity = shared / (len(wanted) + len(other) - shared)
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+
+# ---------------- Tiers -----------------
+
+class SQLiteTier:
+    """Cached responses in a local SQLite file, so they survive restarts.
+
+    The file is opened in WAL mode, so every worker on a host can share it.
+    Calls are blocking; LLMResponseCache runs them on a thread. Every 100th
+    write prunes expired rows and any rows beyond `max_entries`, dropping the
+    ones that expire soonest.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS llm_cache "
+                         "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_expires_at ON llm_cache (expires_at)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM llm_cache WHERE key = ? AND expires_at > ?",
+                                          (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?)", (key, value, time.time() + ttl))
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune(conn)
+            conn.commit()
+
+    def _prune(self, conn: sqlite3.Connection):
+        removed = conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        removed += conn.execute("DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache "
+                                "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)).rowcount
+        self.evictions += removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class LLMResponseCache:
+    """Tiered cache of LLM completions: a memory LRU, an optional SQLite file and an optional shared KV tier.
+
+    Lookups try each tier in that order, and a hit is copied into the faster
+    tiers above it. Writes go to every enabled tier. The memory tier is
+    bounded both by entry count and by the UTF-8 size of the responses.
+    SQLite calls run on a thread. KV writes go through the write-behind
+    queue, so a cache fill never waits on the network.
+
+    With a `similarity_threshold`, an exact miss for which the request is
+    passed in falls back to the most similar cached prompt that was sent
+    with the same configuration (see ShingleIndex).
+    """
+
+    def __init__(self, ttl: int = settings.llm_cache_ttl_seconds,
+                 max_entries: int = settings.llm_cache_max_entries,
+                 max_bytes: int = settings.llm_cache_max_bytes,
+                 sqlite_path: str = settings.llm_cache_sqlite_path,
+                 disk_max_entries: int = settings.llm_cache_disk_max_entries,
+                 kv: bool = settings.llm_cache_kv,
+                 similarity_threshold: float = settings.llm_cache_similarity_threshold):
+        self.ttl = ttl
+        self.memory = TTLCache(max_entries, ttl, max_bytes=max_bytes, sizeof=lambda value: len(value.encode()))
+        self.disk = SQLiteTier(sqlite_path, disk_max_entries) if sqlite_path else None
+        self.kv = kv
+        self.similar = ShingleIndex(similarity_threshold, max_entries) if similarity_threshold > 0 else None
+        self._stats = {"disk_hits": 0, "disk_misses": 0, "disk_errors": 0, "kv_hits": 0, "kv_misses": 0,
+                       "similar_hits": 0, "writes": 0}
+
+    async def _disk(self, method, *args) -> Any:
+        try:
+            return await asyncio.to_thread(method, *args)
+        except sqlite3.Error as e:
+            self._stats["disk_errors"] += 1
+            logger.warning(f"LLM cache disk tier error: {e}")
+            return None
+
+    async def get(self, key: str, request: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Cached response for `key`; with `request` (the provider kwargs), also try near-duplicates"""
+        value = await self._get_exact(key)
+        if value is not None or self.similar is None or request is None:
+            return value
+        match = self.similar.lookup(*request_shingles(**request))
+        if match is None or match[0] == key:
+            return None
+        value = await self._get_exact(match[0])
+        if value is not None:
+            self._stats["similar_hits"] += 1
+        return value
+
+    async def _get_exact(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        if self.disk is not None:
+            value = await self._disk(self.disk.get, key)
+            self._stats["disk_hits" if value is not None else "disk_misses"] += 1
+            if value is not None:
+                self.memory.set(key, value)
+                return value
+
+        if self.kv:
+            value = await async_upstash.get(KV_PREFIX + key)  # None on a miss or a KV error
+            self._stats["kv_hits" if value is not None else "kv_misses"] += 1
+            if value is not None:
+                self.memory.set(key, value)
+                if self.disk is not None:
+                    await self._disk(self.disk.set, key, value, self.ttl)
+                return value
+        return None
+
+    async def set(self, key: str, value: str, request: Optional[Dict[str, Any]] = None):
+        self._stats["writes"] += 1
+        self.memory.set(key, value)
+        if self.similar is not None and request is not None:
+            self.similar.add(key, *request_shingles(**request))
+        if self.disk is not None:
+            await self._disk(self.disk.set, key, value, self.ttl)
+        if self.kv:
+            write_behind.enqueue_set(KV_PREFIX + key, value, ex=self.ttl)
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "memory": self.memory.metrics(),
+            "disk": {"path": self.disk.path, "evictions": self.disk.evictions} if self.disk is not None else None,
+            "kv": self.kv,
+            "similarity_index": len(self.similar) if self.similar is not None else None,
+            **self._stats,
+        }
+
+# Global cache used by AICostController
+llm_cache = LLMResponseCache()
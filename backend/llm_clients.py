@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBusy(Exception):
+    """Raised when no concurrency slot frees up within `queue_timeout`"""
+
+
+class LLMClients:
+    """Async OpenAI / Anthropic clients shared by every agent and the contract generator.
+
+    Completions are awaited on the event loop, so a slow provider only delays
+    the request that asked for it and not every request on the worker. At
+    most `max_concurrency` calls are in flight per worker. Further calls wait
+    up to `queue_timeout` seconds for a slot and then raise `LLMBusy`. Each
+    call, SDK retries included, is cut off after `timeout` seconds with
+    `asyncio.TimeoutError`. The SDKs are imported on first use.
+    """
+
+    def __init__(self, max_concurrency: int = settings.llm_max_concurrency,
+                 timeout: float = settings.llm_timeout_seconds,
+                 queue_timeout: float = settings.llm_queue_timeout_seconds):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self._openai = None
+        self._anthropic = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._in_flight = 0
+        self._waiting = 0
+        self._stats = {"calls": 0, "timeouts": 0, "errors": 0, "rejected": 0}
+        self._total_ms = 0.0
+
+    @property
+    def openai(self):
+        """Shared AsyncOpenAI client, or None without an API key"""
+        if self._openai is None and settings.openai_api_key:
+            try:
+                import openai  # SDKs load on first use to keep cold starts fast
+                self._openai = openai.AsyncOpenAI(api_key=settings.openai_api_key,
+                                                  base_url=settings.openai_base_url or None,
+                                                  timeout=self.timeout, max_retries=settings.llm_max_retries)
+            except Exception as e:
+                logger.error(f"Failed to initialize OpenAI client: {e}")
+                return None
+        return self._openai
+
+    @property
+    def anthropic(self):
+        """Shared AsyncAnthropic client, or None without an API key"""
+        if self._anthropic is None and settings.anthropic_api_key:
+            try:
+                import anthropic
+                self._anthropic = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key,
+                                                           base_url=settings.anthropic_base_url or None,
+                                                           timeout=self.timeout, max_retries=settings.llm_max_retries)
+            except Exception as e:
+                logger.error(f"Failed to initialize Anthropic client: {e}")
+                return None
+        return self._anthropic
+
+    def _slots(self) -> asyncio.Semaphore:
+        # One semaphore per event loop (tests and scripts may run several in turn)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._semaphore, self._loop = asyncio.Semaphore(self.max_concurrency), loop
+        return self._semaphore
+
+    async def _call(self, create, **kwargs) -> Any:
+        slots = self._slots()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._stats["rejected"] += 1
+            raise LLMBusy(f"{self.max_concurrency} LLM calls already in flight")
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(create(**kwargs), self.timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise
+        except Exception:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._stats["calls"] += 1
+            self._total_ms += (time.perf_counter() - start) * 1000
+            slots.release()
+
+    async def chat(self, **kwargs) -> Any:
+        """`chat.completions.create(**kwargs)` on the shared OpenAI client"""
+        return await self._call(self.openai.chat.completions.create, **kwargs)
+
+    async def claude(self, **kwargs) -> Any:
+        """`messages.create(**kwargs)` on the shared Anthropic client"""
+        return await self._call(self.anthropic.messages.create, **kwargs)
+
+    async def aclose(self):
+        for client in (self._openai, self._anthropic):
+            if client is not None:
+                await client.close()
+        self._openai = self._anthropic = None
+
+    def metrics(self) -> Dict[str, Any]:
+        calls = self._stats["calls"]
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            **self._stats,
+            "avg_ms": round(self._total_ms / calls, 1) if calls else 0.0,
+        }
+
+# Global clients used by the mediation agents and contract generator
+llm_clients = LLMClients()
@@ -1,14 +1,13 @@
-import openai
-import anthropic
 from typing import List, Dict, Any, Optional
 from config import settings
 from dispute_models import *
 from legal_research import legal_research_service
-from ai_cost_controller import ai_cost_controller
+from ai_cost_controller import NEGATIVE_SENTIMENT_THRESHOLD, ai_cost_controller
+from llm_clients import llm_clients
+from llm_cache import response_cache_key
 import logging
 import json
 import asyncio
-import hashlib
 from datetime import datetime, timedelta
 
 logging.basicConfig(level=logging.INFO)
@@ -22,30 +21,16 @@ class BaseMediationAgent:
         self.agent_type = agent_type
         self.model = model
         self.conversation_history = []
-        self._openai_client = None
-        self._anthropic_client = None
     
     @property
     def openai_client(self):
-        """Lazy initialization of OpenAI client"""
-        if self._openai_client is None and settings.openai_api_key:
-            try:
-                self._openai_client = openai.OpenAI(api_key=settings.openai_api_key)
-            except Exception as e:
-                logger.error(f"Failed to initialize OpenAI client: {e}")
-                return None
-        return self._openai_client
+        """Shared async OpenAI client (None if not configured)"""
+        return llm_clients.openai
     
     @property
     def anthropic_client(self):
-        """Lazy initialization of Anthropic client"""
-        if self._anthropic_client is None and settings.anthropic_api_key:
-            try:
-                self._anthropic_client = anthropic.Anthropic(api_key=settings.anthropic_api_key)
-            except Exception as e:
-                logger.error(f"Failed to initialize Anthropic client: {e}")
-                return None
-        return self._anthropic_client
+        """Shared async Anthropic client (None if not configured)"""
+        return llm_clients.anthropic
     
     async def generate_response(self, prompt: str, context: str = None, dispute_data: Dict = None) -> str:
         """Generate response using AI model"""
@@ -58,55 +43,61 @@ class BaseMediationAgent:
             logger.error(f"Error generating response for {self.name}: {str(e)}")
             return f"I apologize, but I'm having trouble processing your request right now. Please try again."
     
+    def build_openai_request(self, prompt: str, context: str = None, dispute_data: Dict = None) -> Dict[str, Any]:
+        """The chat completion kwargs sent for `prompt` (also used to replay traffic against the cache)"""
+        # Get dispute category for optimization
+        dispute_category = dispute_data.get('category', 'general') if dispute_data else 'general'
+        
+        # Optimize prompt for cost efficiency
+        optimized_prompt = ai_cost_controller.get_optimized_prompt(prompt, dispute_category)
+        
+        messages = [
+            {"role": "system", "content": self._get_system_prompt()},
+        ]
+        
+        if context:
+            messages.append({"role": "user", "content": f"Context: {context[:200]}..."})  # Limit context
+        
+        if dispute_data:
+            # Limit dispute data to essential info only
+            essential_data = {
+                'category': dispute_data.get('category', ''),
+                'title': dispute_data.get('title', '')[:100],
+                'evidence_count': len(dispute_data.get('evidence', []))
+            }
+            messages.append({"role": "user", "content": f"Dispute Info: {json.dumps(essential_data)}"})
+        
+        messages.append({"role": "user", "content": optimized_prompt})
+        
+        # Use cost-efficient model and settings
+        return dict(
+            model=settings.ai_model_preference,  # Use cheaper model
+            messages=messages,
+            max_tokens=settings.max_ai_response_tokens,  # Limit tokens
+            temperature=settings.ai_response_temperature  # Lower temperature for focused responses
+        )
+    
     async def _generate_openai_response(self, prompt: str, context: str = None, dispute_data: Dict = None) -> str:
         """Generate cost-optimized response using OpenAI"""
         if not self.openai_client:
             return "OpenAI client not configured"
         
         try:
-            # Check cache first to avoid duplicate API calls
-            prompt_hash = hashlib.md5(prompt.encode()).hexdigest()
-            cached_response = ai_cost_controller.get_cached_response(prompt_hash)
+            request = self.build_openai_request(prompt, context, dispute_data)
+            
+            # Check cache first to avoid duplicate API calls (keyed on the whole canonicalised request)
+            cache_key = response_cache_key(**request)
+            cached_response = await ai_cost_controller.get_cached_response(cache_key, request)
             if cached_response:
                 logger.info("Using cached AI response")
                 return cached_response
             
-            # Get dispute category for optimization
-            dispute_category = dispute_data.get('category', 'general') if dispute_data else 'general'
-            
-            # Optimize prompt for cost efficiency
-            optimized_prompt = ai_cost_controller.get_optimized_prompt(prompt, dispute_category)
-            
-            messages = [
-                {"role": "system", "content": self._get_system_prompt()},
-            ]
-            
-            if context:
-                messages.append({"role": "user", "content": f"Context: {context[:200]}..."})  # Limit context
-            
-            if dispute_data:
-                # Limit dispute data to essential info only
-                essential_data = {
-                    'category': dispute_data.get('category', ''),
-                    'title': dispute_data.get('title', '')[:100],
-                    'evidence_count': len(dispute_data.get('evidence', []))
-                }
-                messages.append({"role": "user", "content": f"Dispute Info: {json.dumps(essential_data)}"})
-            
-            messages.append({"role": "user", "content": optimized_prompt})
-            
-            # Use cost-efficient model and settings
-            response = self.openai_client.chat.completions.create(
-                model=settings.ai_model_preference,  # Use cheaper model
-                messages=messages,
-                max_tokens=settings.max_ai_response_tokens,  # Limit tokens
-                temperature=settings.ai_response_temperature  # Lower temperature for focused responses
-            )
+            response = await llm_clients.chat(**request)
             
             response_text = response.choices[0].message.content
             
             # Cache the response
-            ai_cost_controller.cache_response(prompt_hash, response_text)
+            await ai_cost_controller.cache_response(cache_key, response_text, request)
             
             return response_text
             
@@ -130,7 +121,7 @@ class BaseMediationAgent:
             
             full_prompt += f"Human: {prompt}\n\nAssistant:"
             
-            response = self.anthropic_client.messages.create(
+            response = await llm_clients.claude(
                 model="claude-3-sonnet-20240229",
                 max_tokens=1000,
                 messages=[{"role": "user", "content": full_prompt}]
@@ -205,6 +196,10 @@ Make this welcoming and professional, setting a constructive tone for the mediat
     
     async def facilitate_discussion(self, dispute: Dispute, recent_messages: List[MediationMessage]) -> str:
         """Facilitate ongoing discussion between parties"""
+        return await self.generate_response(self.facilitation_prompt(recent_messages), context=dispute.description)
+    
+    def facilitation_prompt(self, recent_messages: List[MediationMessage]) -> str:
+        """Prompt for facilitate_discussion"""
         # Analyze recent messages for tension, progress, or need for intervention
         messages_summary = []
         for msg in recent_messages[-5:]:  # Last 5 messages
@@ -226,7 +221,7 @@ Recent conversation: {json.dumps(messages_summary, indent=2)}
 
 Focus on keeping the discussion productive and solution-oriented."""
         
-        return await self.generate_response(prompt, context=dispute.description)
+        return prompt
     
     async def suggest_resolution(self, dispute: Dispute) -> ResolutionProposal:
         """Suggest a resolution based on the dispute information"""
@@ -458,6 +453,17 @@ Always focus on improving the process to achieve better outcomes."""
     
     async def guide_next_steps(self, dispute: Dispute) -> Dict[str, Any]:
         """Provide guidance on next steps in the dispute resolution process"""
+        response = await self.generate_response(self.guidance_prompt(dispute), context=dispute.description)
+        
+        return {
+            "guidance": response,
+            "recommended_actions": self._extract_actions(response),
+            "timeline": self._extract_timeline(response),
+            "escalation_needed": self._assess_escalation(dispute)
+        }
+    
+    def guidance_prompt(self, dispute: Dispute) -> str:
+        """Prompt for guide_next_steps"""
         dispute_summary = {
             "status": dispute.status,
             "participants": len(dispute.participants),
@@ -481,14 +487,7 @@ Please provide:
 
 Focus on actionable guidance that moves the dispute toward resolution."""
         
-        response = await self.generate_response(prompt, context=dispute.description)
-        
-        return {
-            "guidance": response,
-            "recommended_actions": self._extract_actions(response),
-            "timeline": self._extract_timeline(response),
-            "escalation_needed": self._assess_escalation(dispute)
-        }
+        return prompt
     
     def _extract_actions(self, response: str) -> List[str]:
         """Extract specific actions from the guidance"""
@@ -522,7 +521,7 @@ Focus on actionable guidance that moves the dispute toward resolution."""
         if days_active > 14 and message_count > 50:  # Long-running with many messages
             return True
         
-        if len(dispute.proposals) > 3 and not any(p.accepted_by for p in dispute.proposals):  # Multiple rejected proposals
+        if len(dispute.proposals) > 3 and not dispute.stats().accepted_proposals:  # Multiple rejected proposals
             return True
         
         return False
@@ -561,10 +560,12 @@ Analytical Approach:
 
 Focus on actionable insights that improve dispute resolution outcomes."""
     
-    async def analyze_dispute(self, dispute: Dispute) -> MediationAnalytics:
-        """Perform comprehensive dispute analysis"""
-        # Analyze message sentiment
-        sentiment_score = await self._analyze_sentiment(dispute.messages)
+    async def analyze_dispute(self, dispute: Dispute, refine: bool = False) -> MediationAnalytics:
+        """Perform comprehensive dispute analysis (`refine` asks the LLM to rescore sentiment)"""
+        # Local running sentiment; the LLM pass is optional
+        sentiment_score = dispute.sentiment_score()
+        if refine:
+            sentiment_score = await self.refine_sentiment(dispute.messages, sentiment_score)
         
         # Assess escalation risk
         escalation_risk = self._assess_escalation_risk(dispute)
@@ -573,7 +574,7 @@ Focus on actionable insights that improve dispute resolution outcomes."""
         resolution_probability = self._predict_resolution_probability(dispute)
         
         # Count AI interventions
-        ai_interventions = len([m for m in dispute.messages if m.sender_type.startswith('ai_')])
+        ai_interventions = dispute.stats().ai_messages
         
         # Calculate resolution time if resolved
         resolution_time = None
@@ -591,16 +592,32 @@ Focus on actionable insights that improve dispute resolution outcomes."""
             resolution_probability=resolution_probability
         )
     
-    async def _analyze_sentiment(self, messages: List[MediationMessage]) -> float:
-        """Analyze overall sentiment of the conversation"""
-        if not messages:
-            return 0.0
+    async def refine_sentiment(self, messages: List[MediationMessage], local_score: float = 0.0) -> float:
+        """Rescore the conversation's sentiment with the LLM; `local_score` if that fails"""
+        prompt = self.sentiment_prompt(messages)
+        if prompt is None:
+            return local_score
+        
+        try:
+            response = await self.generate_response(prompt)
+            # Extract number from response
+            import re
+            numbers = re.findall(r'-?\d*\.?\d+', response)
+            if numbers:
+                score = float(numbers[0])
+                return max(-1, min(1, score))  # Clamp between -1 and 1
+        except:
+            pass
         
+        return local_score
+    
+    def sentiment_prompt(self, messages: List[MediationMessage]) -> Optional[str]:
+        """Prompt for refine_sentiment; None without user messages among the last 10"""
         # Use AI to analyze sentiment
         recent_messages = [m.content for m in messages[-10:] if m.sender_type == "user"]
         
         if not recent_messages:
-            return 0.0
+            return None
         
         prompt = f"""Analyze the sentiment of these messages from a dispute resolution context:
 
@@ -615,18 +632,7 @@ Consider:
 
 Provide just a single number between -1 and +1."""
         
-        try:
-            response = await self.generate_response(prompt)
-            # Extract number from response
-            import re
-            numbers = re.findall(r'-?\d*\.?\d+', response)
-            if numbers:
-                score = float(numbers[0])
-                return max(-1, min(1, score))  # Clamp between -1 and 1
-        except:
-            pass
-        
-        return 0.0
+        return prompt
     
     def _assess_escalation_risk(self, dispute: Dispute) -> float:
         """Assess risk of escalation (0-1 scale)"""
@@ -643,7 +649,7 @@ Provide just a single number between -1 and +1."""
             risk_factors += 1
         
         # Proposal rejection factor
-        rejected_proposals = sum(1 for p in dispute.proposals if p.rejected_by)
+        rejected_proposals = dispute.stats().rejected_proposals
         if rejected_proposals > 2:
             risk_factors += 1
         
@@ -676,8 +682,7 @@ Provide just a single number between -1 and +1."""
             positive_factors += 1
         
         # AI mediation factor
-        ai_messages = [m for m in dispute.messages if m.sender_type.startswith('ai_')]
-        if ai_messages:
+        if dispute.stats().ai_messages:
             positive_factors += 1
         
         # Timeline factor
@@ -707,15 +712,20 @@ class MediationOrchestrator:
             logger.info(f"AI intervention blocked for cost control: {dispute.id}")
             return None
         
-        # Analyze if AI intervention is needed
-        analytics = await self.analyst.analyze_dispute(dispute)
+        # Cheap first: the running local sentiment. The LLM only rescores a borderline one.
+        sentiment_score = dispute.sentiment_score()
+        if (settings.sentiment_llm_refine
+                and abs(sentiment_score - NEGATIVE_SENTIMENT_THRESHOLD) < settings.sentiment_refine_margin):
+            sentiment_score = await self.analyst.refine_sentiment(dispute.messages, sentiment_score)
         
         # Use cost controller to determine if intervention is needed
-        messages_data = [{"content": m.content} for m in dispute.messages]
+        # Only the last few messages are inspected, so don't copy the whole history
+        messages_data = [{"content": m.content} for m in dispute.messages[-6:]]
         should_intervene = ai_cost_controller.should_intervene(
             dispute.id, 
             messages_data, 
-            analytics.sentiment_score
+            sentiment_score,
+            message_count=len(dispute.messages)
         )
         
         if should_intervene:
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect, Depends
+from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import List, Dict, Optional, Any
@@ -7,16 +7,7 @@ import logging
 from datetime import datetime
 import re
 
-# Sentry (optional)
-import sentry_sdk
-
-# APNs push (optional)
 from typing import Tuple
-try:
-    from apns2.client import APNsClient
-    from apns2.payload import Payload
-except ImportError:
-    APNsClient = None  # type: ignore
 
 import asyncio
 import uuid
@@ -24,19 +15,27 @@ import os
 from sqlalchemy.orm import Session
 
 # Import our modules
-from config import settings
+from config import settings, get_firebase_auth
 from dispute_models import *
 from mediation_agents import mediation_orchestrator
 from contract_generator import contract_generator
+from dispute_store import DisputeStore
+from dispute_sync import dispute_syncer
 from ai_cost_controller import ai_cost_controller
-from database import get_db, init_db, User as DBUser, Dispute as DBDispute, Truth as DBTruth, Evidence as DBEvidence, Message as DBMessage, ChatMessageLog, ResolutionLog
-from auth import get_password_hash, verify_password, create_access_token, get_current_user, get_current_user_optional
-from upstash_client import get as upstash_get, set as upstash_set
-try:
-    import firebase_admin
-    from firebase_admin import auth as fb_auth
-except ImportError:
-    fb_auth = None  # optional
+from database import get_db, init_db, pool_stats, User as DBUser, Dispute as DBDispute, Truth as DBTruth, Evidence as DBEvidence, Message as DBMessage, ChatMessageLog, ResolutionLog
+from auth import create_access_token, get_current_user, get_current_user_optional, auth_cache_metrics
+from upstash_client import async_upstash
+from user_registry import LEGACY_USERS_KEY, user_registry
+from write_behind import MISSING, write_behind
+from ws_hub import dispute_hub
+from pubsub import broker
+from push_service import push_dispatcher
+from analytics_writer import analytics_writer
+from rate_limit import RateLimitMiddleware, rate_limiter
+from response_encoding import CompressionMiddleware, FastJSONResponse, etag_for, not_modified, parse_fields
+from password_hashing import NO_PASSWORD, HashingBusy, password_hasher
+from llm_clients import llm_clients
+from llm_cache import llm_cache
 
 # Import routers
 import social_api
@@ -54,7 +53,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="MediationAI API",
     description="AI-powered dispute resolution backend for MediationAI iOS app",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Add routers
@@ -62,6 +62,12 @@ app.include_router(social_router)
 app.include_router(betting_router)
 app.include_router(webhook_router)
 
+# Per-user / per-IP token buckets (added first so CORS headers still wrap its 429s)
+app.add_middleware(RateLimitMiddleware)
+
+# brotli/gzip for large JSON bodies (full disputes), negotiated via Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+
 # CORS middleware for iOS app
 app.add_middleware(
     CORSMiddleware,
@@ -73,8 +79,11 @@ app.add_middleware(
 
 # Database will be initialised lazily on startup to avoid cold-import connection issues on serverless platforms.
 
-# WebSocket connections
-websocket_connections: Dict[str, WebSocket] = {}
+# In-memory stores (disputes are indexed by participant, status and category)
+users_db: Dict[str, User] = {}
+disputes_db = DisputeStore()
+
+# WebSocket subscribers live in ws_hub.dispute_hub (many per dispute)
 
 # ==============================================================================
 # HEALTH CHECK ENDPOINT
@@ -105,7 +114,10 @@ async def register_user(request: UserRegistrationRequest, db: Session = Depends(
     """Register a new user"""
     try:
         # Validate phone verification code
-        expected = upstash_get(f"phone_code:{request.phoneNumber}")
+        code_key = f"phone_code:{request.phoneNumber}"
+        expected = write_behind.pending_value(code_key)
+        if expected is MISSING:
+            expected = await async_upstash.get(code_key)
         if expected is None or expected != request.verificationCode:
             raise HTTPException(status_code=400, detail="Invalid or expired verification code")
 
@@ -114,9 +126,9 @@ async def register_user(request: UserRegistrationRequest, db: Session = Depends(
             pw = request.password
             if len(pw) < 8 or not re.search(r"[0-9]", pw) or not re.search(r"[^A-Za-z0-9]", pw):
                 raise HTTPException(status_code=400, detail="Password too weak. Must be ≥8 chars, include a number and symbol.")
-            hashed_password = get_password_hash(pw)
+            hashed_password = await password_hasher.hash(pw)
         else:
-            hashed_password = get_password_hash(str(uuid.uuid4()))  # random pw for phone-only login later
+            hashed_password = NO_PASSWORD  # phone-only account
 
         # Ensure phone unique
         existing_user = db.query(DBUser).filter(DBUser.phone_number == request.phoneNumber).first()
@@ -156,15 +168,8 @@ async def register_user(request: UserRegistrationRequest, db: Session = Depends(
         )
 
         # --- NEW: Persist to Upstash ---
-        try:
-            # One-key-per-user
-            upstash_set(f"user:{db_user.id}", user_response.dict())
-            # Update flat users list (optional – best effort)
-            users_list = upstash_get("users") or []
-            users_list.append(user_response.dict())
-            upstash_set("users", users_list)
-        except Exception as up_err:
-            logger.warning(f"Upstash sync failed: {up_err}")
+        user_snapshot = user_response.model_dump(mode="json")
+        write_behind.enqueue_job(f"user:{db_user.id}", lambda: user_registry.register(user_snapshot))
         # --- END NEW ---
         
         return {
@@ -173,6 +178,8 @@ async def register_user(request: UserRegistrationRequest, db: Session = Depends(
             "token_type": "bearer"
         }
         
+    except HashingBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
     except Exception as e:
         logger.error(f"Registration failed: {str(e)}")
         raise HTTPException(status_code=400, detail="Registration failed")
@@ -185,6 +192,7 @@ class FirebaseSignUpRequest(BaseModel):
 
 @app.post("/api/auth/firebase-signup")
 async def firebase_signup(request: FirebaseSignUpRequest, db: Session = Depends(get_db)):
+    fb_auth = get_firebase_auth()
     if fb_auth is None:
         raise HTTPException(status_code=500, detail="Firebase SDK not installed")
     try:
@@ -203,7 +211,7 @@ async def firebase_signup(request: FirebaseSignUpRequest, db: Session = Depends(
         user = DBUser(
             phone_number=phone,
             display_name=request.displayName,
-            password_hash=get_password_hash(str(uuid.uuid4())),
+            password_hash=NO_PASSWORD,
             is_phone_verified=True
         )
         db.add(user)
@@ -237,25 +245,7 @@ async def register_device(token: str, current_user: DBUser = Depends(get_current
     db.commit()
     return {"status": "success"}
 
-# Helper to send a push – no-op if APNs not configured
-def _send_push(apns_token: str, title: str, body: str):
-    if not (settings.apns_key_base64 and APNsClient):
-        return
-    try:
-        import base64, tempfile, os
-        key_data = base64.b64decode(settings.apns_key_base64)
-        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-            tmp.write(key_data)
-            tmp_path = tmp.name
-        client = APNsClient(tmp_path, key_id=settings.apns_key_id, team_id=settings.apns_team_id, use_sandbox=False)
-        client.send_notification(apns_token, Payload(alert={"title": title, "body": body}, sound="default"))
-    except Exception as e:
-        logger.warning(f"APNs send failed: {e}")
-    finally:
-        try:
-            os.remove(tmp_path)
-        except Exception:
-            pass
+# Pushes are sent by push_service.push_dispatcher (no-op if APNs not configured)
 
 @app.post("/api/login")
 async def login_user(request: UserLoginRequest, db: Session = Depends(get_db)):
@@ -267,7 +257,7 @@ async def login_user(request: UserLoginRequest, db: Session = Depends(get_db)):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         # Verify password
-        if not verify_password(request.password, db_user.password_hash):
+        if not await password_hasher.verify(request.password, db_user.password_hash):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
         # Create access token
@@ -297,6 +287,8 @@ async def login_user(request: UserLoginRequest, db: Session = Depends(get_db)):
         
     except HTTPException:
         raise
+    except HashingBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry")
     except Exception as e:
         logger.error(f"Login failed: {str(e)}")
         raise HTTPException(status_code=401, detail="Login failed")
@@ -392,52 +384,88 @@ async def create_dispute(request: CreateDisputeRequest):
 
         logger.info(f"Created dispute: {dispute.id}")
         
-        return DisputeResponse(
+        return FastJSONResponse(DisputeResponse(
             dispute=dispute,
             status="success",
             message=f"Dispute '{dispute.title}' created successfully"
-        )
+        ))
         
     except Exception as e:
         logger.error(f"Error creating dispute: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/disputes/{dispute_id}")
-async def get_dispute(dispute_id: str):
-    """Get a specific dispute"""
+async def get_dispute(dispute_id: str, request: Request, fields: Optional[str] = None, include: Optional[str] = None):
+    """Get a specific dispute (304 if If-None-Match has the current ETag).
+
+    Without `fields`/`include` the full dispute is returned. Otherwise only the requested parts are built:
+    • `fields=title,status,counts` – top-level fields, dotted for nested ones (`evidence.title`);
+      `counts` is the size of each collection. Defaults to everything but the collections, plus `counts`.
+    • `include=participants,proposals` – collections to embed. Large ones are better paged through
+      `/evidence`, `/messages` and `/proposals`.
+    """
     if dispute_id not in disputes_db:
         raise HTTPException(status_code=404, detail="Dispute not found")
     
-    return disputes_db[dispute_id]
+    dispute = disputes_db[dispute_id]
+    etag = etag_for(dispute.version)
+    unchanged = not_modified(request.headers.get("if-none-match"), etag)
+    if unchanged:
+        return unchanged
+    if fields is None and include is None:
+        return FastJSONResponse(dispute, headers={"ETag": etag})
+
+    if fields is None:
+        fields = ",".join([name for name in Dispute.model_fields if name not in DISPUTE_COLLECTIONS] + ["counts"])
+    try:
+        spec = parse_fields(f"id,{fields},{include or ''}", Dispute, extra=("counts",))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    with_counts = spec.pop("counts", False)
+    payload = dispute.model_dump(mode="json", include=spec)
+    if with_counts:
+        payload["counts"] = dispute.counts()
+    return FastJSONResponse(payload, headers={"ETag": etag})
+
+def _page_response(items: list, model, offset: int, limit: Optional[int], fields: Optional[str],
+                   etag: str) -> FastJSONResponse:
+    """One offset/limit page of a dispute collection, projected to `fields` (comma-separated, dotted) if given"""
+    try:
+        include = parse_fields(f"id,{fields}", model) if fields else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    offset = max(offset, 0)
+    end = len(items) if limit is None else offset + max(limit, 0)
+    return FastJSONResponse(items[offset:end], include=include, headers={
+        "ETag": etag,
+        "X-Has-More": "true" if end < len(items) else "false",
+        "X-Total-Count": str(len(items)),
+    })
 
 @app.get("/api/users/{user_id}/disputes", response_model=UserDisputesResponse)
-async def get_user_disputes(user_id: str):
-    """Get all disputes for a user"""
+async def get_user_disputes(user_id: str, status: Optional[DisputeStatus] = None):
+    """Get all disputes for a user, optionally filtered by status"""
     if user_id not in users_db:
         raise HTTPException(status_code=404, detail="User not found")
     
     user_disputes = []
-    for dispute in disputes_db.values():
-        # Check if user is a participant
-        is_participant = any(p.user_id == user_id for p in dispute.participants)
+    for dispute in disputes_db.for_user(user_id, status=status):
+        # Count unread messages (simplified)
+        unread_count = 0
         
-        if is_participant:
-            # Count unread messages (simplified)
-            unread_count = 0
-            
-            dispute_summary = DisputeSummary(
-                id=dispute.id,
-                title=dispute.title,
-                category=dispute.category,
-                status=dispute.status,
-                created_at=dispute.created_at,
-                updated_at=dispute.updated_at,
-                participant_count=len(dispute.participants),
-                evidence_count=len(dispute.evidence),
-                unread_messages=unread_count,
-                priority=dispute.priority
-            )
-            user_disputes.append(dispute_summary)
+        dispute_summary = DisputeSummary(
+            id=dispute.id,
+            title=dispute.title,
+            category=dispute.category,
+            status=dispute.status,
+            created_at=dispute.created_at,
+            updated_at=dispute.updated_at,
+            participant_count=len(dispute.participants),
+            evidence_count=len(dispute.evidence),
+            unread_messages=unread_count,
+            priority=dispute.priority
+        )
+        user_disputes.append(dispute_summary)
     
     # Sort by updated_at descending
     user_disputes.sort(key=lambda d: d.updated_at, reverse=True)
@@ -504,7 +532,7 @@ async def submit_evidence(dispute_id: str, request: SubmitEvidenceRequest):
     dispute = disputes_db[dispute_id]
     
     # Verify user is a participant
-    is_participant = any(p.user_id == request.submitted_by for p in dispute.participants)
+    is_participant = disputes_db.is_participant(dispute_id, request.submitted_by)
     if not is_participant:
         raise HTTPException(status_code=403, detail="User is not a participant in this dispute")
     
@@ -536,19 +564,27 @@ async def submit_evidence(dispute_id: str, request: SubmitEvidenceRequest):
     }
 
 @app.get("/api/disputes/{dispute_id}/evidence")
-async def get_dispute_evidence(dispute_id: str):
-    """Get all evidence for a dispute"""
+async def get_dispute_evidence(dispute_id: str, request: Request, offset: int = 0, limit: Optional[int] = None,
+                               fields: Optional[str] = None):
+    """Get evidence for a dispute, oldest first (304 if If-None-Match has the current ETag).
+
+    All of it by default; `offset`/`limit` page it (`X-Has-More`, `X-Total-Count`), and
+    `fields=title,evidence_type` leaves out the rest – notably `content`.
+    """
     if dispute_id not in disputes_db:
         raise HTTPException(status_code=404, detail="Dispute not found")
     
-    return disputes_db[dispute_id].evidence
+    dispute = disputes_db[dispute_id]
+    etag = etag_for(dispute.version)
+    return (not_modified(request.headers.get("if-none-match"), etag)
+            or _page_response(dispute.evidence, Evidence, offset, limit, fields, etag))
 
 # ==============================================================================
 # MESSAGING ENDPOINTS
 # ==============================================================================
 
 @app.post("/api/disputes/{dispute_id}/messages")
-async def send_message(dispute_id: str, request: SendMessageRequest, db: Session = Depends(get_db)):
+async def send_message(dispute_id: str, request: SendMessageRequest):
     """Send a message in a dispute"""
     if dispute_id not in disputes_db:
         raise HTTPException(status_code=404, detail="Dispute not found")
@@ -559,7 +595,7 @@ async def send_message(dispute_id: str, request: SendMessageRequest, db: Session
     dispute = disputes_db[dispute_id]
     
     # Verify user is a participant
-    is_participant = any(p.user_id == request.sender_id for p in dispute.participants)
+    is_participant = disputes_db.is_participant(dispute_id, request.sender_id)
     if not is_participant:
         raise HTTPException(status_code=403, detail="User is not a participant in this dispute")
     
@@ -576,8 +612,9 @@ async def send_message(dispute_id: str, request: SendMessageRequest, db: Session
     
     dispute.add_message(message)
 
-    # Persist to analytics table
-    db_message = ChatMessageLog(
+    # Persist to analytics table (buffered, bulk-inserted in the background)
+    analytics_writer.add(
+        ChatMessageLog,
         id=message.id,
         dispute_id=dispute_id,
         sender_id=request.sender_id,
@@ -586,18 +623,10 @@ async def send_message(dispute_id: str, request: SendMessageRequest, db: Session
         is_private=request.is_private,
         created_at=message.timestamp,
     )
-    db.add(db_message)
-    db.commit()
     
-    # --- NEW: push message to Upstash chat list & update dispute snapshot ---
-    try:
-        chat_key = f"chat:{dispute_id}"
-        chat_log = upstash_get(chat_key) or []
-        chat_log.append(message.dict())
-        upstash_set(chat_key, chat_log)
-        _sync_dispute(dispute)
-    except Exception as up_err:
-        logger.warning(f"Upstash chat sync failed: {up_err}")
+    # --- NEW: append message to Upstash chat list & update dispute snapshot ---
+    _append_chat_log(dispute_id, message)
+    _sync_dispute(dispute)
     # --- END NEW ---
 
     # Check if AI intervention is needed
@@ -605,7 +634,8 @@ async def send_message(dispute_id: str, request: SendMessageRequest, db: Session
     if ai_response:
         dispute.add_message(ai_response)
 
-        db_ai_msg = ChatMessageLog(
+        analytics_writer.add(
+            ChatMessageLog,
             id=ai_response.id,
             dispute_id=dispute_id,
             sender_id="ai",
@@ -614,8 +644,6 @@ async def send_message(dispute_id: str, request: SendMessageRequest, db: Session
             is_private=False,
             created_at=ai_response.timestamp,
         )
-        db.add(db_ai_msg)
-        db.commit()
     
     # Notify other participants via WebSocket
     await notify_websocket_clients(dispute_id, {
@@ -633,29 +661,51 @@ async def send_message(dispute_id: str, request: SendMessageRequest, db: Session
     }
 
 @app.get("/api/disputes/{dispute_id}/messages")
-async def get_dispute_messages(dispute_id: str, limit: int = 50, for_user_id: str | None = None):
+async def get_dispute_messages(
+    dispute_id: str,
+    request: Request,
+    limit: int = 50,
+    for_user_id: str | None = None,
+    before: str | None = None,
+    after: str | None = None,
+    fields: str | None = None,
+):
     """Return dispute messages visible to a specific user.
 
     Visibility rules:
     • Public messages (`is_private == False`) are always returned.
     • Private messages are returned *only* if the caller is the sender **or** the designated recipient.
     If `for_user_id` is not supplied the behaviour is unchanged (admin/debug use-case).
+
+    Pagination (keyset, oldest first):
+    • No cursor – the most recent `limit` messages.
+    • `before=<message id | ISO timestamp>` – the `limit` messages preceding the cursor (scroll back).
+    • `after=<message id | ISO timestamp>` – the `limit` messages following the cursor (catch up on new ones).
+    The `X-Has-More` header tells the client whether another page exists in that direction.
+    The ETag is the dispute's version: polling with If-None-Match gets a 304 until something changes.
+    `fields=id,sender_id,content` returns only those message fields.
     """
     if dispute_id not in disputes_db:
         raise HTTPException(status_code=404, detail="Dispute not found")
 
-    all_messages = disputes_db[dispute_id].messages
+    etag = etag_for(disputes_db[dispute_id].version)
+    unchanged = not_modified(request.headers.get("if-none-match"), etag)
+    if unchanged:
+        return unchanged
 
-    if for_user_id:
-        visible = [
-            m for m in all_messages
-            if (not m.is_private) or (m.sender_id == for_user_id) or (m.recipient_id == for_user_id)
-        ]
-    else:
-        visible = all_messages
+    try:
+        include = parse_fields(f"id,{fields}", MediationMessage) if fields else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        page, has_more = disputes_db[dispute_id].page_messages(for_user_id, limit, before=before, after=after)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
 
-    # Return most recent `limit` messages
-    return visible[-limit:] if len(visible) > limit else visible
+    return FastJSONResponse(page, include=include, headers={
+        "X-Has-More": "true" if has_more else "false",
+        "ETag": etag,
+    })
 
 # ==============================================================================
 # MEDIATION ENDPOINTS
@@ -706,7 +756,7 @@ async def conduct_mediation(dispute_id: str):
         logger.error(f"Error in mediation for dispute {dispute_id}: {str(e)}")
 
 @app.post("/api/disputes/{dispute_id}/mediation/propose")
-async def propose_resolution(dispute_id: str, request: CreateProposalRequest, db: Session = Depends(get_db)):
+async def propose_resolution(dispute_id: str, request: CreateProposalRequest):
     """Create a resolution proposal"""
     if dispute_id not in disputes_db:
         raise HTTPException(status_code=404, detail="Dispute not found")
@@ -727,8 +777,9 @@ async def propose_resolution(dispute_id: str, request: CreateProposalRequest, db
     
     dispute.add_proposal(proposal)
 
-    # Log proposal
-    db_resolution = ResolutionLog(
+    # Log proposal (buffered)
+    analytics_writer.add(
+        ResolutionLog,
         id=proposal.id,
         dispute_id=dispute_id,
         proposed_by=request.proposed_by,
@@ -741,8 +792,6 @@ async def propose_resolution(dispute_id: str, request: CreateProposalRequest, db
         is_final=False,
         created_at=proposal.created_at,
     )
-    db.add(db_resolution)
-    db.commit()
     
     # Notify participants
     await notify_participants(dispute, f"New resolution proposal: {proposal.title}")
@@ -753,8 +802,20 @@ async def propose_resolution(dispute_id: str, request: CreateProposalRequest, db
         "proposal": proposal
     }
 
+@app.get("/api/disputes/{dispute_id}/proposals")
+async def get_dispute_proposals(dispute_id: str, request: Request, offset: int = 0, limit: Optional[int] = None,
+                                fields: Optional[str] = None):
+    """Get resolution proposals for a dispute, oldest first; paged and projected like `/evidence`"""
+    if dispute_id not in disputes_db:
+        raise HTTPException(status_code=404, detail="Dispute not found")
+
+    dispute = disputes_db[dispute_id]
+    etag = etag_for(dispute.version)
+    return (not_modified(request.headers.get("if-none-match"), etag)
+            or _page_response(dispute.proposals, ResolutionProposal, offset, limit, fields, etag))
+
 @app.post("/api/disputes/{dispute_id}/proposals/{proposal_id}/respond")
-async def respond_to_proposal(dispute_id: str, proposal_id: str, request: AcceptProposalRequest, db: Session = Depends(get_db)):
+async def respond_to_proposal(dispute_id: str, proposal_id: str, request: AcceptProposalRequest):
     """Accept or reject a resolution proposal"""
     if dispute_id not in disputes_db:
         raise HTTPException(status_code=404, detail="Dispute not found")
@@ -772,16 +833,7 @@ async def respond_to_proposal(dispute_id: str, proposal_id: str, request: Accept
         raise HTTPException(status_code=404, detail="Proposal not found")
     
     # Update proposal
-    if request.accept:
-        if request.user_id not in proposal.accepted_by:
-            proposal.accepted_by.append(request.user_id)
-        if request.user_id in proposal.rejected_by:
-            proposal.rejected_by.remove(request.user_id)
-    else:
-        if request.user_id not in proposal.rejected_by:
-            proposal.rejected_by.append(request.user_id)
-        if request.user_id in proposal.accepted_by:
-            proposal.accepted_by.remove(request.user_id)
+    dispute.respond_to_proposal(proposal, request.user_id, request.accept)
     
     # Check if all participants have accepted
     participant_count = len(dispute.participants)
@@ -793,10 +845,10 @@ async def respond_to_proposal(dispute_id: str, proposal_id: str, request: Accept
         await notify_participants(dispute, f"Dispute resolved! Resolution: {proposal.title}")
 
         # Mark resolution as final in DB
-        db_resolution_row = db.query(ResolutionLog).filter(ResolutionLog.id == proposal.id).first()
-        if db_resolution_row:
-            db_resolution_row.is_final = True
-            db.commit()
+        analytics_writer.update(ResolutionLog, proposal.id, is_final=True)
+    
+    # Mirror the vote (a proposal_updated delta) and any resolution to Upstash
+    _sync_dispute(dispute)
     
     user = users_db[request.user_id]
     action = "accepted" if request.accept else "rejected"
@@ -879,7 +931,7 @@ async def get_dispute_analytics(dispute_id: str):
         raise HTTPException(status_code=404, detail="Dispute not found")
     
     dispute = disputes_db[dispute_id]
-    analytics = await mediation_orchestrator.analyst.analyze_dispute(dispute)
+    analytics = await mediation_orchestrator.analyst.analyze_dispute(dispute, refine=settings.sentiment_llm_refine)
     
     return analytics
 
@@ -979,7 +1031,7 @@ async def sign_contract(dispute_id: str, request: SignContractRequest):
         raise HTTPException(status_code=404, detail="Contract not generated yet")
     
     # Verify user is a participant
-    is_participant = any(p.user_id == request.user_id for p in dispute.participants)
+    is_participant = disputes_db.is_participant(dispute_id, request.user_id)
     if not is_participant:
         raise HTTPException(status_code=403, detail="User is not a participant in this dispute")
     
@@ -1112,43 +1164,41 @@ async def get_cost_settings():
 async def websocket_endpoint(websocket: WebSocket, dispute_id: str):
     """WebSocket endpoint for real-time dispute updates"""
     await websocket.accept()
-    websocket_connections[dispute_id] = websocket
+    subscriber = dispute_hub.connect(dispute_id, websocket)
     
     try:
         while True:
             data = await websocket.receive_text()
             message_data = json.loads(data)
             
-            # Handle different message types
+            # Handle different message types (replies go through the connection's send queue)
             if message_data.get("type") == "ping":
-                await websocket.send_text(json.dumps({"type": "pong"}))
+                subscriber.send({"type": "pong"})
             elif message_data.get("type") == "get_dispute_status":
                 if dispute_id in disputes_db:
                     dispute = disputes_db[dispute_id]
-                    await websocket.send_text(json.dumps({
+                    subscriber.send({
                         "type": "dispute_status",
                         "dispute_id": dispute_id,
                         "status": dispute.status,
                         "message_count": len(dispute.messages)
-                    }))
+                    })
             
     except WebSocketDisconnect:
         logger.info(f"WebSocket disconnected for dispute {dispute_id}")
     finally:
-        if dispute_id in websocket_connections:
-            del websocket_connections[dispute_id]
+        dispute_hub.disconnect(subscriber)
 
 # ==============================================================================
 # UTILITY FUNCTIONS
 # ==============================================================================
 
 async def notify_websocket_clients(dispute_id: str, message: Dict):
-    """Notify WebSocket clients about dispute updates"""
-    if dispute_id in websocket_connections:
-        try:
-            await websocket_connections[dispute_id].send_text(json.dumps(message))
-        except Exception as e:
-            logger.error(f"Error sending WebSocket message: {str(e)}")
+    """Notify every WebSocket subscribed to a dispute, on any worker (queued; never waits on a socket)"""
+    try:
+        await broker.publish("dispute", dispute_id, message)
+    except Exception as e:
+        logger.error(f"Error publishing WebSocket message: {str(e)}")
 
 async def notify_participants(dispute: Dispute, message: str):
     """Send notification to all participants in a dispute"""
@@ -1157,13 +1207,14 @@ async def notify_participants(dispute: Dispute, message: str):
         db = next(get_db())
     except Exception:
         db = None
-    # Push notification via APNs (best effort)
-    if hasattr(settings, "apns_key_id") and settings.apns_key_id:
-        from database import Device  # avoid circular
-        for p in dispute.participants:
-            tokens = db.query(Device).filter(Device.user_id == p.user_id).all() if db else []
-            for t in tokens:
-                _send_push(t.apns_token, "Dispute Update", message)
+    # Push notification via APNs (best effort, queued; one device query for all participants)
+    try:
+        push_dispatcher.notify_users(db, [p.user_id for p in dispute.participants], "Dispute Update", message)
+    except Exception as e:
+        logger.warning(f"Push dispatch failed: {e}")
+    finally:
+        if db is not None:
+            db.close()
 
     # Also log and send via WebSocket
     logger.info(f"Notification for dispute {dispute.id}: {message}")
@@ -1176,14 +1227,19 @@ async def notify_participants(dispute: Dispute, message: str):
 
 # ----------------- Upstash sync helpers -----------------
 
-def _upstash_save(key: str, value: Any):
-    try:
-        upstash_set(key, value)
-    except Exception as up_err:
-        logger.warning(f"Upstash set failed for {key}: {up_err}")
+# All mirroring goes through the write-behind queue: handlers return without
+# waiting on Upstash, and bursts are coalesced into one pipelined flush.
+
+def _upstash_save(key: str, value: Any, ex: Optional[int] = None):
+    write_behind.enqueue_set(key, value, ex=ex)
 
 def _sync_dispute(dispute: Dispute):
-    _upstash_save(f"dispute:{dispute.id}", dispute.dict())
+    """Schedule a delta sync of a dispute; repeated calls within one flush window collapse into one"""
+    write_behind.enqueue_job(f"dispute:{dispute.id}", lambda: dispute_syncer.sync(dispute))
+
+def _append_chat_log(dispute_id: str, message: MediationMessage):
+    """Queue an RPUSH of one message onto `chat:{dispute_id}`"""
+    write_behind.enqueue_rpush(f"chat:{dispute_id}", message.model_dump(mode="json"))
 # --------------------------------------------------------
 
 # ==============================================================================
@@ -1298,13 +1354,65 @@ async def health_check():
         "users_count": len(users_db)
     }
 
+@app.get("/api/admin/kv-queue")
+async def admin_kv_queue_metrics():
+    """Write-behind queue depth, lag and flush counters"""
+    return write_behind.metrics()
+
+@app.get("/api/admin/db-pool")
+async def admin_db_pool_metrics():
+    """Database pool usage: checked-out and overflow connections, checkout wait times"""
+    return pool_stats()
+
+@app.get("/api/admin/auth-cache")
+async def admin_auth_cache_metrics():
+    """Hit rates and sizes of the decoded-token and user-row caches"""
+    return auth_cache_metrics()
+
+@app.get("/api/admin/password-hasher")
+async def admin_password_hasher_metrics():
+    """bcrypt pool size, queued calls and rejections"""
+    return password_hasher.metrics()
+
+@app.get("/api/admin/llm")
+async def admin_llm_metrics():
+    """LLM calls in flight and queued for a slot, timeouts, errors and average latency"""
+    return llm_clients.metrics()
+
+@app.get("/api/admin/llm-cache")
+async def admin_llm_cache_metrics():
+    """LLM response cache: memory entries/bytes, hit rates and evictions per tier"""
+    return llm_cache.metrics()
+
+@app.get("/api/admin/rate-limit")
+async def admin_rate_limit_metrics():
+    """Rate-limit backend, live buckets and allowed/limited counts"""
+    return rate_limiter.metrics()
+
+@app.get("/api/admin/analytics-writer")
+async def admin_analytics_writer_metrics():
+    """Buffered analytics rows, flush timings and dropped/retried batches"""
+    return analytics_writer.metrics()
+
+@app.get("/api/admin/ws-hub")
+async def admin_ws_hub_metrics():
+    """Dispute WebSocket subscriber counts and slow-consumer drops"""
+    return dispute_hub.metrics()
+
 @app.get("/api/admin/users")
-async def admin_get_all_users():
-    """Return user snapshots stored in Upstash Redis under key 'users'. This avoids DB connectivity issues."""
-    users_data = upstash_get("users")
-    if users_data is None:
+async def admin_get_all_users(cursor: int = 0, limit: int = 100):
+    """Page through user snapshots in the Upstash registry, in registration order. This avoids DB connectivity issues."""
+    cursor, limit = max(cursor, 0), max(1, min(limit, 1000))
+    users_data, next_cursor, total = await user_registry.page(cursor, limit)
+    if total == 0:
+        # Pre-registry deployments only have the monolithic list
+        legacy = await async_upstash.get(LEGACY_USERS_KEY) or []
+        users_data = legacy[cursor:cursor + limit]
+        next_cursor = cursor + limit if cursor + limit < len(legacy) else None
+        total = len(legacy)
+    if total == 0:
         return {"users": [], "source": "upstash", "note": "No data found"}
-    return {"users": users_data, "source": "upstash"}
+    return {"users": users_data, "next_cursor": next_cursor, "total": total, "source": "upstash"}
 
 # ==============================================================================
 # STARTUP EVENTS
@@ -1319,9 +1427,24 @@ async def startup_event():
 
     # Init Sentry if DSN provided
     if settings.sentry_dsn:
+        import sentry_sdk  # only loaded when a DSN is configured
         sentry_sdk.init(dsn=settings.sentry_dsn, traces_sample_rate=0.2)
         logger.info("Sentry initialised")
 
+    # Drain queued Upstash writes; compact idle disputes' delta logs into snapshots
+    write_behind.start()
+    asyncio.create_task(dispute_syncer.run_compactor())
+
+    # Background APNs senders and analytics bulk writer
+    push_dispatcher.start()
+    analytics_writer.start()
+
+    # Relay WebSocket events published by other workers
+    try:
+        await broker.start()
+    except Exception as e:
+        logger.error(f"Pub/sub broker failed to start: {e}")
+
     # Initialize DB but make sure any failure doesn't bring the whole service down
     try:
         init_db()
@@ -1329,6 +1452,18 @@ async def startup_event():
         logger.error(f"Database initialisation failed: {db_init_err}")
         # Don't raise – we'll fallback to in-memory dicts so read-only endpoints still work
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush queued Upstash writes and release pooled connections"""
+    await write_behind.stop()
+    await broker.stop()
+    await push_dispatcher.stop()
+    await analytics_writer.stop()
+    await async_upstash.aclose()
+    await llm_clients.aclose()
+    llm_cache.close()
+    password_hasher.shutdown()
+
 # ============================
 # PHONE VERIFICATION
 # ============================
@@ -1340,10 +1475,7 @@ async def request_verification_code(phone: str):
     code = f"{random.randint(0, 999999):06d}"
 
     # Store in Upstash with 10-minute expiry
-    try:
-        upstash_set(f"phone_code:{phone}", code, ex=600)
-    except Exception as e:
-        logger.warning(f"Failed to save phone code: {e}")
+    _upstash_save(f"phone_code:{phone}", code, ex=600)
 
     # TODO: integrate Twilio. For now just log.
     logger.info(f"[DEV] Verification code for {phone}: {code}")
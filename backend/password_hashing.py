@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from passlib.context import CryptContext
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Password hashing
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Stored instead of a hash for phone-only accounts: no password ever matches it,
+# and creating such an account costs no bcrypt round
+NO_PASSWORD = "!"
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+def check_password(password: str, hashed: Optional[str]) -> bool:
+    if not hashed or hashed == NO_PASSWORD:
+        return False
+    return pwd_context.verify(password, hashed)
+
+
+class HashingBusy(Exception):
+    """Raised when `max_pending` hash/verify calls are already queued"""
+
+
+class PasswordHasher:
+    """Runs bcrypt off the event loop on a dedicated worker pool.
+
+    Each bcrypt call is tens to hundreds of ms of CPU. Handlers await
+    `hash` / `verify` instead of calling passlib inline. bcrypt releases the
+    GIL, so the default thread pool scales with cores; set
+    `use_processes` to use a process pool instead. At most `max_pending` calls
+    may be queued or running; beyond that `HashingBusy` is raised so a login
+    burst is shed instead of piling up.
+    """
+
+    def __init__(self, workers: int = settings.password_hash_workers,
+                 max_pending: int = settings.password_hash_max_pending,
+                 use_processes: bool = settings.password_hash_use_processes):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.use_processes = use_processes
+        self._pool: Optional[Executor] = None
+        self._pending = 0
+        self._stats = {"hashed": 0, "verified": 0, "rejected": 0}
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            if self.use_processes:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._pool
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self._stats["rejected"] += 1
+            raise HashingBusy(f"{self._pending} password hashes already pending")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(hash_password, password)
+        self._stats["hashed"] += 1
+        return hashed
+
+    async def verify(self, password: str, hashed: Optional[str]) -> bool:
+        if not hashed or hashed == NO_PASSWORD:
+            return False
+        ok = await self._run(check_password, password, hashed)
+        self._stats["verified"] += 1
+        return ok
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "pool": "process" if self.use_processes else "thread",
+            "workers": self.workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            **self._stats,
+        }
+
+# Global hasher used by the auth endpoints
+password_hasher = PasswordHasher()
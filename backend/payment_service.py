@@ -1,37 +1,60 @@
 import os
-import stripe
 import httpx
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 import logging
 import hashlib
 import hmac
-import plaid
-from plaid.api import plaid_api
-from plaid.model.link_token_create_request import LinkTokenCreateRequest
-from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
-from plaid.model.processor_stripe_bank_account_token_create_request import ProcessorStripeBankAccountTokenCreateRequest
-from plaid.model.accounts_get_request import AccountsGetRequest
-from plaid.model.country_code import CountryCode
-from plaid.model.products import Products
+import importlib
+
+from config import settings
 
 logger = logging.getLogger(__name__)
 
-# Initialize Stripe
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+class _LazyModule:
+    """Stands in for a provider SDK until an attribute is first used.
 
-# Initialize Plaid
-from config import settings
+    stripe and plaid take a few hundred ms to import; only the payment routes
+    need them, so they stay off the API's cold-start path.
+    """
+
+    def __init__(self, name: str, on_import=None):
+        self._name = name
+        self._on_import = on_import
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            module = importlib.import_module(self._name)
+            if self._on_import:
+                self._on_import(module)
+            self._module = module
+        return getattr(self._module, attr)
+
+def _init_stripe(module):
+    module.api_key = os.getenv("STRIPE_SECRET_KEY")
 
-configuration = plaid.Configuration(
-    host=getattr(plaid.Environment, settings.plaid_env, plaid.Environment.sandbox),
-    api_key={
-        'clientId': settings.plaid_client_id,
-        'secret': settings.plaid_secret,
-    }
-)
-api_client = plaid.ApiClient(configuration)
-plaid_client = plaid_api.PlaidApi(api_client)
+# Initialize Stripe (on first use)
+stripe = _LazyModule("stripe", on_import=_init_stripe)
+
+# Initialize Plaid (on first use)
+_plaid_client = None
+
+def get_plaid_client():
+    global _plaid_client
+    if _plaid_client is None:
+        import plaid
+        from plaid.api import plaid_api
+
+        configuration = plaid.Configuration(
+            host=getattr(plaid.Environment, settings.plaid_env.capitalize(), plaid.Environment.Sandbox),
+            api_key={
+                'clientId': settings.plaid_client_id,
+                'secret': settings.plaid_secret,
+            }
+        )
+        _plaid_client = plaid_api.PlaidApi(plaid.ApiClient(configuration))
+    return _plaid_client
 
 class PaymentService:
     """Unified payment service supporting multiple providers with minimal compliance"""
@@ -48,6 +71,11 @@ class PaymentService:
     
     async def create_plaid_link_token(self, user_id: str, user_email: str) -> Dict[str, Any]:
         """Create Plaid Link token for bank account connection"""
+        from plaid.model.country_code import CountryCode
+        from plaid.model.link_token_create_request import LinkTokenCreateRequest
+        from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
+        from plaid.model.products import Products
+
         try:
             request = LinkTokenCreateRequest(
                 products=[Products('auth'), Products('transactions')],
@@ -58,7 +86,7 @@ class PaymentService:
                 redirect_uri=os.getenv("FRONTEND_URL") + "/plaid-redirect"
             )
             
-            response = plaid_client.link_token_create(request)
+            response = get_plaid_client().link_token_create(request)
             
             return {
                 "link_token": response['link_token'],
@@ -70,7 +98,11 @@ class PaymentService:
     
     async def exchange_plaid_token(self, public_token: str, user_id: str) -> Dict[str, Any]:
         """Exchange Plaid public token for access token and create Stripe bank account"""
+        from plaid.model.accounts_get_request import AccountsGetRequest
+        from plaid.model.processor_stripe_bank_account_token_create_request import ProcessorStripeBankAccountTokenCreateRequest
+
         try:
+            plaid_client = get_plaid_client()
             # Exchange public token for access token
             exchange_response = plaid_client.item_public_token_exchange({
                 'public_token': public_token
@@ -176,7 +208,7 @@ class PaymentService:
             logger.error(f"Instant deposit failed: {str(e)}")
             raise
     
-    async def _get_or_create_stripe_customer(self, user_id: str) -> stripe.Customer:
+    async def _get_or_create_stripe_customer(self, user_id: str) -> "stripe.Customer":
         """Get or create Stripe customer for user"""
         # In production, store stripe_customer_id in your database
         # For now, we'll search by metadata
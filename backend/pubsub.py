@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+from config import settings
+from ws_hub import Subscriber, WebSocketHub, clash_hub, dispute_hub
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+class PubSubBroker(ABC):
+    """Routes real-time events to the WebSocket hubs of every worker.
+
+    Channels are named `<namespace>:<topic>` (e.g. `dispute:<id>`,
+    `clash:<id>`) and each namespace is attached to the local hub that owns
+    those sockets. `publish` serialises once. The frame travels with the id
+    of the subscriber to skip, so "everyone but the sender" still works when
+    the sender is connected to a different worker.
+    """
+
+    def __init__(self):
+        self._hubs: Dict[str, WebSocketHub] = {}
+
+    def attach(self, namespace: str, hub: WebSocketHub):
+        self._hubs[namespace] = hub
+
+    async def publish(self, namespace: str, topic: str, message: Dict[str, Any],
+                      exclude: Optional[Subscriber] = None):
+        text = json.dumps(message, default=str)
+        await self._publish(f"{namespace}:{topic}", _envelope(exclude.id if exclude else None, text))
+
+    @abstractmethod
+    async def _publish(self, channel: str, data: str):
+        """Send `data` on `channel` to every worker, this one included"""
+
+    def _deliver(self, channel: str, data: str):
+        namespace, _, topic = channel.partition(":")
+        hub = self._hubs.get(namespace)
+        if hub is None:
+            return
+        exclude_id, _, text = data.partition("\n")
+        hub.broadcast_text(topic, text, exclude_id or None)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class InMemoryBroker(PubSubBroker):
+    """Single-process backend: publishing delivers straight to the local hubs"""
+
+    async def _publish(self, channel: str, data: str):
+        self._deliver(channel, data)
+
+
+class RedisBroker(PubSubBroker):
+    """Cross-worker backend over Redis PUBLISH / PSUBSCRIBE.
+
+    Works with any server that speaks the Redis protocol (redis-server, the
+    Upstash TCP endpoint, or an in-process stand-in such as
+    `fakeredis.aioredis.FakeRedis` passed in as `client`). Every worker
+    subscribes to `<namespace>:*` for each attached namespace and relays
+    what it receives to its local hub, including events it published itself.
+    """
+
+    def __init__(self, url: str = "", client: Any = None):
+        super().__init__()
+        if client is None:
+            if not REDIS_AVAILABLE:
+                raise RuntimeError("redis package not installed")
+            client = aioredis.from_url(url, decode_responses=True)
+        self.client = client
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def _publish(self, channel: str, data: str):
+        await self.client.publish(channel, data)
+
+    async def start(self):
+        if self._reader is not None:
+            return
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.psubscribe(*(f"{namespace}:*" for namespace in self._hubs))
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message and message.get("type") == "pmessage":
+                    self._deliver(_text(message["channel"]), _text(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Pub/sub reader error: {e}")
+                await asyncio.sleep(1)
+
+    async def stop(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+
+def _envelope(exclude_id: Optional[str], text: str) -> str:
+    return f"{exclude_id or ''}\n{text}"
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+def create_broker() -> PubSubBroker:
+    """Build the broker selected by PUBSUB_BACKEND ("memory" or "redis")"""
+    broker: PubSubBroker = InMemoryBroker()
+    if settings.pubsub_backend == "redis":
+        if not settings.pubsub_redis_url:
+            logger.warning("PUBSUB_BACKEND=redis but PUBSUB_REDIS_URL is empty; using in-memory broker")
+        elif not REDIS_AVAILABLE:
+            logger.warning("redis package not installed; using in-memory broker")
+        else:
+            broker = RedisBroker(settings.pubsub_redis_url)
+    broker.attach("dispute", dispute_hub)
+    broker.attach("clash", clash_hub)
+    return broker
+
+# Global broker used by mediation_api and social_api
+broker = create_broker()
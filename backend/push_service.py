@@ -0,0 +1,202 @@
+import asyncio
+import base64
+import binascii
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+from jose import jwt
+from sqlalchemy.orm import Session
+
+from config import settings
+
+try:
+    import h2  # noqa: F401 – enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+APNS_PRODUCTION = "https://api.push.apple.com"
+APNS_SANDBOX = "https://api.sandbox.push.apple.com"
+# APNs rejects provider tokens older than an hour; refresh well before that
+TOKEN_REFRESH_SECONDS = 50 * 60
+# Responses meaning the device token will never work again
+UNREGISTERED_REASONS = {"BadDeviceToken", "Unregistered", "DeviceTokenNotForTopic"}
+
+def tokens_for_users(db: Session, user_ids: Iterable[str]) -> List[str]:
+    """APNs tokens for every device of the given users, in a single query"""
+    from database import Device  # avoid circular
+
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return []
+    return [token for (token,) in db.query(Device.apns_token).filter(Device.user_id.in_(user_ids)).all()]
+
+
+class PushDispatcher:
+    """Background APNs sender.
+
+    The .p8 signing key is decoded once and the ES256 provider token is
+    cached and refreshed every 50 minutes. One `httpx.AsyncClient` is kept
+    for the process (HTTP/2 when `h2` is installed), so every push reuses
+    the same connection. `enqueue` never blocks the caller: `concurrency`
+    worker tasks drain a bounded queue. When the queue is full, new pushes
+    are dropped and counted. `stop` first lets the workers send what is
+    still queued, for up to `push_drain_timeout_seconds`. Point `endpoint`
+    at a local fake APNs server to exercise the whole path without Apple.
+    """
+
+    def __init__(self, key_id: str = settings.apns_key_id, team_id: str = settings.apns_team_id,
+                 key_base64: str = settings.apns_key_base64, topic: str = settings.apns_bundle_id,
+                 endpoint: Optional[str] = None, concurrency: int = settings.push_max_concurrency,
+                 queue_size: int = settings.push_queue_size, http2: bool = HTTP2_AVAILABLE):
+        self.key_id = key_id
+        self.team_id = team_id
+        self.topic = topic
+        self.endpoint = endpoint or settings.apns_endpoint or (APNS_SANDBOX if settings.apns_use_sandbox else APNS_PRODUCTION)
+        self.concurrency = concurrency
+        self.http2 = http2
+        self._signing_key = _decode_key(key_base64)
+        self._provider_token: Optional[str] = None
+        self._provider_token_at = 0.0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._http: Optional[httpx.AsyncClient] = None
+        self._workers: List[asyncio.Task] = []
+        self._stats = {"queued": 0, "sent": 0, "failed": 0, "dropped": 0, "unregistered": 0}
+        if self._signing_key and not self.topic:
+            logger.error("APNS_BUNDLE_ID is not set; APNs rejects pushes without apns-topic, so pushes are disabled")
+
+    def is_configured(self) -> bool:
+        return bool(self._signing_key and self.key_id and self.team_id and self.topic)
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(base_url=self.endpoint, http2=self.http2, timeout=10.0)
+        return self._http
+
+    def _bearer(self) -> str:
+        now = time.time()
+        if self._provider_token is None or now - self._provider_token_at > TOKEN_REFRESH_SECONDS:
+            self._provider_token = jwt.encode({"iss": self.team_id, "iat": int(now)}, self._signing_key,
+                                              algorithm="ES256", headers={"kid": self.key_id})
+            self._provider_token_at = now
+        return self._provider_token
+
+    # ------------------------------------------------------------------
+    # Producers
+    # ------------------------------------------------------------------
+
+    def enqueue(self, tokens: Iterable[str], title: str, body: str) -> int:
+        """Queue one alert per device token; returns how many were accepted"""
+        if not self.is_configured():
+            return 0
+        accepted = dropped = 0
+        for token in tokens:
+            try:
+                self._queue.put_nowait((token, title, body))
+                accepted += 1
+            except asyncio.QueueFull:
+                dropped += 1
+        if dropped:
+            logger.warning(f"Push queue full; dropped {dropped} notifications")
+        self._stats["queued"] += accepted
+        self._stats["dropped"] += dropped
+        return accepted
+
+    def notify_users(self, db: Optional[Session], user_ids: Iterable[str], title: str, body: str) -> int:
+        """Look up every device for `user_ids` in one query and queue the alert for each"""
+        if not (db and self.is_configured()):
+            return 0
+        return self.enqueue(tokens_for_users(db, user_ids), title, body)
+
+    # ------------------------------------------------------------------
+    # Sending
+    # ------------------------------------------------------------------
+
+    async def send(self, token: str, title: str, body: str) -> bool:
+        payload = {"aps": {"alert": {"title": title, "body": body}, "sound": "default"}}
+        headers = {
+            "authorization": f"bearer {self._bearer()}",
+            "apns-topic": self.topic,
+            "apns-push-type": "alert",
+        }
+        try:
+            resp = await self._client().post(f"/3/device/{token}", json=payload, headers=headers)
+        except httpx.HTTPError as e:
+            self._stats["failed"] += 1
+            logger.warning(f"APNs send failed: {e}")
+            return False
+        if resp.status_code == 200:
+            self._stats["sent"] += 1
+            return True
+
+        self._stats["failed"] += 1
+        reason = _reason(resp)
+        if resp.status_code == 410 or reason in UNREGISTERED_REASONS:
+            self._stats["unregistered"] += 1
+        logger.warning(f"APNs rejected push ({resp.status_code} {reason})")
+        return False
+
+    async def _worker(self):
+        while True:
+            token, title, body = await self._queue.get()
+            try:
+                await self.send(token, title, body)
+            except Exception as e:
+                logger.error(f"Push worker error: {e}")
+            finally:
+                self._queue.task_done()
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def drain(self):
+        """Wait until everything queued so far has been sent"""
+        await self._queue.join()
+
+    async def stop(self, timeout: float = settings.push_drain_timeout_seconds):
+        """Give the workers up to `timeout` seconds to send what is queued, then cancel them"""
+        if self._workers:
+            try:  # join() also waits for the pushes in flight
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        dropped = self._queue.qsize()
+        if dropped:
+            self._stats["dropped"] += dropped
+            logger.warning(f"Push dispatcher stopped with {dropped} notifications unsent")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"depth": self._queue.qsize(), "workers": len(self._workers), **self._stats}
+
+
+def _decode_key(key_base64: str) -> str:
+    """The .p8 key as text; "" (pushes disabled) if it is missing or malformed"""
+    if not key_base64:
+        return ""
+    try:
+        return base64.b64decode(key_base64).decode()
+    except (binascii.Error, UnicodeDecodeError) as e:
+        logger.error(f"APNS_KEY_BASE64 is not a base64-encoded .p8 key ({e}); push notifications are disabled")
+        return ""
+
+
+def _reason(resp: httpx.Response) -> str:
+    try:
+        return resp.json().get("reason", "")
+    except ValueError:
+        return ""
+
+# Global dispatcher (no-op until APNs credentials are configured)
+push_dispatcher = PushDispatcher()
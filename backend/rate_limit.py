@@ -0,0 +1,238 @@
+import json
+import logging
+import math
+import re
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from auth import verify_token
+from config import settings
+from upstash_client import async_upstash
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class RouteLimit:
+    """`requests` per `seconds` for each caller; `scope` is "user" (falls back to IP when anonymous) or "ip" """
+    requests: int
+    seconds: float
+    scope: str = "user"
+
+    @classmethod
+    def parse(cls, spec: str) -> "RouteLimit":
+        """Parse "30/60" (per user) or "5/600/ip" (per IP)"""
+        requests, seconds, *scope = spec.split("/")
+        return cls(int(requests), float(seconds), *scope)
+
+
+# Tighter limits for the routes that are cheap to call and expensive to serve.
+# Keys are "METHOD /path/template"; RATE_LIMIT_OVERRIDES (JSON) adds or replaces entries.
+ROUTE_LIMITS: Dict[str, RouteLimit] = {
+    "POST /api/auth/request-code": RouteLimit(5, 600, "ip"),
+    "POST /api/disputes/{dispute_id}/messages": RouteLimit(30, 60),
+    "POST /api/clashes/{clash_id}/vote": RouteLimit(60, 60),
+    "POST /api/login": RouteLimit(10, 60, "ip"),
+    "POST /api/register": RouteLimit(10, 600, "ip"),
+}
+
+# Mutating requests on other routes share the default RATE_LIMIT_REQUESTS per RATE_LIMIT_MINUTES
+DEFAULT_LIMITED_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+EXEMPT_PREFIXES = ("/api/health", "/api/admin/", "/webhooks/")
+
+
+class LocalBuckets:
+    """Per-worker token buckets in sharded dicts.
+
+    Each bucket is stored as a single number, its "theoretical arrival time"
+    (the GCRA form of a token bucket). A bucket holding `requests` tokens that
+    refill evenly over `seconds` allows the next request only when
+    `tat - requests * interval <= now`. All access happens on the event loop,
+    so no locks are needed. The shards keep cleanup cheap: when one grows past
+    its share of `max_keys`, only that shard is swept for buckets that have
+    fully refilled.
+    """
+
+    def __init__(self, shards: int = 16, max_keys: int = 100_000):
+        self._shards: List[Dict[str, float]] = [{} for _ in range(shards)]
+        self._max_per_shard = max(max_keys // shards, 1)
+
+    def take(self, key: str, limit: RouteLimit, now: Optional[float] = None) -> float:
+        """Consume one token; returns 0 if allowed, else seconds until a token is available"""
+        now = time.monotonic() if now is None else now
+        shard = self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+        interval = limit.seconds / limit.requests
+        tat = max(shard.get(key, now), now) + interval
+        wait = tat - limit.requests * interval - now
+        if wait > 0:
+            return wait
+        shard[key] = tat
+        if len(shard) > self._max_per_shard:
+            for stale in [k for k, t in shard.items() if t <= now]:
+                del shard[stale]
+        return 0.0
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+# GCRA in one round trip, timed by the Redis clock so every worker agrees
+_GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+tat = tat + interval
+local wait = tat - burst * interval - now
+if wait > 0 then return math.ceil(wait) end  -- Replies are truncated to integers; 0.4 ms must not read as allowed
+redis.call('SET', KEYS[1], tat, 'PX', math.ceil(tat - now))
+return 0
+"""
+
+
+class KVBuckets:
+    """Token buckets shared by every worker, kept in Upstash (EVAL of a GCRA script).
+
+    Any KV error or timeout falls back to the worker's local buckets, so an
+    outage degrades to per-worker limits instead of failing requests.
+    """
+
+    def __init__(self, local: LocalBuckets, client=async_upstash):
+        self.local = local
+        self.client = client
+        self.errors = 0
+
+    async def take(self, key: str, limit: RouteLimit) -> float:
+        interval_ms = limit.seconds * 1000 / limit.requests
+        result = await self.client.execute("EVAL", _GCRA_SCRIPT, 1, f"ratelimit:{key}", interval_ms, limit.requests)
+        if result is None:
+            self.errors += 1
+            return self.local.take(key, limit)
+        return float(result) / 1000
+
+
+def _compile(template: str) -> re.Pattern:
+    return re.compile("^" + re.sub(r"\\\{[^/]+?\\\}", "[^/]+", re.escape(template)) + "$")
+
+
+class RateLimiter:
+    """Picks the bucket for a request and takes a token from it"""
+
+    def __init__(self, default: RouteLimit, routes: Dict[str, RouteLimit], backend: str = "memory"):
+        self.default = default
+        self.local = LocalBuckets()
+        self.kv = KVBuckets(self.local) if backend == "kv" else None
+        self._exact: Dict[Tuple[str, str], Tuple[str, RouteLimit]] = {}
+        self._patterns: List[Tuple[str, re.Pattern, str, RouteLimit]] = []
+        for route, limit in routes.items():
+            method, template = route.split(" ", 1)
+            if "{" in template:
+                self._patterns.append((method, _compile(template), route, limit))
+            else:
+                self._exact[(method, template)] = (route, limit)
+        self._stats = {"allowed": 0, "limited": 0}
+
+    def match(self, method: str, path: str) -> Optional[Tuple[str, RouteLimit]]:
+        """(bucket name, limit) for a request, or None if it isn't limited"""
+        hit = self._exact.get((method, path))
+        if hit is not None:
+            return hit
+        for route_method, pattern, route, limit in self._patterns:
+            if route_method == method and pattern.match(path):
+                return route, limit
+        if method in DEFAULT_LIMITED_METHODS and not path.startswith(EXEMPT_PREFIXES):
+            return "default", self.default
+        return None
+
+    async def check(self, route: str, limit: RouteLimit, user_id: Optional[str], ip: str) -> float:
+        """0 if the request may proceed, else the Retry-After in seconds"""
+        key = f"{route}:u:{user_id}" if limit.scope == "user" and user_id else f"{route}:ip:{ip}"
+        wait = await self.kv.take(key, limit) if self.kv else self.local.take(key, limit)
+        self._stats["limited" if wait > 0 else "allowed"] += 1
+        return wait
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": "kv" if self.kv else "memory",
+            "buckets": len(self.local),
+            "kv_errors": self.kv.errors if self.kv else 0,
+            **self._stats,
+        }
+
+
+def _user_id(headers: Dict[bytes, bytes]) -> Optional[str]:
+    """Subject of the bearer token (decode is cached), or None; invalid tokens are limited by IP"""
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        return verify_token(authorization[7:].strip())
+    except Exception:
+        return None
+
+def _client_ip(scope, headers: Dict[bytes, bytes]) -> str:
+    """Address of the caller; with a trusted proxy, the one it appended to X-Forwarded-For.
+
+    Leftmost entries are written by the client and could be changed on every
+    request to get a fresh bucket, so only the entry `rate_limit_proxy_hops`
+    from the right is used.
+    """
+    if settings.rate_limit_trust_forwarded:
+        forwarded = headers.get(b"x-forwarded-for")
+        if forwarded:
+            hops = [hop.strip() for hop in forwarded.decode("latin-1").split(",")]
+            return hops[-min(max(settings.rate_limit_proxy_hops, 1), len(hops))]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware: answers 429 with Retry-After once a caller's bucket is empty.
+
+    Requests that match no bucket pass straight through after a dict lookup.
+    Limited ones cost one in-memory bucket update (or one KV call with the
+    "kv" backend).
+    """
+
+    def __init__(self, app, limiter: "RateLimiter" = None):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.rate_limit_enabled:
+            return await self.app(scope, receive, send)
+        matched = self.limiter.match(scope["method"], scope["path"])
+        if matched is None:
+            return await self.app(scope, receive, send)
+
+        route, limit = matched
+        headers = dict(scope["headers"])
+        wait = await self.limiter.check(route, limit, _user_id(headers), _client_ip(scope, headers))
+        if wait <= 0:
+            return await self.app(scope, receive, send)
+
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(wait)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def create_rate_limiter() -> RateLimiter:
+    routes = dict(ROUTE_LIMITS)
+    for route, spec in settings.rate_limit_overrides.items():
+        routes[route] = RouteLimit.parse(spec)
+    default = RouteLimit(settings.rate_limit_requests, settings.rate_limit_minutes * 60)
+    return RateLimiter(default, routes, backend=settings.rate_limit_backend)
+
+# Global limiter used by RateLimitMiddleware
+rate_limiter = create_rate_limiter()
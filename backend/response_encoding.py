@@ -0,0 +1,212 @@
+import gzip
+import json
+from typing import Any, Dict, List, Optional, Tuple, Type, get_args, get_origin
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from config import settings
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# ---------------- JSON -----------------
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if hasattr(obj, "value"):  # Enum
+        return obj.value
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by pydantic's Rust serializer or orjson.
+
+    Installed as the app's default response class, so every dict/list
+    response is dumped by orjson. Handlers with large models (a full dispute
+    with thousands of messages) should *return* `FastJSONResponse(model)`.
+    That skips FastAPI's jsonable_encoder pass, and the model goes straight
+    through `model_dump_json`. The output is the same JSON.
+
+    `include` is a pydantic include spec (see `parse_fields`). It applies to a
+    model or to each model in a list, so only the requested parts are built.
+    """
+
+    def __init__(self, content: Any, *args, include: Optional[Dict[str, Any]] = None, **kwargs):
+        self.include = include
+        super().__init__(content, *args, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json(include=self.include).encode()
+        if self.include is not None and isinstance(content, list):
+            return b"[" + b",".join(item.model_dump_json(include=self.include).encode() for item in content) + b"]"
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+# ---------------- Sparse fieldsets -----------------
+
+def _nested_model(annotation: Any) -> tuple:
+    """(model class, is_list) behind an annotation such as List[Evidence] or Optional[ResolutionProposal]"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    if get_origin(annotation) in (list, List):
+        return _nested_model(get_args(annotation)[0])[0], True
+    for arg in get_args(annotation):  # Optional / Union
+        model, is_list = _nested_model(arg)
+        if model is not None:
+            return model, is_list
+    return None, False
+
+def parse_fields(spec: str, model: Type[BaseModel], extra: tuple = ()) -> Dict[str, Any]:
+    """Turn "title,status,evidence.title" into a pydantic include spec for `model`.
+
+    Dotted paths select fields of nested models (and of every item in a list).
+    Names in `extra` are accepted as-is for computed fields the caller adds.
+    Raises ValueError for unknown fields.
+    """
+    include: Dict[str, Any] = {}
+    for path in filter(None, (p.strip() for p in spec.split(","))):
+        node, current = include, model
+        parts = path.split(".")
+        if len(parts) == 1 and path in extra:
+            include[path] = True
+            continue
+        for depth, part in enumerate(parts):
+            if current is None or part not in current.model_fields:
+                raise ValueError(f"Unknown field: {path}")
+            if depth == len(parts) - 1:
+                node[part] = True
+                break
+            if node.get(part) is True:
+                break  # The whole field is already included
+            current, is_list = _nested_model(current.model_fields[part].annotation)
+            node = node.setdefault(part, {})
+            if is_list:
+                node = node.setdefault("__all__", {})
+    return include
+
+
+# ---------------- Conditional GET -----------------
+
+def etag_for(version: int) -> str:
+    # Weak: the same version is sent raw or compressed
+    return f'W/"{version}"'
+
+def not_modified(if_none_match: Optional[str], etag: str) -> Optional[Response]:
+    """A 304 for `etag` if the client's If-None-Match already has it, else None"""
+    if not if_none_match:
+        return None
+    opaque = etag.removeprefix("W/")
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == opaque:
+            return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+# ---------------- Compression -----------------
+
+COMPRESSIBLE_TYPES = (b"application/json", b"text/")
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best encoding the client accepts: "br" (if brotli is installed), then "gzip", else None"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    if BROTLI_AVAILABLE and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.compression_brotli_quality)
+    return gzip.compress(body, compresslevel=settings.compression_gzip_level)
+
+
+def _vary_accept_encoding(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    """`headers` with Accept-Encoding added to Vary (merged into an existing Vary header)"""
+    for i, (k, v) in enumerate(headers):
+        if k == b"vary":
+            tokens = [t.strip().lower() for t in v.split(b",")]
+            if b"accept-encoding" not in tokens and b"*" not in tokens:
+                headers[i] = (k, v + b", Accept-Encoding")
+            return headers
+    return headers + [(b"vary", b"Accept-Encoding")]
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware: brotli/gzip-encodes JSON and text responses over `minimum_size` bytes.
+
+    The encoding is negotiated from Accept-Encoding, preferring brotli. Small
+    bodies are sent as they are, because compressing them costs more than it
+    saves. Streaming responses also pass through untouched, as do responses
+    that already carry a Content-Encoding. Every other compressible response
+    carries `Vary: Accept-Encoding`, compressed or not, so shared caches
+    don't serve one client's encoding to another.
+    """
+
+    def __init__(self, app, minimum_size: int = settings.compression_min_size):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"accept-encoding"), "")
+        encoding = choose_encoding(accept) if accept else None
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None:
+                return await send(message)
+
+            start, start_message = start_message, None
+            headers = [(k, v) for k, v in start["headers"]]
+            content_type = next((v for k, v in headers if k == b"content-type"), b"")
+            body = message.get("body", b"")
+            if (message.get("more_body") or any(k == b"content-encoding" for k, _ in headers)
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                await send(start)
+                return await send(message)
+
+            headers = _vary_accept_encoding(headers)
+            if encoding is None or len(body) < self.minimum_size:
+                await send({**start, "headers": headers})
+                return await send(message)
+
+            body = compress(body, encoding)
+            headers = [(k, v) for k, v in headers if k != b"content-length"]
+            headers += [(b"content-encoding", encoding.encode()), (b"content-length", str(len(body)).encode())]
+            await send({**start, "headers": headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,131 @@
+import re
+from typing import Dict, List, Tuple
+
+from config import settings
+
+# Word weights. Seeded from the demo's positive/negative indicators and the
+# escalation keywords ai_cost_controller looks for, plus common dispute vocabulary.
+LEXICON: Dict[str, float] = {
+    # Collaborative
+    "thank": 2.0, "thanks": 2.0, "appreciate": 2.0, "appreciated": 2.0, "understand": 1.5, "understood": 1.5,
+    "agree": 2.0, "agreed": 2.0, "willing": 1.5, "compromise": 2.0, "fair": 1.0, "reasonable": 1.5,
+    "sorry": 1.5, "apologize": 2.0, "apologise": 2.0, "accept": 1.5, "accepted": 1.5, "happy": 2.0,
+    "glad": 2.0, "great": 2.0, "good": 1.5, "resolve": 1.0, "resolved": 1.5, "settle": 1.0, "together": 1.0,
+    "respect": 1.5, "helpful": 1.5, "please": 0.5, "okay": 0.5, "ok": 0.5, "deal": 1.0, "works": 1.0,
+    # Hostile
+    "unfair": -2.0, "ridiculous": -2.5, "never": -1.5, "impossible": -1.5, "waste": -2.0, "stupid": -3.0,
+    "angry": -2.5, "frustrated": -2.0, "frustrating": -2.0, "liar": -3.0, "lying": -3.0, "lied": -3.0,
+    "dishonest": -2.5, "wrong": -1.5, "unacceptable": -2.5, "refuse": -2.0, "outrageous": -2.5,
+    "scam": -3.0, "fraud": -3.0, "cheat": -3.0, "cheated": -3.0, "threat": -2.5, "sue": -2.5,
+    "lawyer": -1.0, "court": -1.0, "hate": -3.0, "terrible": -2.5, "awful": -2.5, "useless": -2.5,
+    "pathetic": -3.0, "disgusting": -3.0, "idiot": -3.5, "joke": -1.5, "blame": -1.5, "fault": -1.0,
+    "demand": -1.0, "furious": -3.0, "insulting": -2.5, "nonsense": -2.5, "bad": -1.5,
+}
+
+# Two-word phrases whose words carry no weight on their own
+PHRASES: Dict[Tuple[str, str], float] = {
+    ("sounds", "good"): 2.0, ("makes", "sense"): 1.5, ("middle", "ground"): 2.0, ("common", "ground"): 2.0,
+    ("meet", "halfway"): 2.0, ("fair", "enough"): 1.5, ("no", "problem"): 1.5, ("shut", "up"): -3.0,
+    ("rip", "off"): -2.5, ("no", "way"): -2.0, ("fed", "up"): -2.5, ("give", "up"): -1.0,
+}
+
+# Flip the polarity of the next few words ("not fair", "don't agree")
+NEGATIONS = {"not", "no", "dont", "don't", "won't", "wont", "can't", "cant", "cannot", "isn't", "isnt",
+             "wasn't", "didn't", "didnt", "doesn't", "doesnt", "aren't", "nothing", "hardly", "without"}
+NEGATION_SCOPE = 3
+NEGATION_FACTOR = -0.75
+
+INTENSIFIERS = {"very": 1.3, "really": 1.3, "so": 1.2, "extremely": 1.5, "totally": 1.4, "completely": 1.4,
+                "absolutely": 1.5, "utterly": 1.5, "truly": 1.3}
+
+# The demo's neutral indicators: what follows a contrast outweighs what came before it
+CONTRASTS = {"but", "however", "although", "though", "yet"}
+
+_TOKEN = re.compile(r"[A-Za-z']+|!")
+
+
+def score_text(text: str) -> float:
+    """Sentiment of one message in [-1, 1], in a single pass over its tokens.
+
+    Lexicon weights are scaled by intensifiers, flipped within a short
+    negation scope, and boosted for SHOUTED words and exclamation marks.
+    The raw sum is squashed with x / sqrt(x^2 + 15), as VADER does.
+    """
+    raw = 0.0
+    negated = 0
+    boost = 1.0
+    exclamations = 0
+    previous = ""
+    for match in _TOKEN.finditer(text):
+        token = match.group()
+        if token == "!":
+            exclamations += 1
+            continue
+        word = token.lower()
+        phrase = PHRASES.get((previous, word))
+        weight = phrase or LEXICON.get(word, 0.0)
+        previous = word
+        if weight:
+            weight *= boost
+            if phrase and negated == NEGATION_SCOPE:
+                negated = 0  # The negator opened the phrase ("no problem"), it negates nothing
+            elif negated:
+                weight *= NEGATION_FACTOR
+            if len(token) > 2 and token.isupper():
+                weight *= 1.5
+            raw += weight
+            boost = 1.0
+        elif word in INTENSIFIERS:
+            boost = INTENSIFIERS[word]
+            continue
+        elif word in CONTRASTS:
+            raw *= 0.5
+        if word in NEGATIONS:
+            negated = NEGATION_SCOPE
+        elif negated:
+            negated -= 1
+    if raw and exclamations:
+        raw *= 1 + 0.1 * min(exclamations, 3)
+    return raw / (raw * raw + 15) ** 0.5
+
+
+class RunningSentiment:
+    """Recency-weighted mean of the scores of user messages, kept up to date incrementally.
+
+    Each new message costs one `score_text` call (O(its length)). Older
+    messages fade with a half-life of `half_life` messages, so the score
+    follows the current tone the way the old "last 10 messages" LLM prompt
+    did. As with MessageVisibilityIndex, messages assigned without
+    `add_message` are picked up on the next `sync`, and a replaced list is
+    rescored.
+    """
+
+    def __init__(self, half_life: int = settings.sentiment_half_life_messages):
+        self._decay = 0.5 ** (1 / max(half_life, 1))
+        self._reset()
+
+    def _reset(self):
+        self._source = None
+        self._indexed = 0
+        self._weighted = 0.0
+        self._weight = 0.0
+        self.scored = 0
+
+    def add(self, text: str):
+        self._weighted = self._weighted * self._decay + score_text(text)
+        self._weight = self._weight * self._decay + 1
+        self.scored += 1
+
+    def sync(self, messages: List) -> float:
+        if messages is not self._source or len(messages) < self._indexed:
+            self._reset()  # History was replaced – rebuild
+            self._source = messages
+        for position in range(self._indexed, len(messages)):
+            if messages[position].sender_type == "user":
+                self.add(messages[position].content)
+        self._indexed = len(messages)
+        return self.score
+
+    @property
+    def score(self) -> float:
+        return self._weighted / self._weight if self._weight else 0.0
@@ -1,48 +1,30 @@
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks
 from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, List
 from datetime import datetime, timedelta
 import random, string
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi.responses import Response
 
-from database import get_db, User as DBUser
-from auth import get_current_user
+from database import get_db, get_async_db, User as DBUser, Device
+from auth import get_current_user, get_current_user_async
 from social_models import Follow, ClashRoom, ClashVote, Badge, InviteCode, HighlightClip, XPLog, PredictionVote
-
-try:
-    from pyapns2.client import APNsClient
-    from pyapns2.payload import Payload
-    APNS_AVAILABLE = True
-except ImportError:
-    try:
-        from apns2.client import APNsClient
-        from apns2.payload import Payload
-        APNS_AVAILABLE = True
-    except ImportError:
-        APNS_AVAILABLE = False
-        APNsClient = None
-        Payload = None
+from ws_hub import clash_hub
+from pubsub import broker
+from push_service import push_dispatcher
 
 router = APIRouter(prefix="/api")
 
 # Helper function
 
 def _add_xp(db: Session, user: DBUser, points: int):
-    user.xp_points += points
+    # Increment in SQL: `user` may come from the auth cache and carry a stale total
+    user.xp_points = DBUser.xp_points + points
     db.add(XPLog(user_id=user.id, points=points))
     db.add(user)
 
-def _send_push(apns_token: str, title: str, body: str):
-    if not settings.apns_key_id:
-        return  # push disabled
-    try:
-        client = APNsClient(credentials=None, key_id=settings.apns_key_id, team_id=settings.apns_team_id)
-        payload = Payload(alert={"title": title, "body": body}, sound="default")
-        client.send_notification(apns_token, payload, topic=settings.bundle_id)
-    except Exception as e:
-        logger.error(f"push error {e}")
-
 # ----------------------------
 # FOLLOW / UNFOLLOW ENDPOINTS
 # ----------------------------
@@ -129,15 +111,15 @@ async def list_live_clashes(db: Session = Depends(get_db)):
 # WEBSOCKET FOR SPECTATORS
 # ----------------------------
 
-clash_ws_connections: Dict[str, List[WebSocket]] = {}
+# Spectator sockets live in ws_hub.clash_hub; events go through the pub/sub broker so
+# viewers connected to other workers see them too.
 
 @router.websocket("/ws/clash/{clash_id}")
 async def clash_websocket_endpoint(websocket: WebSocket, clash_id: str,
                                    db: Session = Depends(get_db)):
     await websocket.accept()
     # Connection management
-    connections = clash_ws_connections.setdefault(clash_id, [])
-    connections.append(websocket)
+    subscriber = clash_hub.connect(clash_id, websocket)
 
     # Increment viewer count
     try:
@@ -147,8 +129,7 @@ async def clash_websocket_endpoint(websocket: WebSocket, clash_id: str,
             db.add(clash)
             db.commit()
             # broadcast new count
-            for conn in connections:
-                await conn.send_json({"type":"vc","count": clash.viewer_count})
+            await broker.publish("clash", clash_id, {"type":"vc","count": clash.viewer_count})
     except SQLAlchemyError:
         pass  # Non-critical
 
@@ -156,11 +137,12 @@ async def clash_websocket_endpoint(websocket: WebSocket, clash_id: str,
         while True:
             data = await websocket.receive_json()
             # Broadcast reaction to peers
-            for conn in connections:
-                if conn is not websocket:
-                    await conn.send_json({"type": "reaction", "data": data})
+            await broker.publish("clash", clash_id, {"type": "reaction", "data": data}, exclude=subscriber)
     except WebSocketDisconnect:
-        connections.remove(websocket)
+        pass
+    finally:
+        # Also on errors (e.g. a non-JSON frame), so the subscriber and viewer count don't leak
+        clash_hub.disconnect(subscriber)
         # Decrement viewer count
         try:
             clash = db.query(ClashRoom).filter(ClashRoom.id == clash_id).first()
@@ -168,8 +150,7 @@ async def clash_websocket_endpoint(websocket: WebSocket, clash_id: str,
                 clash.viewer_count -= 1
                 db.add(clash)
                 db.commit()
-                for conn in connections:
-                    await conn.send_json({"type":"vc","count": clash.viewer_count})
+                await broker.publish("clash", clash_id, {"type":"vc","count": clash.viewer_count})
         except SQLAlchemyError:
             pass
 
@@ -178,16 +159,20 @@ async def clash_websocket_endpoint(websocket: WebSocket, clash_id: str,
 # ----------------------------
 
 @router.get("/feed")
-async def get_feed(current_user: DBUser = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_feed(current_user: DBUser = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
     """Aggregated feed of live clashes from people you follow plus trending rooms."""
     # Get followees ids
-    followees = db.query(Follow.followee_id).filter(Follow.follower_id == current_user.id).subquery()
+    followees = select(Follow.followee_id).where(Follow.follower_id == current_user.id)
 
     # Live clashes by followees
-    followed_live = db.query(ClashRoom).filter(ClashRoom.status == "live", ClashRoom.streamer_a_id.in_(followees)).all()
+    followed_live = (await db.execute(
+        select(ClashRoom).where(ClashRoom.status == "live", ClashRoom.streamer_a_id.in_(followees))
+    )).scalars().all()
 
     # Trending = top viewer count live rooms not in followed list
-    trending_live = db.query(ClashRoom).filter(ClashRoom.status == "live").order_by(ClashRoom.viewer_count.desc()).limit(10).all()
+    trending_live = (await db.execute(
+        select(ClashRoom).where(ClashRoom.status == "live").order_by(ClashRoom.viewer_count.desc()).limit(10)
+    )).scalars().all()
 
     def serialize(room: ClashRoom):
         return {
@@ -203,17 +188,14 @@ async def get_feed(current_user: DBUser = Depends(get_current_user), db: Session
 
 
 @router.get("/leaderboard")
-async def leaderboard(db: Session = Depends(get_db)):
+async def leaderboard(db: AsyncSession = Depends(get_async_db)):
     """Top 10 users by follower count."""
-    from sqlalchemy import func
-
-    results = (
-        db.query(Follow.followee_id, func.count(Follow.follower_id).label("followers"))
+    results = (await db.execute(
+        select(Follow.followee_id, func.count(Follow.follower_id).label("followers"))
         .group_by(Follow.followee_id)
         .order_by(func.count(Follow.follower_id).desc())
         .limit(10)
-        .all()
-    )
+    )).all()
     return [
         {"userId": r.followee_id, "followers": r.followers}
         for r in results
@@ -224,28 +206,31 @@ async def leaderboard(db: Session = Depends(get_db)):
 # ----------------------------
 
 @router.post("/clashes/{clash_id}/vote")
-async def vote_in_clash(clash_id: str, vote_for: str, current_user: DBUser = Depends(get_current_user), db: Session = Depends(get_db)):
+async def vote_in_clash(clash_id: str, vote_for: str, current_user: DBUser = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
     if vote_for not in ("A", "B"):
         raise HTTPException(status_code=400, detail="vote_for must be 'A' or 'B'")
 
-    clash = db.query(ClashRoom).filter(ClashRoom.id == clash_id).first()
+    clash = await db.get(ClashRoom, clash_id)
     if not clash:
         raise HTTPException(status_code=404, detail="Clash not found")
 
     # Upsert vote
-    existing = db.query(ClashVote).filter(ClashVote.clash_id == clash_id, ClashVote.user_id == current_user.id).first()
+    existing = (await db.execute(
+        select(ClashVote).where(ClashVote.clash_id == clash_id, ClashVote.user_id == current_user.id)
+    )).scalars().first()
     if existing:
         existing.vote_for = vote_for
     else:
         db.add(ClashVote(clash_id=clash_id, user_id=current_user.id, vote_for=vote_for))
         # award XP for first vote in a clash
         _add_xp(db, current_user, 5)
-    db.commit()
+    await db.commit()
 
-    # Aggregate votes
-    total_a = db.query(ClashVote).filter(ClashVote.clash_id == clash_id, ClashVote.vote_for == "A").count()
-    total_b = db.query(ClashVote).filter(ClashVote.clash_id == clash_id, ClashVote.vote_for == "B").count()
-    return {"A": total_a, "B": total_b}
+    # Aggregate votes (both sides in one query)
+    totals = dict((await db.execute(
+        select(ClashVote.vote_for, func.count()).where(ClashVote.clash_id == clash_id).group_by(ClashVote.vote_for)
+    )).all())
+    return {"A": totals.get("A", 0), "B": totals.get("B", 0)}
 
 # ----------------------------
 # BADGES ENDPOINT
@@ -440,10 +425,10 @@ async def evaluate_predictions(dispute_id: str, winner: str, db: Session = Depen
 # ----------------------------
 # LEADERBOARDS
 # ----------------------------
-from sqlalchemy import func, desc, Date
+from sqlalchemy import desc, Date
 
 @router.get("/leaderboard/overall")
-async def overall_leaderboard(limit: int = 20, db: Session = Depends(get_db)):
+async def overall_leaderboard(limit: int = 20, db: AsyncSession = Depends(get_async_db)):
     """Return top users by total XP in the shape expected by the mobile app.
 
     The SwiftUI client expects the following keys for each leaderboard entry:
@@ -454,12 +439,11 @@ async def overall_leaderboard(limit: int = 20, db: Session = Depends(get_db)):
     wins         – number of dispute wins
     """
 
-    users = (
-        db.query(DBUser)
+    users = (await db.execute(
+        select(DBUser)
         .order_by(DBUser.xp_points.desc())
         .limit(limit)
-        .all()
-    )
+    )).scalars().all()
 
     return [
         {
@@ -472,25 +456,25 @@ async def overall_leaderboard(limit: int = 20, db: Session = Depends(get_db)):
     ]
 
 @router.get("/leaderboard/daily")
-async def daily_leaderboard(limit: int = 20, db: Session = Depends(get_db)):
+async def daily_leaderboard(limit: int = 20, db: AsyncSession = Depends(get_async_db)):
     """Return top users by XP earned *today* in the shape expected by the mobile app."""
 
     today = datetime.utcnow().date()
 
     # Aggregate XP earned today per user
     subq = (
-        db.query(
+        select(
             XPLog.user_id.label("user_id"),
             func.sum(XPLog.points).label("xp_today"),
         )
-        .filter(func.date(XPLog.created_at) == today)
+        .where(func.date(XPLog.created_at) == today)
         .group_by(XPLog.user_id)
         .subquery()
     )
 
     # Join with the users table so we can include display name and win count
-    rows = (
-        db.query(
+    rows = (await db.execute(
+        select(
             DBUser.id,
             DBUser.display_name,
             DBUser.disputes_won,
@@ -499,8 +483,7 @@ async def daily_leaderboard(limit: int = 20, db: Session = Depends(get_db)):
         .join(subq, DBUser.id == subq.c.user_id)
         .order_by(subq.c.xp_today.desc())
         .limit(limit)
-        .all()
-    )
+    )).all()
 
     return [
         {
@@ -571,9 +554,8 @@ async def set_clash_public(clash_id: str, public: bool, current_user: DBUser = D
     clash.is_public = public
     db.commit()
     if public:
-        tokens = [d.apns_token for d in db.query(Device).join(Follow, Follow.follower_id == Device.user_id).filter(Follow.followee_id == current_user.id)]
-        for t in tokens:
-            _send_push(t, f"{current_user.display_name} is live!", "Tap to watch their clash 🔥")
+        tokens = [t for (t,) in db.query(Device.apns_token).join(Follow, Follow.follower_id == Device.user_id).filter(Follow.followee_id == current_user.id)]
+        push_dispatcher.enqueue(tokens, f"{current_user.display_name} is live!", "Tap to watch their clash 🔥")
     return {"clash_id": clash.id, "public": clash.is_public}
 
 @router.get("/clashes/public")
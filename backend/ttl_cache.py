@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+class TTLCache:
+    """Bounded in-process cache: least-recently-used eviction plus per-entry expiry.
+
+    Safe to share between the event loop and FastAPI's threadpool (sync
+    dependencies run there), so every operation takes a lock. With `max_bytes`
+    the cache also evicts until the summed `sizeof(value)` fits that budget.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, max_bytes: int = 0,
+                 sizeof: Callable[[Any], int] = lambda value: 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._bytes = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value, size)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= time.monotonic():
+                if entry is not _MISSING:
+                    del self._data[key]
+                    self._bytes -= entry[2]
+                self._stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store `value`; `ttl` overrides the cache default for this entry (never longer than it)"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        size = self._sizeof(value)
+        if ttl <= 0 or self.maxsize <= 0 or (self.max_bytes and size > self.max_bytes):
+            return
+        with self._lock:
+            previous = self._data.pop(key, _MISSING)
+            if previous is not _MISSING:
+                self._bytes -= previous[2]
+            self._data[key] = (time.monotonic() + ttl, value, size)
+            self._bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes and self._bytes > self.max_bytes):
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted[2]
+                self._stats["evictions"] += 1
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            if entry is not _MISSING:
+                self._bytes -= entry[2]
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            **({"bytes": self._bytes, "max_bytes": self.max_bytes} if self.max_bytes else {}),
+            "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+            **self._stats,
+        }
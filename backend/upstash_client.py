@@ -1,48 +1,395 @@
 import os
 import json
+import time
+import asyncio
+import threading
 import httpx
 from typing import Any, Optional
 
 UPSTASH_REDIS_REST_URL = os.getenv("UPSTASH_REDIS_REST_URL")
 UPSTASH_REDIS_REST_TOKEN = os.getenv("UPSTASH_REDIS_REST_TOKEN")
 
+class LocalRedis:
+    """In-process stand-in for the Upstash REST API.
+
+    Implements the handful of commands the backend uses (strings with EX, lists,
+    sorted sets and DEL) with Redis semantics so KV code paths can run offline and in tests.
+    Enable with `UPSTASH_LOCAL=1` or `use_local_backend()`.
+    """
+
+    def __init__(self):
+        self._data: dict[str, Any] = {}
+        self._expires_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def execute(self, *args: Any) -> Any:
+        name, *rest = [str(a) for a in args]
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if handler is None:
+            raise ValueError(f"ERR unknown command '{name}'")
+        with self._lock:
+            return handler(*rest)
+
+    def _live(self, key: str) -> Any:
+        expires_at = self._expires_at.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires_at.pop(key, None)
+        return self._data.get(key)
+
+    def _list(self, key: str) -> list[str]:
+        value = self._live(key)
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _zset(self, key: str) -> dict[str, float]:
+        value = self._live(key)
+        if value is None:
+            return {}
+        if not isinstance(value, dict):
+            raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _cmd_get(self, key: str) -> Optional[str]:
+        value = self._live(key)
+        if isinstance(value, (list, dict)):
+            raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _cmd_set(self, key: str, value: str, *options: str) -> str:
+        self._data[key] = value
+        self._expires_at.pop(key, None)
+        if len(options) >= 2 and options[0].upper() == "EX":
+            self._expires_at[key] = time.monotonic() + int(options[1])
+        return "OK"
+
+    def _cmd_del(self, *keys: str) -> int:
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                removed += 1
+            self._data.pop(key, None)
+            self._expires_at.pop(key, None)
+        return removed
+
+    def _cmd_mget(self, *keys: str) -> list[Optional[str]]:
+        return [v if isinstance(v, str) else None for v in (self._live(k) for k in keys)]
+
+    def _cmd_mset(self, *pairs: str) -> str:
+        for key, value in zip(pairs[::2], pairs[1::2]):
+            self._cmd_set(key, value)
+        return "OK"
+
+    def _cmd_rpush(self, key: str, *values: str) -> int:
+        items = self._list(key)
+        items.extend(values)
+        self._data[key] = items
+        return len(items)
+
+    def _cmd_lrange(self, key: str, start: str, stop: str) -> list[str]:
+        items = self._list(key)
+        start_i, stop_i = _list_bounds(len(items), int(start), int(stop))
+        return items[start_i:stop_i]
+
+    def _cmd_llen(self, key: str) -> int:
+        return len(self._list(key))
+
+    def _cmd_ltrim(self, key: str, start: str, stop: str) -> str:
+        items = self._list(key)
+        start_i, stop_i = _list_bounds(len(items), int(start), int(stop))
+        if items:
+            self._data[key] = items[start_i:stop_i]
+        return "OK"
+
+    def _cmd_zadd(self, key: str, *pairs: str) -> int:
+        members = self._zset(key)
+        added = 0
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            added += member not in members
+            members[member] = float(score)
+        self._data[key] = members
+        return added
+
+    def _cmd_zrange(self, key: str, start: str, stop: str) -> list[str]:
+        # Ordered by score, ties broken lexicographically (as Redis does)
+        members = sorted(self._zset(key).items(), key=lambda item: (item[1], item[0]))
+        start_i, stop_i = _list_bounds(len(members), int(start), int(stop))
+        return [member for member, _ in members[start_i:stop_i]]
+
+    def _cmd_zcard(self, key: str) -> int:
+        return len(self._zset(key))
+
+    def _cmd_zrem(self, key: str, *members: str) -> int:
+        zset = self._zset(key)
+        return sum(zset.pop(member, None) is not None for member in members)
+
+def _list_bounds(length: int, start: int, stop: int) -> tuple[int, int]:
+    """Translate inclusive Redis list indexes (negatives allowed) into a Python slice"""
+    if start < 0:
+        start = max(length + start, 0)
+    if stop < 0:
+        stop = length + stop
+    return start, max(stop + 1, start)
+
+_local_backend: Optional[LocalRedis] = LocalRedis() if os.getenv("UPSTASH_LOCAL") == "1" else None
+
+def use_local_backend(backend: Optional[LocalRedis] = None) -> LocalRedis:
+    """Route every call through an in-process LocalRedis (offline dev / tests)."""
+    global _local_backend
+    _local_backend = backend or LocalRedis()
+    return _local_backend
+
+def is_configured() -> bool:
+    return _local_backend is not None or bool(UPSTASH_REDIS_REST_URL and UPSTASH_REDIS_REST_TOKEN)
+
 def _headers() -> dict[str, str]:
     return {
         "Authorization": f"Bearer {UPSTASH_REDIS_REST_TOKEN}",
     }
 
-def get(key: str) -> Optional[Any]:
-    """Fetch a value from Upstash Redis (assumes JSON). Returns None if missing or on error."""
+def _command(*args: Any) -> Optional[Any]:
+    """Run a raw Redis command via the REST API (JSON body, so large values stay out of the URL)."""
+    if _local_backend is not None:
+        try:
+            return _local_backend.execute(*args)
+        except ValueError:
+            return None
     if not (UPSTASH_REDIS_REST_URL and UPSTASH_REDIS_REST_TOKEN):
         return None
-
-    url = f"{UPSTASH_REDIS_REST_URL}/get/{key}"
     try:
-        resp = httpx.get(url, headers=_headers(), timeout=5)
+        resp = httpx.post(UPSTASH_REDIS_REST_URL, headers=_headers(), json=[str(a) for a in args], timeout=5)
         if resp.status_code == 200:
-            data = resp.json().get("result")
-            if data is None:
-                return None
-            try:
-                return json.loads(data)
-            except json.JSONDecodeError:
-                return data
+            return resp.json().get("result")
     except Exception:
         return None
-
     return None
 
+def _decode(data: Any) -> Any:
+    try:
+        return json.loads(data)
+    except (TypeError, json.JSONDecodeError):
+        return data
+
+def get(key: str) -> Optional[Any]:
+    """Fetch a value from Upstash Redis (assumes JSON). Returns None if missing or on error."""
+    data = _command("GET", key)
+    return None if data is None else _decode(data)
+
 def set(key: str, value: Any, ex: int | None = None) -> bool:
     """Set a JSON-serialisable value in Upstash Redis."""
-    if not (UPSTASH_REDIS_REST_URL and UPSTASH_REDIS_REST_TOKEN):
-        return False
-
-    to_store = json.dumps(value)
-    url = f"{UPSTASH_REDIS_REST_URL}/set/{key}/{to_store}"
+    args: list[Any] = ["SET", key, json.dumps(value)]
     if ex:
-        url += f"?ex={ex}"
-    try:
-        resp = httpx.post(url, headers=_headers(), timeout=5)
-        return resp.status_code == 200
-    except Exception:
-        return False
\ No newline at end of file
+        args += ["EX", ex]
+    return _command(*args) == "OK"
+
+def delete(key: str) -> bool:
+    return _command("DEL", key) is not None
+
+# ---------------- Lists (append-only logs) -----------------
+
+def rpush(key: str, *values: Any) -> Optional[int]:
+    """Append JSON-serialisable values to a list. Returns the new list length, or None on error."""
+    if not values:
+        return None
+    return _command("RPUSH", key, *(json.dumps(v) for v in values))
+
+def lrange(key: str, start: int = 0, stop: int = -1) -> list[Any]:
+    """Return decoded list items in [start, stop] (inclusive, Redis semantics)."""
+    return [_decode(item) for item in (_command("LRANGE", key, start, stop) or [])]
+
+def llen(key: str) -> int:
+    return _command("LLEN", key) or 0
+
+def ltrim(key: str, start: int, stop: int) -> bool:
+    """Keep only items in [start, stop] – e.g. ltrim(key, -1000, -1) caps a log at 1000 entries."""
+    return _command("LTRIM", key, start, stop) == "OK"
+
+# ---------------- Async pooled client -----------------
+
+class Pipeline:
+    """Commands queued for a single round trip via the REST `/pipeline` endpoint."""
+
+    def __init__(self, client: "AsyncUpstashClient"):
+        self._client = client
+        self._commands: list[list[str]] = []
+        self._decoders: list[Any] = []
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+    def command(self, *args: Any, decode: Any = None) -> "Pipeline":
+        self._commands.append([str(a) for a in args])
+        self._decoders.append(decode)
+        return self
+
+    def get(self, key: str) -> "Pipeline":
+        return self.command("GET", key, decode=_decode)
+
+    def set(self, key: str, value: Any, ex: int | None = None) -> "Pipeline":
+        args: list[Any] = ["SET", key, json.dumps(value)]
+        if ex:
+            args += ["EX", ex]
+        return self.command(*args, decode=lambda r: r == "OK")
+
+    def delete(self, key: str) -> "Pipeline":
+        return self.command("DEL", key)
+
+    def rpush(self, key: str, *values: Any) -> "Pipeline":
+        return self.command("RPUSH", key, *(json.dumps(v) for v in values))
+
+    def zadd(self, key: str, score: float, member: str) -> "Pipeline":
+        return self.command("ZADD", key, score, member)
+
+    def zrange(self, key: str, start: int = 0, stop: int = -1) -> "Pipeline":
+        return self.command("ZRANGE", key, start, stop)
+
+    def zcard(self, key: str) -> "Pipeline":
+        return self.command("ZCARD", key)
+
+    def lrange(self, key: str, start: int = 0, stop: int = -1) -> "Pipeline":
+        return self.command("LRANGE", key, start, stop, decode=lambda r: [_decode(i) for i in (r or [])])
+
+    async def execute(self) -> list[Any]:
+        """Send every queued command; failed commands yield None in their slot."""
+        commands, decoders = self._commands, self._decoders
+        self._commands, self._decoders = [], []
+        results = await self._client._execute_many(commands)
+        return [d(r) if d and r is not None else r for d, r in zip(decoders, results)]
+
+class AsyncUpstashClient:
+    """Non-blocking Upstash client for use inside async handlers.
+
+    One shared `httpx.AsyncClient` keeps TLS connections alive across requests,
+    a semaphore bounds in-flight calls, and `pipeline()` / `mget` / `mset` batch
+    several commands into one round trip. Like the sync helpers above, errors
+    are swallowed and surface as None/False, and `use_local_backend()` applies.
+    """
+
+    def __init__(self, url: Optional[str] = None, token: Optional[str] = None, max_connections: int = 20,
+                 max_concurrency: int = 10, timeout: float = 5.0):
+        self.url = url or UPSTASH_REDIS_REST_URL
+        self.token = token or UPSTASH_REDIS_REST_TOKEN
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._http: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def is_configured(self) -> bool:
+        return _local_backend is not None or bool(self.url and self.token)
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=self.url,
+                headers={"Authorization": f"Bearer {self.token}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._http
+
+    async def _post(self, path: str, body: list) -> Optional[Any]:
+        client = self._client()
+        async with self._semaphore:
+            resp = await client.post(path, json=body)
+        if resp.status_code != 200:
+            return None
+        return resp.json()
+
+    async def execute(self, *args: Any) -> Optional[Any]:
+        """Run one raw command; returns the Redis result or None on error."""
+        if _local_backend is not None:
+            try:
+                return _local_backend.execute(*args)
+            except ValueError:
+                return None
+        if not (self.url and self.token):
+            return None
+        try:
+            data = await self._post("", [str(a) for a in args])
+            return data.get("result") if data else None
+        except Exception:
+            return None
+
+    async def _execute_many(self, commands: list[list[str]]) -> list[Any]:
+        if not commands:
+            return []
+        if _local_backend is not None:
+            return [await self.execute(*c) for c in commands]
+        if not (self.url and self.token):
+            return [None] * len(commands)
+        try:
+            data = await self._post("/pipeline", commands)
+        except Exception:
+            data = None
+        if not isinstance(data, list):
+            return [None] * len(commands)
+        return [item.get("result") if "error" not in item else None for item in data]
+
+    def pipeline(self) -> Pipeline:
+        return Pipeline(self)
+
+    async def get(self, key: str) -> Optional[Any]:
+        data = await self.execute("GET", key)
+        return None if data is None else _decode(data)
+
+    async def set(self, key: str, value: Any, ex: int | None = None) -> bool:
+        args: list[Any] = ["SET", key, json.dumps(value)]
+        if ex:
+            args += ["EX", ex]
+        return await self.execute(*args) == "OK"
+
+    async def delete(self, key: str) -> bool:
+        return await self.execute("DEL", key) is not None
+
+    async def mget(self, *keys: str) -> list[Optional[Any]]:
+        """Fetch several JSON values in one command; missing keys come back as None."""
+        if not keys:
+            return []
+        data = await self.execute("MGET", *keys) or [None] * len(keys)
+        return [None if d is None else _decode(d) for d in data]
+
+    async def mset(self, mapping: dict[str, Any]) -> bool:
+        """Set several JSON values in one command (no TTL – use a pipeline of `set` for that)."""
+        if not mapping:
+            return True
+        args: list[Any] = ["MSET"]
+        for key, value in mapping.items():
+            args += [key, json.dumps(value)]
+        return await self.execute(*args) == "OK"
+
+    async def rpush(self, key: str, *values: Any) -> Optional[int]:
+        if not values:
+            return None
+        return await self.execute("RPUSH", key, *(json.dumps(v) for v in values))
+
+    async def lrange(self, key: str, start: int = 0, stop: int = -1) -> list[Any]:
+        return [_decode(item) for item in (await self.execute("LRANGE", key, start, stop) or [])]
+
+    async def llen(self, key: str) -> int:
+        return await self.execute("LLEN", key) or 0
+
+    async def ltrim(self, key: str, start: int, stop: int) -> bool:
+        return await self.execute("LTRIM", key, start, stop) == "OK"
+
+    async def zadd(self, key: str, score: float, member: str) -> Optional[int]:
+        return await self.execute("ZADD", key, score, member)
+
+    async def zrange(self, key: str, start: int = 0, stop: int = -1) -> list[str]:
+        """Members (raw strings, not JSON) between two ranks, ordered by score"""
+        return await self.execute("ZRANGE", key, start, stop) or []
+
+    async def zcard(self, key: str) -> int:
+        return await self.execute("ZCARD", key) or 0
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+# Shared async client – reuse it so connections stay pooled
+async_upstash = AsyncUpstashClient()
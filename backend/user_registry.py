@@ -0,0 +1,51 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from upstash_client import AsyncUpstashClient, async_upstash
+
+# Sorted set of user ids scored by registration time (ms); snapshots live under user:{id}
+USER_INDEX_KEY = "users:index"
+# Pre-registry monolithic list, still read when the index is empty
+LEGACY_USERS_KEY = "users"
+
+def user_key(user_id: str) -> str:
+    return f"user:{user_id}"
+
+class UserRegistry:
+    """Per-user Upstash registry replacing the single `users` JSON array.
+
+    Registering a user is one pipelined SET of `user:{id}` plus a ZADD into
+    `users:index`, so its cost does not depend on how many users exist and
+    concurrent signups cannot overwrite each other. Listing walks the index in
+    registration order one page at a time (ZRANGE + MGET). Because new users
+    are always appended at the end, an offset cursor stays stable while
+    pages are being read.
+    """
+
+    def __init__(self, client: AsyncUpstashClient = async_upstash):
+        self.client = client
+
+    async def register(self, user_snapshot: Dict[str, Any], registered_at: Optional[float] = None) -> bool:
+        user_id = user_snapshot["id"]
+        score = int((registered_at or time.time()) * 1000)
+        saved, indexed = await (
+            self.client.pipeline().set(user_key(user_id), user_snapshot).zadd(USER_INDEX_KEY, score, user_id).execute()
+        )
+        return bool(saved) and indexed is not None
+
+    async def page(self, cursor: int = 0, limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[int], int]:
+        """Return (users, next_cursor, total); next_cursor is None on the last page"""
+        user_ids, total = await (
+            self.client.pipeline().zrange(USER_INDEX_KEY, cursor, cursor + limit - 1).zcard(USER_INDEX_KEY).execute()
+        )
+        user_ids = user_ids or []
+        snapshots = await self.client.mget(*(user_key(u) for u in user_ids))
+        users = [s for s in snapshots if s is not None]
+        next_cursor = cursor + len(user_ids)
+        return users, (next_cursor if next_cursor < (total or 0) else None), total or 0
+
+    async def count(self) -> int:
+        return await self.client.zcard(USER_INDEX_KEY)
+
+# Global registry instance
+user_registry = UserRegistry()
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+from upstash_client import AsyncUpstashClient, async_upstash
+
+logger = logging.getLogger(__name__)
+
+# Returned by `pending_value` when nothing is queued for a key
+MISSING = object()
+
+# Flushes a failed SET or RPUSH is tried on before it is dropped
+MAX_WRITE_ATTEMPTS = 3
+
+class WriteBehindQueue:
+    """In-process write-behind buffer for Upstash mirroring.
+
+    Request handlers enqueue writes and return immediately; a worker task
+    drains the queue every `flush_interval` seconds:
+
+    * `enqueue_set` – latest value per key wins (repeated writes coalesce)
+    * `enqueue_rpush` – appends per key are merged into one RPUSH
+    * `enqueue_job` – an async callable; keyed jobs coalesce (e.g. one dispute
+      sync per flush no matter how many messages arrived), unkeyed jobs run
+      once each, in order
+
+    SET/RPUSH commands are flushed through pipelines of at most `max_batch`
+    commands. SETs stay readable through `pending_value` until their pipeline
+    returns. Failed commands are re-queued for up to MAX_WRITE_ATTEMPTS
+    flushes: a SET unless a newer value for the key is already queued, an
+    RPUSH ahead of any values queued for the key since, so list order holds.
+    A push whose reply was lost may be applied twice. `metrics()` reports
+    depth, lag and coalescing counters.
+    """
+
+    def __init__(self, client: AsyncUpstashClient = async_upstash,
+                 flush_interval: float = settings.kv_flush_interval_ms / 1000,
+                 max_batch: int = settings.kv_flush_max_batch):
+        self.client = client
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._sets: Dict[str, Tuple[Any, Optional[int]]] = {}
+        self._inflight: Dict[str, Tuple[Any, Optional[int]]] = {}  # SETs whose pipeline hasn't returned yet
+        self._attempts: Dict[Tuple[str, str], int] = {}  # (command, key) -> failed flushes so far
+        self._pushes: Dict[str, List[Any]] = {}
+        self._keyed_jobs: Dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._jobs: List[Callable[[], Awaitable[Any]]] = []
+        self._oldest_enqueued_at: Optional[float] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "enqueued": 0,
+            "coalesced": 0,
+            "flushes": 0,
+            "commands_sent": 0,
+            "jobs_run": 0,
+            "failed": 0,
+            "requeued": 0,
+            "dropped": 0,
+            "last_flush_lag_ms": 0.0,
+            "max_flush_lag_ms": 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Producers (non-blocking, callable from request handlers)
+    # ------------------------------------------------------------------
+
+    def enqueue_set(self, key: str, value: Any, ex: Optional[int] = None):
+        if key in self._sets:
+            self._stats["coalesced"] += 1
+        self._sets[key] = (value, ex)
+        self._mark_enqueued()
+
+    def enqueue_rpush(self, key: str, *values: Any):
+        if key in self._pushes:
+            self._stats["coalesced"] += 1
+        self._pushes.setdefault(key, []).extend(values)
+        self._mark_enqueued()
+
+    def enqueue_job(self, key: Optional[str], job: Callable[[], Awaitable[Any]]):
+        """Queue `job()` to run on the next flush; a pending job with the same key is replaced"""
+        if key is None:
+            self._jobs.append(job)
+        else:
+            if key in self._keyed_jobs:
+                self._stats["coalesced"] += 1
+            self._keyed_jobs[key] = job
+        self._mark_enqueued()
+
+    def pending_value(self, key: str) -> Any:
+        """Read-your-writes: the queued SET value for `key`, or MISSING"""
+        if key in self._sets:
+            return self._sets[key][0]
+        if key in self._inflight:
+            return self._inflight[key][0]
+        return MISSING
+
+    def _mark_enqueued(self):
+        self._stats["enqueued"] += 1
+        if self._oldest_enqueued_at is None:
+            self._oldest_enqueued_at = time.monotonic()
+        self._wakeup.set()
+
+    # ------------------------------------------------------------------
+    # Draining
+    # ------------------------------------------------------------------
+
+    def depth(self) -> int:
+        return len(self._sets) + sum(len(v) for v in self._pushes.values()) + len(self._keyed_jobs) + len(self._jobs)
+
+    async def flush(self):
+        """Send everything queued so far"""
+        if self._oldest_enqueued_at is None:
+            return
+        lag_ms = (time.monotonic() - self._oldest_enqueued_at) * 1000
+        sets, pushes, keyed_jobs, jobs = self._sets, self._pushes, self._keyed_jobs, self._jobs
+        self._sets, self._pushes, self._keyed_jobs, self._jobs = {}, {}, {}, []
+        self._oldest_enqueued_at = None
+
+        if not self.client.is_configured():
+            sets, pushes = {}, {}
+
+        self._inflight = sets
+        try:
+            pipe, sent = self.client.pipeline(), []
+            for key, (value, ex) in sets.items():
+                pipe.set(key, value, ex=ex)
+                sent.append(("SET", key, None))
+                if len(pipe) >= self.max_batch:
+                    await self._send(pipe, sent)
+                    sent = []
+            for key, values in pushes.items():
+                pipe.rpush(key, *values)
+                sent.append(("RPUSH", key, values))
+                if len(pipe) >= self.max_batch:
+                    await self._send(pipe, sent)
+                    sent = []
+            if len(pipe):
+                await self._send(pipe, sent)
+        finally:
+            self._inflight = {}
+
+        results = await asyncio.gather(*(job() for job in keyed_jobs.values()), return_exceptions=True)
+        for job in jobs:
+            try:
+                await job()
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        for result in results:
+            if isinstance(result, Exception):
+                self._stats["failed"] += 1
+                logger.warning(f"Write-behind job failed: {result}")
+        self._stats["jobs_run"] += len(results)
+
+        self._stats["flushes"] += 1
+        self._stats["last_flush_lag_ms"] = round(lag_ms, 2)
+        self._stats["max_flush_lag_ms"] = round(max(self._stats["max_flush_lag_ms"], lag_ms), 2)
+
+    async def _send(self, pipe, sent: List[Tuple[str, str, Optional[List[Any]]]]):
+        """Execute `pipe` – one (command, key, RPUSH values) entry in `sent` per command – and re-queue failures"""
+        size = len(pipe)
+        results = await pipe.execute()
+        self._stats["commands_sent"] += size
+        failed = sum(1 for r in results if r is None or r is False)
+        if failed:
+            self._stats["failed"] += failed
+            logger.warning(f"Write-behind flush: {failed}/{size} Upstash commands failed")
+        for (command, key, values), result in zip(sent, results):
+            if result is not None and result is not False:
+                self._attempts.pop((command, key), None)
+            elif command == "RPUSH":
+                if self._retry(command, key):
+                    self._pushes[key] = values + self._pushes.get(key, [])
+            elif key not in self._sets:  # Else a newer value is queued and supersedes this one
+                if self._retry(command, key):
+                    self._sets[key] = self._inflight[key]
+            else:
+                self._attempts.pop((command, key), None)
+
+    def _retry(self, command: str, key: str) -> bool:
+        """Count a failed attempt; True if the command should be re-queued, False once it is dropped"""
+        attempts = self._attempts.get((command, key), 0) + 1
+        if attempts >= MAX_WRITE_ATTEMPTS:
+            self._attempts.pop((command, key), None)
+            self._stats["dropped"] += 1
+            logger.warning(f"Write-behind: dropping {command} {key} after {attempts} failed attempts")
+            return False
+        self._attempts[(command, key)] = attempts
+        self._stats["requeued"] += 1
+        self._mark_enqueued()
+        return True
+
+    async def run(self):
+        """Worker loop: wait for work, let writes coalesce for one window, flush"""
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush failed: {e}")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the worker and flush whatever is still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def metrics(self) -> Dict[str, Any]:
+        lag_ms = 0.0
+        if self._oldest_enqueued_at is not None:
+            lag_ms = (time.monotonic() - self._oldest_enqueued_at) * 1000
+        return {
+            "depth": self.depth(),
+            "lag_ms": round(lag_ms, 2),
+            "running": self._task is not None and not self._task.done(),
+            **self._stats,
+        }
+
+# Global write-behind queue
+write_behind = WriteBehindQueue()
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Dict, Optional, Set
+
+from fastapi import WebSocket
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# WebSocket close code 1013 – "try again later"; sent to clients that fell too far behind
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+class Subscriber:
+    """One WebSocket connection with its own bounded outbound queue and writer task"""
+
+    def __init__(self, hub: "WebSocketHub", topic: str, websocket: WebSocket, queue_size: int):
+        self.id = uuid.uuid4().hex
+        self.hub = hub
+        self.topic = topic
+        self.websocket = websocket
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def offer(self, text: str) -> bool:
+        """Queue an already-serialised frame; False if the client is too far behind"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def send(self, message: Dict[str, Any]) -> bool:
+        """Queue a message for this connection only (replies to the client's own requests)"""
+        return self.offer(json.dumps(message))
+
+    async def _write_loop(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                await self.websocket.send_text(text)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.info(f"WebSocket writer for {self.topic} stopped: {e}")
+            self.hub.disconnect(self)
+
+    def close(self, code: Optional[int] = None):
+        if self.closed:
+            return
+        self.closed = True
+        self._writer.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+class WebSocketHub:
+    """Fan-out of real-time events to every WebSocket subscribed to a topic.
+
+    `broadcast` serialises the payload once and hands the same string to each
+    subscriber's queue without awaiting any socket, so one slow client cannot
+    hold up the others (or the request that raised the event). A subscriber
+    whose queue is full is disconnected with close code 1013 and can reconnect.
+    """
+
+    def __init__(self, queue_size: int = settings.ws_send_queue_size):
+        self.queue_size = queue_size
+        self._topics: Dict[str, Set[Subscriber]] = {}
+        self._stats = {"broadcasts": 0, "frames_queued": 0, "slow_consumers_dropped": 0}
+
+    def connect(self, topic: str, websocket: WebSocket) -> Subscriber:
+        """Register an accepted WebSocket under a topic"""
+        subscriber = Subscriber(self, topic, websocket, self.queue_size)
+        self._topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber, code: Optional[int] = None):
+        """Stop a subscriber's writer and forget it (idempotent)"""
+        subscriber.close(code)
+        subscribers = self._topics.get(subscriber.topic)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._topics[subscriber.topic]
+
+    def broadcast(self, topic: str, message: Dict[str, Any], exclude: Optional[Subscriber] = None) -> int:
+        """Queue `message` for every subscriber of `topic`; returns how many received it"""
+        if topic not in self._topics:
+            return 0
+        return self.broadcast_text(topic, json.dumps(message, default=str), exclude.id if exclude else None)
+
+    def broadcast_text(self, topic: str, text: str, exclude_id: Optional[str] = None) -> int:
+        """Like `broadcast` for an already-serialised frame (e.g. one relayed by the pub/sub broker)"""
+        subscribers = self._topics.get(topic)
+        if not subscribers:
+            return 0
+        delivered = 0
+        for subscriber in list(subscribers):
+            if subscriber.id == exclude_id:
+                continue
+            if subscriber.offer(text):
+                delivered += 1
+            else:
+                logger.warning(f"Dropping slow WebSocket consumer on {topic}")
+                self._stats["slow_consumers_dropped"] += 1
+                self.disconnect(subscriber, code=SLOW_CONSUMER_CLOSE_CODE)
+        self._stats["broadcasts"] += 1
+        self._stats["frames_queued"] += delivered
+        return delivered
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        if topic is not None:
+            return len(self._topics.get(topic, ()))
+        return sum(len(s) for s in self._topics.values())
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"topics": len(self._topics), "subscribers": self.subscriber_count(), **self._stats}
+
+# Hubs for dispute rooms (topic = dispute id) and clash spectator rooms (topic = clash id)
+dispute_hub = WebSocketHub()
+clash_hub = WebSocketHub()
@@ -1,4 +1,4 @@
-import os, httpx, json, time
+import os, httpx, itertools, json, time
 
 BASE = os.environ["UPSTASH_REDIS_REST_URL"]
 UH   = {"Authorization": f"Bearer {os.environ['UPSTASH_REDIS_REST_TOKEN']}"}
@@ -18,18 +18,68 @@ def get(key: str):
     raw = httpx.get(f"{BASE}/get/{key}", headers=UH).json()["result"]
     return json.loads(raw) if raw else None
 
+def lrange(key: str, start: int = 0, stop: int = -1):
+    items = httpx.post(BASE, headers=UH, json=["LRANGE", key, str(start), str(stop)]).json().get("result") or []
+    return [json.loads(i) for i in items]
+
+def iter_list(key: str, page: int = 500):
+    """Stream a Redis list in LRANGE pages instead of downloading it in one go."""
+    start = 0
+    while True:
+        items = lrange(key, start, start + page - 1)
+        yield from items
+        if len(items) < page:
+            return
+        start += page
+
+def iter_users(page: int = 500):
+    """Stream user snapshots from the users:index registry, one ZRANGE + MGET per page."""
+    start = 0
+    while True:
+        ids = httpx.post(BASE, headers=UH, json=["ZRANGE", "users:index", str(start), str(start + page - 1)]).json().get("result") or []
+        if ids:
+            raw = httpx.post(BASE, headers=UH, json=["MGET", *[f"user:{i}" for i in ids]]).json().get("result") or []
+            yield from (json.loads(r) for r in raw if r)
+        if len(ids) < page:
+            return
+        start += page
+
+# Mirrors backend/dispute_sync.py: list events are appended, everything else is a field update
+COLLECTION_EVENTS = {"participant": "participants", "evidence": "evidence", "message": "messages", "proposal": "proposals"}
+
+def load_dispute(did: str):
+    """Snapshot under dispute:{id} plus any not-yet-compacted deltas in dispute_events:{id}."""
+    d = get(f"dispute:{did}")
+    if not d:
+        return None
+    seq = d.get("_seq", 0)
+    for ev in sorted(lrange(f"dispute_events:{did}"), key=lambda e: e["seq"]):
+        if ev["seq"] <= seq:
+            continue
+        seq = ev["seq"]
+        if ev["type"] in COLLECTION_EVENTS:
+            d.setdefault(COLLECTION_EVENTS[ev["type"]], []).append(ev["data"])
+        else:
+            d.update(ev["data"])
+    d["_seq"] = seq
+    return d
+
 def upsert(table: str, row: dict):
     httpx.post(f"{SURL}/rest/v1/{table}", headers=SH, json=row, timeout=10)
 
 
 def sync_users():
-    for u in (get("users") or []):
+    users = iter_users()
+    first = next(users, None)
+    # Pre-registry data only has the monolithic users list
+    users = itertools.chain([first], users) if first is not None else (get("users") or [])
+    for u in users:
         upsert("users", {**u, "payload": u})
 
 
 def sync_disputes_and_messages():
     for key in scan("dispute:"):
-        d   = get(key)
+        d   = load_dispute(key.split(":", 1)[1])
         if not d:  # Key may have been deleted
             continue
         did = d["id"]
@@ -41,7 +91,7 @@ def sync_disputes_and_messages():
             "snapshot": d,
             "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ")
         })
-        for m in (get(f"chat:{did}") or []):
+        for m in iter_list(f"chat:{did}"):
             upsert("messages", {
                 "id": m["id"],
                 "dispute_id": did,